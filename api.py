@@ -0,0 +1,304 @@
+"""
+api.py
+
+This file contains the headless HTTP/JSON API for the NBA database app.
+It exposes the query pipeline, modification preview/confirm, result paging
+and the schema so several uvicorn worker processes (each with its own
+connection pool and caches) can serve questions behind a load balancer.
+Requests past API_MAX_CONCURRENCY wait briefly for a slot and are turned
+away with a 503 when none frees up, and every request has a deadline.
+The modification endpoints are disabled unless API_MODIFICATIONS_KEY is
+set, and then need that key in the X-API-Key header.
+"""
+
+import os
+import hmac
+import json
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+import uvicorn
+from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from src.services.input import handle_query
+from src.services.modification import execute_modification, verify_modification
+from src.services.pagination import paging_plan, fetch_page, estimate_count, export_result
+from src.services.schema import get_schema
+from src.services.entities import get_entity_index
+from src.services.db import get_pool
+from src.services.resources import shutdown_resources
+from src.utils.config import (
+    API_HOST,
+    API_PORT,
+    API_WORKERS,
+    API_MAX_CONCURRENCY,
+    API_QUEUE_TIMEOUT,
+    API_REQUEST_TIMEOUT,
+    API_MODIFICATIONS_KEY,
+    RESULT_PAGE_SIZE
+)
+
+_limits = {}
+
+
+class QueryRequest(BaseModel):
+    question: str
+
+
+class ModificationRequest(BaseModel):
+    sql_query: str
+
+
+class PlanRequest(BaseModel):
+    sql_query: str
+
+
+class PageRequest(BaseModel):
+    sql_query: str
+    params: list | None = None
+    page: int = 0
+    after: list | None = None
+
+
+class ExportRequest(BaseModel):
+    sql_query: str
+    params: list | None = None
+    format: str = 'csv'
+
+
+@asynccontextmanager
+async def lifespan(_):
+    """
+    Creates this worker's connection pool, schema metadata and entity index before it takes
+    requests, and closes the shared resources when it stops
+    """
+    _limits["slots"] = asyncio.Semaphore(API_MAX_CONCURRENCY)
+    await run_in_threadpool(get_pool)
+    await run_in_threadpool(get_schema)
+    await run_in_threadpool(get_entity_index)
+    yield
+    shutdown_resources()
+
+
+app = FastAPI(title="NBA Database API", lifespan=lifespan)
+
+
+async def acquire_slot():
+    """
+    Waits up to API_QUEUE_TIMEOUT seconds for a free request slot, or answers 503 so the
+    load balancer (or client) can retry elsewhere
+    """
+    try:
+        await asyncio.wait_for(_limits["slots"].acquire(), API_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy, try again shortly",
+            headers={"Retry-After": "1"}) from e
+
+
+async def run_limited(function, *args, **kwargs):
+    """
+    Runs a blocking pipeline call in the thread pool under the concurrency limit and API_REQUEST_TIMEOUT
+    A call that times out keeps its slot until its thread finishes, so the limit stays honest
+    """
+    await acquire_slot()
+    task = asyncio.ensure_future(run_in_threadpool(function, *args, **kwargs))
+    task.add_done_callback(lambda _: _limits["slots"].release())
+    try:
+        return jsonable_encoder(await asyncio.wait_for(asyncio.shield(task), API_REQUEST_TIMEOUT))
+    except asyncio.TimeoutError as e:
+        raise HTTPException(status_code=504, detail="The request timed out") from e
+
+
+def require_modifications_key(x_api_key: str | None = Header(default=None)):
+    """
+    Lets a modification request through only when API_MODIFICATIONS_KEY is set and the
+    X-API-Key header matches it; without a configured key the endpoints don't exist (404)
+    """
+    if not API_MODIFICATIONS_KEY:
+        raise HTTPException(status_code=404, detail="Modifications are disabled on this server")
+    if x_api_key is None or not hmac.compare_digest(x_api_key.encode(), API_MODIFICATIONS_KEY.encode()):
+        raise HTTPException(status_code=401, detail="A valid X-API-Key is required for modifications")
+
+
+def event_payload(stage, payload):
+    """
+    Trims a stage event for the wire: the rows event only carries the first page
+    """
+    if stage == "rows":
+        result = payload["result"]
+        return {"result": {
+            **{key: value for key, value in result.items() if key != "data"},
+            "data": result.get("data", [])[:RESULT_PAGE_SIZE]
+        }}
+    return payload
+
+
+@app.get("/health")
+def health():
+    """
+    Liveness check for the load balancer
+    """
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    """
+    Runs a question through the pipeline and returns the full result
+    """
+    return await run_limited(handle_query, request.question)
+
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Runs a question and streams its stage events as JSON lines, ending with a "result" event
+    """
+    await acquire_slot()
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(stage, payload):
+        loop.call_soon_threadsafe(events.put_nowait, (stage, event_payload(stage, payload)))
+
+    def run():
+        try:
+            return handle_query(request.question, on_event=on_event)
+        finally:
+            loop.call_soon_threadsafe(_limits["slots"].release)
+
+    task = asyncio.ensure_future(run_in_threadpool(run))
+
+    async def stream():
+        deadline = loop.time() + API_REQUEST_TIMEOUT
+        while not (task.done() and events.empty()):
+            try:
+                stage, payload = await asyncio.wait_for(events.get(), max(deadline - loop.time(), 0) or 0.001)
+            except asyncio.TimeoutError:
+                if task.done():
+                    continue
+                yield json.dumps({"stage": "error", "payload": {"error": "The request timed out"}}) + "\n"
+                return
+            yield json.dumps(jsonable_encoder({"stage": stage, "payload": payload})) + "\n"
+        yield json.dumps(jsonable_encoder({"stage": "result", "payload": task.result()})) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/modifications/preview", dependencies=[Depends(require_modifications_key)])
+async def preview_modification(request: ModificationRequest):
+    """
+    Runs a modification in a rolled-back transaction and returns the rows it would touch
+    """
+    return await run_limited(execute_modification, request.sql_query, dry_run=True)
+
+
+@app.post("/modifications/confirm", dependencies=[Depends(require_modifications_key)])
+async def confirm_modification(request: ModificationRequest):
+    """
+    Runs a modification and returns its result with the verification of the touched rows
+    """
+    result = await run_limited(execute_modification, request.sql_query)
+    return {**result, "verification": verify_modification(request.sql_query, result)}
+
+
+@app.post("/results/plan")
+async def result_plan(request: PlanRequest):
+    """
+    Decides how to page a SELECT and estimates its row count
+    """
+    plan = await run_limited(paging_plan, request.sql_query)
+    if plan is None:
+        raise HTTPException(status_code=400, detail="Only SELECT queries can be paged")
+    return {"plan": plan, "estimate": await run_limited(estimate_count, plan)}
+
+
+def planned_page(sql_query, params, page, after):
+    """
+    Plans the query again instead of trusting a plan sent by the client, so only a validated
+    SELECT is ever run, and fetches the page; returns None when the query can't be paged
+    """
+    plan = paging_plan(sql_query, params)
+    if plan is None:
+        return None
+    return {**fetch_page(plan, page, after), "plan": plan}
+
+
+def planned_export(sql_query, params, sink, fmt):
+    """
+    Plans the query again like planned_page and exports the whole result to sink
+    """
+    plan = paging_plan(sql_query, params)
+    if plan is None:
+        return None
+    return export_result(plan, sink, fmt)
+
+
+@app.post("/results/page")
+async def result_page(request: PageRequest):
+    """
+    Fetches one page of a planned result (the plan's sql_query and params); the plan comes back too,
+    since it can switch to offset paging
+    """
+    after = tuple(request.after) if request.after is not None else None
+    page = await run_limited(planned_page, request.sql_query, request.params, request.page, after)
+    if page is None:
+        raise HTTPException(status_code=400, detail="Only SELECT queries can be paged")
+    return page
+
+
+@app.post("/results/export")
+async def result_export(request: ExportRequest):
+    """
+    Streams a whole planned result (the plan's sql_query and params) as a CSV or Parquet download
+    """
+    if request.format not in ('csv', 'parquet'):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'parquet'")
+    with tempfile.NamedTemporaryFile(suffix=f".{request.format}", delete=False) as sink:
+        try:
+            export = await run_limited(planned_export, request.sql_query, request.params, sink, request.format)
+        except HTTPException:
+            # 503 or 504: after a timeout the export thread stops at its next write to the closed file
+            os.remove(sink.name)
+            raise
+    if export is None or not export["success"]:
+        os.remove(sink.name)
+        if export is None:
+            raise HTTPException(status_code=400, detail="Only SELECT queries can be exported")
+        raise HTTPException(status_code=500, detail=export["error"])
+    return FileResponse(
+        sink.name,
+        filename=f"nba_results.{request.format}",
+        headers={"X-Row-Count": str(export["row_count"])},
+        background=BackgroundTask(os.remove, sink.name))
+
+
+@app.get("/schema")
+async def schema():
+    """
+    Returns the tables with their columns, keys, indexes and row estimates
+    """
+    loaded = await run_limited(get_schema)
+    return {"database": loaded.get("database"), "tables": loaded["tables"]}
+
+
+@app.get("/schema/{table}")
+async def schema_table(table: str):
+    """
+    Returns one table's columns, keys, indexes and row estimate
+    """
+    tables = (await run_limited(get_schema))["tables"]
+    name = next((name for name in tables if name.lower() == table.lower()), None)
+    if name is None:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+    return {"table": name, **tables[name]}
+
+
+if __name__ == "__main__":
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
@@ -0,0 +1,337 @@
+"""
+ingestion_benchmark.py
+
+This file benchmarks the ingestion pipeline on synthetic data at 1x, 10x or
+50x a season of games: data_scrape.get_box_scores against a local stub of
+the stats.nba.com box score endpoints (mock_nba_stats.py), data_clean.main,
+and the sql_upload load path (validation, load_table_dataframes and
+save_tables) into a SQLite file. Each stage reports wall time, rows per
+second and peak RSS, and can be profiled with cProfile or py-spy.
+
+Run from the repository root:
+    python benchmarks/ingestion_benchmark.py --scales 1 10 50 --profile cprofile
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import cProfile
+import argparse
+import tempfile
+import resource
+import threading
+import subprocess
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mock_nba_stats import start_mock_nba_stats
+from synthetic import (
+    TRADITIONAL_COLUMNS,
+    ADVANCED_COLUMNS,
+    DATA_DIR,
+    load_reference_tables,
+    synthetic_games,
+    synthetic_box_scores,
+    league_game_rows,
+    player_stats_payloads
+)
+
+# data_clean only reads the 2023-24 files, so every synthetic season is scraped under that label
+SEASON = '2023-24'
+SEASON_TYPES = ('Regular Season', 'Playoffs')
+STAGES = ('synthesize', 'scrape', 'clean', 'validate', 'load')
+
+
+class RssSampler:
+    """
+    Tracks the peak resident set size while a stage runs, by polling /proc/self/statm
+    Where /proc isn't available it reports the process-wide peak from getrusage instead
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        if os.path.exists('/proc/self/statm'):
+            self.sample()
+            self.thread = threading.Thread(target=self.poll, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.sample()
+        else:
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = peak if sys.platform == "darwin" else peak * 1024
+        return False
+
+    def poll(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        with open('/proc/self/statm', encoding='ascii') as file:
+            rss = int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        self.peak = max(self.peak, rss)
+
+
+@contextmanager
+def working_directory(path):
+    """
+    Runs a block from another directory (the scraper and cleaner use relative paths)
+    """
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def start_py_spy(output_path):
+    """
+    Attaches py-spy to this process, writing a flamegraph to output_path when stopped
+    Returns the py-spy process, or None when it isn't installed
+    """
+    if shutil.which("py-spy") is None:
+        print("py-spy is not installed, skipping the flamegraph")
+        return None
+    process = subprocess.Popen(
+        ["py-spy", "record", "--pid", str(os.getpid()), "--output", output_path, "--format", "flamegraph"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    time.sleep(1)
+    if process.poll() is not None:
+        print(f"py-spy could not attach (it may need root): {process.stderr.read().decode().strip()}")
+        return None
+    return process
+
+
+def stop_py_spy(process):
+    """
+    Stops py-spy so it writes its flamegraph
+    """
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_stage(name, function, profile, profile_path):
+    """
+    Runs one stage under the RSS sampler and the chosen profiler
+    Returns (whatever function returns, seconds, peak RSS in MB)
+    """
+    profiler = cProfile.Profile() if profile == 'cprofile' else None
+    py_spy = start_py_spy(profile_path + '.svg') if profile == 'py-spy' else None
+
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = function()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+
+    if profiler is not None:
+        profiler.dump_stats(profile_path + '.prof')
+    if py_spy is not None:
+        stop_py_spy(py_spy)
+    print(f"  {name}: {seconds:.2f}s")
+    return result, seconds, sampler.peak / (1024 * 1024)
+
+
+def count_csv_rows(path):
+    """
+    Counts the data rows of a CSV file (header excluded)
+    """
+    with open(path, encoding='utf-8') as file:
+        return sum(1 for _ in file) - 1
+
+
+def box_score_paths(scale_dir, season_type):
+    """
+    Returns the traditional and advanced CSV paths get_box_scores writes for a season type
+    """
+    suffix = f"{SEASON.replace('-', '_')}_{season_type.replace(' ', '_')}.csv"
+    folder = os.path.join(scale_dir, 'src', 'data', 'box_scores')
+    return os.path.join(folder, f"traditional_{suffix}"), os.path.join(folder, f"advanced_{suffix}")
+
+
+def run_scale(scale, base_dir, args, reference, stub):
+    """
+    Runs every stage for scale seasons of games in a fresh directory laid out like the repository
+    stub is (payloads, counters) of the running mock server; the synthesize stage fills its payloads
+    Returns {stage: {"seconds", "rows", "rows_per_second", "peak_rss_mb"}}
+    """
+    from sqlalchemy import create_engine
+    from src.utils import data_clean
+    from src.utils.data_validate import validate_staged_tables
+    from src.utils.sql_upload import load_table_dataframes, save_tables
+
+    scale_dir = os.path.join(base_dir, f"{scale}x")
+    os.makedirs(os.path.join(scale_dir, 'src', 'data', 'box_scores'))
+    os.makedirs(os.path.join(scale_dir, 'src', 'utils'))
+    data_dir = os.path.join(scale_dir, 'src', 'data')
+    profile_prefix = os.path.join(args.profile_dir or base_dir, f"{scale}x_")
+    players, teams = reference
+    payloads, counters = stub
+    stages = {}
+
+    def record(name, function, rows=None):
+        result, seconds, peak_rss_mb = run_stage(name, function, args.profile, profile_prefix + name)
+        count = rows(result) if rows else result
+        stages[name] = {
+            "seconds": round(seconds, 3),
+            "rows": count,
+            "rows_per_second": round(count / seconds) if seconds > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb, 1)
+        }
+        return result
+
+    def synthesize():
+        games = synthetic_games(teams, seasons=scale, seed=args.seed)
+        traditional, advanced = synthetic_box_scores(players, teams, games, seed=args.seed)
+        payloads.clear()
+        if not args.from_csv:
+            payloads.update(player_stats_payloads(traditional, TRADITIONAL_COLUMNS, 'boxscoretraditionalv2'))
+            payloads.update(player_stats_payloads(advanced, ADVANCED_COLUMNS, 'boxscoreadvancedv2'))
+        return games, traditional, advanced
+
+    games, traditional, advanced = record(
+        'synthesize', synthesize, lambda result: len(result[1]) + len(result[2]))
+    shutil.copy(os.path.join(DATA_DIR, 'nba_players_detailed.csv'), os.path.join(data_dir, 'players_detailed.csv'))
+    shutil.copy(os.path.join(DATA_DIR, 'nba_teams_detailed.csv'), os.path.join(data_dir, 'nba_teams_detailed.csv'))
+
+    if args.from_csv:
+        for season_type in SEASON_TYPES:
+            traditional_file, advanced_file = box_score_paths(scale_dir, season_type)
+            traditional[traditional['SEASON_TYPE'] == season_type].to_csv(traditional_file, index=False)
+            advanced[advanced['SEASON_TYPE'] == season_type].to_csv(advanced_file, index=False)
+    else:
+        from src.utils.data_scrape import get_box_scores
+
+        counters["requests"] = 0
+
+        def scrape():
+            rows = 0
+            with working_directory(scale_dir):
+                for season_type in SEASON_TYPES:
+                    games_df = league_game_rows(games[games['SEASON_TYPE'] == season_type])
+                    scraped = get_box_scores(games_df, season=SEASON, season_type=season_type)
+                    rows += sum(len(df) for df in scraped if df is not None)
+            return rows
+
+        record('scrape', scrape)
+        print(f"  stub served {counters['requests']} requests")
+    payloads.clear()
+    del traditional, advanced
+
+    def clean():
+        with working_directory(os.path.join(scale_dir, 'src', 'utils')):
+            data_clean.main()
+        return count_csv_rows(os.path.join(data_dir, 'BoxScore.csv'))
+
+    record('clean', clean)
+
+    table_data = {
+        'teams': os.path.join(data_dir, 'Teams.csv'),
+        'players': os.path.join(data_dir, 'Players.csv'),
+        'box_score': os.path.join(data_dir, 'BoxScore.csv')
+    }
+    staged_rows = sum(count_csv_rows(path) for path in table_data.values())
+    report_path = os.path.join(scale_dir, 'validation_report.json')
+    record('validate', lambda: validate_staged_tables(table_data, report_path), lambda _: staged_rows)
+
+    def load():
+        dfs = load_table_dataframes(table_data)
+        if dfs is None:
+            sys.exit("The staged tables could not be loaded")
+        engine = create_engine(f"sqlite:///{os.path.join(scale_dir, 'nba.sqlite')}")
+        try:
+            if not save_tables(dfs, engine):
+                sys.exit("The staged tables could not be saved")
+        finally:
+            engine.dispose()
+        return sum(len(df) for df in dfs.values())
+
+    record('load', load)
+    return stages
+
+
+def print_report(report):
+    """
+    Prints one table row per scale and stage
+    """
+    print(f"\n{'scale':<7}{'stage':<12}{'seconds':>10}{'rows':>12}{'rows/s':>12}{'peak RSS MB':>13}")
+    for scale, stages in report["scales"].items():
+        for name in STAGES:
+            if name in stages:
+                stage = stages[name]
+                print(f"{scale:<7}{name:<12}{stage['seconds']:>10.2f}{stage['rows']:>12}"
+                      f"{stage['rows_per_second'] or 0:>12}{stage['peak_rss_mb']:>13.1f}")
+
+
+def main():
+    """
+    Runs the benchmark at each scale and prints (and optionally saves) the report
+    """
+    parser = argparse.ArgumentParser(description="Benchmark scraping, cleaning and loading on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1], help="seasons of games per run (1, 10, 50)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds per stub response")
+    parser.add_argument("--from-csv", action="store_true",
+                        help="skip the scrape stage and write the box score CSVs it would produce")
+    parser.add_argument("--profile", choices=["cprofile", "py-spy"], help="profile every stage")
+    parser.add_argument("--profile-dir", help="where to write .prof / .svg files (defaults to the work directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory")
+    parser.add_argument("--output", help="save the report as JSON")
+    args = parser.parse_args()
+
+    # Point the scraper at the stub before src.utils.config is imported; the stub replaces the
+    # API, so the scraper's rate-limit pauses would only measure sleep()
+    payloads = {}
+    server, stats_url, counters = start_mock_nba_stats(payloads, args.stub_latency)
+    os.environ["NBA_STATS_URL"] = stats_url
+    os.environ["NBA_STATS_DELAY_SCALE"] = "0"
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+
+    base_dir = tempfile.mkdtemp(prefix="nba_ingestion_")
+    print(f"Working in {base_dir}")
+    reference = load_reference_tables()
+    report = {"config": vars(args), "scales": {}}
+    try:
+        for scale in args.scales:
+            print(f"\n{scale}x a season:")
+            report["scales"][f"{scale}x"] = run_scale(scale, base_dir, args, reference, (payloads, counters))
+    finally:
+        server.shutdown()
+        if not args.keep and not (args.profile and not args.profile_dir):
+            shutil.rmtree(base_dir, ignore_errors=True)
+    print_report(report)
+    if args.profile:
+        print(f"\nProfiles written to {args.profile_dir or base_dir}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+intent_benchmark.py
+
+This file benchmarks the intent routers against the labeled question set in
+src/data/intent_questions.csv, reporting accuracy and microseconds per
+classification for the old substring checks, the regex rules and the
+n-gram logistic regression (accuracy from k-fold cross-validation). It also
+reports accuracy on src/data/intent_questions_holdout.csv, questions the rules
+were not written against and the model is not trained on
+
+Run from the repository root:
+    python benchmarks/intent_benchmark.py
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.nlp import (
+    INTENT_HOLDOUT_PATH,
+    classify_rules,
+    load_intent_examples,
+    train_intent_model,
+    predict_intent
+)
+
+
+def legacy_substring_intent(query):
+    """
+    The substring checks input.user_input used before the regex router
+    """
+    if any(k in query for k in ['show', 'describe', 'structure', 'schema', 'tables', 'columns']):
+        return "schema_explore"
+    if any(k in query for k in ['insert', 'update', 'delete', 'add', 'remove', 'change']):
+        return "data_modification"
+    return "data_query"
+
+
+def time_classifier(classify, questions, repeats):
+    """
+    Returns the mean microseconds per classification
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for question in questions:
+            classify(question)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeats * len(questions)) * 1e6
+
+
+def accuracy(classify, examples):
+    """
+    Returns the fraction of examples classified correctly and the misses
+    """
+    misses = [(q, intent, classify(q)) for q, intent in examples if classify(q) != intent]
+    return 1 - len(misses) / len(examples), misses
+
+
+def cross_validate(examples, folds, seed):
+    """
+    Returns the k-fold accuracy of the n-gram model and the held-out misses
+    """
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    correct = 0
+    misses = []
+    for fold in range(folds):
+        test = shuffled[fold::folds]
+        train = [ex for i, ex in enumerate(shuffled) if i % folds != fold]
+        model = train_intent_model(train)
+        for question, intent in test:
+            predicted, _ = predict_intent(model, question)
+            if predicted == intent:
+                correct += 1
+            else:
+                misses.append((question, intent, predicted))
+    return correct / len(shuffled), misses
+
+
+def main():
+    """
+    Runs the benchmark and prints a summary table
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the intent routers")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--holdout", default=INTENT_HOLDOUT_PATH)
+    parser.add_argument("--show-misses", action="store_true")
+    args = parser.parse_args()
+
+    examples = load_intent_examples()
+    holdout = load_intent_examples(args.holdout)
+    questions = [question for question, _ in examples]
+    model = train_intent_model(examples)
+
+    results = []
+    legacy_acc, legacy_misses = accuracy(legacy_substring_intent, examples)
+    results.append(("substring (old)", legacy_acc, legacy_misses,
+                    time_classifier(legacy_substring_intent, questions, args.repeats)))
+    rules_acc, rules_misses = accuracy(classify_rules, examples)
+    results.append(("regex rules", rules_acc, rules_misses,
+                    time_classifier(classify_rules, questions, args.repeats)))
+    model_acc, model_misses = cross_validate(examples, args.folds, args.seed)
+    results.append((f"n-gram model ({args.folds}-fold)", model_acc, model_misses,
+                    time_classifier(lambda q: predict_intent(model, q), questions, args.repeats)))
+
+    holdout_results = []
+    for name, classify in [("substring (old)", legacy_substring_intent),
+                           ("regex rules", classify_rules),
+                           ("n-gram model", lambda q: predict_intent(model, q)[0])]:
+        holdout_acc, holdout_misses = accuracy(classify, holdout)
+        holdout_results.append((f"{name} (held out)", holdout_acc, holdout_misses))
+
+    print(f"{len(examples)} labeled questions, {len(holdout)} held-out questions\n")
+    print(f"{'classifier':<26}{'accuracy':>10}{'us/query':>12}")
+    for name, acc, _, micros in results:
+        print(f"{name:<26}{acc:>10.1%}{micros:>12.2f}")
+    for name, acc, _ in holdout_results:
+        print(f"{name:<26}{acc:>10.1%}")
+
+    if args.show_misses:
+        for name, _, misses in [result[:3] for result in results] + holdout_results:
+            print(f"\n{name} misses:")
+            for question, expected, predicted in misses:
+                print(f"  {question!r}: expected {expected}, got {predicted}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+mock_nba_stats.py
+
+This file contains a local stand-in for the stats.nba.com box score
+endpoints used by the ingestion benchmark. It serves pre-rendered JSON
+responses by endpoint and GameID (404 for anything else) after an optional
+latency. Point the scraper at it with NBA_STATS_URL.
+"""
+
+import time
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def mock_handler(payloads, latency, counters):
+    """
+    Creates the request handler class serving GET /stats/<endpoint>?GameID=...
+    """
+
+    class MockNbaStatsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+            game_id = parse_qs(url.query).get('GameID', [''])[0]
+            payload = payloads.get((endpoint, game_id))
+            with counters["lock"]:
+                counters["requests"] += 1
+            time.sleep(latency)
+
+            if payload is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return MockNbaStatsHandler
+
+
+def start_mock_nba_stats(payloads, latency=0.0, port=0):
+    """
+    Starts the mock server on a background thread
+    payloads maps (endpoint, GameID) to response bytes; latency is in seconds per request
+    Returns (server, base_url, counters); call server.shutdown() to stop it
+    """
+    counters = {"requests": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), mock_handler(payloads, latency, counters))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/stats", counters
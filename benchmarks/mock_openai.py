@@ -0,0 +1,133 @@
+"""
+mock_openai.py
+
+This file contains a deterministic stand-in for the OpenAI chat completions
+API used by the benchmarks. It answers translation prompts with the SQL
+registered for the question, explanation prompts with a fixed explanation
+and anything else with a default query, after a configurable latency. It
+streams responses word by word when asked to. Point the app at it with
+OPENAI_BASE_URL.
+"""
+
+import re
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_SQL = "SELECT DISPLAY_FIRST_LAST, POSITION, TEAM_NAME FROM players LIMIT 10"
+QUESTION_PATTERN = re.compile(r'User Question:\s*(.+)')
+EXPLANATION_PATTERN = re.compile(r'SQL query:\s*(.+)')
+
+
+def normalize_question(question):
+    """
+    Lowercases a question and collapses its whitespace, so lookups ignore formatting
+    """
+    return ' '.join(question.lower().split())
+
+
+def mock_answer(prompt, answers):
+    """
+    Picks the deterministic response for a prompt
+    """
+    question = QUESTION_PATTERN.search(prompt)
+    if question:
+        return answers.get(normalize_question(question.group(1)), DEFAULT_SQL)
+    if "explaining SQL" in prompt:
+        sql = EXPLANATION_PATTERN.search(prompt)
+        return (
+            "This query reads the requested columns from the NBA tables,\n"
+            f"filtering and ordering them as the question asks:\n{sql.group(1).strip() if sql else ''}")
+    return DEFAULT_SQL
+
+
+def mock_handler(answers, latency, token_latency, counters):
+    """
+    Creates the request handler class serving POST /v1/chat/completions
+    """
+
+    class MockOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            prompt = body["messages"][-1]["content"]
+            text = mock_answer(prompt, answers)
+            tokens = re.findall(r'\S+\s*', text)
+            with counters["lock"]:
+                counters["requests"] += 1
+            time.sleep(latency)
+
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(token_latency)
+                    self.write_chunk(self.sse({"content": token}, body["model"], None))
+                self.write_chunk(self.sse({}, body["model"], "stop"))
+                self.write_chunk(b"data: [DONE]\n\n")
+                self.write_chunk(b"")
+                return
+
+            time.sleep(token_latency * len(tokens))
+            payload = json.dumps({
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": len(prompt) // 4 + len(tokens)
+                }
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def sse(self, delta, model, finish_reason):
+            chunk = {
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        def write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return MockOpenAIHandler
+
+
+def start_mock_openai(answers, latency=0.3, token_latency=0.0, port=0):
+    """
+    Starts the mock server on a background thread
+    answers maps questions to the SQL to return for them; latency and token_latency are in seconds
+    Returns (server, base_url, counters); call server.shutdown() to stop it
+    """
+    counters = {"requests": 0, "lock": threading.Lock()}
+    answers = {normalize_question(question): sql for question, sql in answers.items()}
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port), mock_handler(answers, latency, token_latency, counters))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1", counters
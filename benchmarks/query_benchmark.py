@@ -0,0 +1,321 @@
+"""
+query_benchmark.py
+
+This file replays a corpus of NBA questions through input.handle_query
+without network access or MySQL. OpenAI is replaced by the deterministic
+mock server in mock_openai.py (with a configurable latency) and the database
+by the SQLite replica built from src/data/*.csv plus synthetic box scores.
+It reports throughput, end-to-end and per-stage p50/p95/p99 latencies (from
+the telemetry spans) and memory, and can save the numbers as JSON and fail
+when they regress against a saved baseline.
+
+Run from the repository root:
+    python benchmarks/query_benchmark.py --repeats 5 --concurrency 4 --llm-latency 0.3
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import argparse
+import tempfile
+import resource
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mock_openai import start_mock_openai
+from synthetic import load_reference_tables, synthetic_games, synthetic_box_scores, combined_box_scores
+
+# Questions seeded from the translation prompt examples and EXAMPLE_QUERIES;
+# an int is an index into EXAMPLE_QUERIES
+CORPUS = [
+    ("What tables are in the database?", "SHOW TABLES"),
+    ("Show me the columns in the players table", "DESCRIBE players"),
+    ("Tell me about the teams table structure", "SHOW COLUMNS FROM teams"),
+    ("Give me sample data from the box_score table", "SELECT * FROM box_score LIMIT 5"),
+    ("Show me the 5 tallest players", 6),
+    ("List 7 Lakers players", 7),
+    ("Show me the 5 teams with the most players", 8),
+    ("Show top scorers, limit 10, ordered by average points descending", 17),
+    ("Get player stats by team, limit 10, ordered by average points descending", 18),
+    ("Find five teams and their average points, limit 5, ordered by average points descending", 19),
+    ("Show the 10 highest scoring individual games", 11),
+    ("Show 5 players with their position and height", 4),
+    ("List every team's abbreviation, nickname and city", 5),
+    ("What is the average weight by position?", 9),
+    ("List 10 players with their team nickname and city", 10),
+    ("Who scores the most points per game, with their team and total rebounds?", 12),
+    ("Which 5 teams have the highest average points per player?", 13)
+]
+
+PERCENTILES = (50, 95, 99)
+
+
+def configure_environment(work_dir):
+    """
+    Points the app at the SQLite stand-in in work_dir
+    Must run before anything under src is imported, since config.py reads the environment on import;
+    OPENAI_BASE_URL is set once the mock server is up, before the OpenAI client is created
+    Stray MySQL connections go to a closed local port so they fail at once
+    """
+    os.environ.update({
+        "OPENAI_API_KEY": "benchmark",
+        "REPLICA_ENABLED": "true",
+        "REPLICA_PATH": os.path.join(work_dir, "replica.sqlite"),
+        "SCHEMA_VERSION_PATH": os.path.join(work_dir, "schema_version"),
+        "TELEMETRY_EXPORTER": "jsonl",
+        "TELEMETRY_PATH": os.path.join(work_dir, "spans.jsonl"),
+        "QUERY_LOG_PATH": os.path.join(work_dir, "query_log.sqlite"),
+        "DB_POOL_SIZE": "0",
+        "DB_HOST": "127.0.0.1",
+        "DB_PORT": "9"
+    })
+
+
+def build_stand_in(work_dir, seasons, seed):
+    """
+    Builds the SQLite replica from the real players and teams and synthetic box scores
+    """
+    from src.services.replica import build_replica
+
+    players, teams = load_reference_tables()
+    traditional, advanced = synthetic_box_scores(players, teams, synthetic_games(teams, seasons, seed), seed)
+    box_score_path = os.path.join(work_dir, "box_scores.csv")
+    combined_box_scores(traditional, advanced).to_csv(box_score_path, index=False)
+    table_data = {
+        "teams": os.path.join(os.path.dirname(__file__), '..', 'src', 'data', 'nba_teams_detailed.csv'),
+        "players": os.path.join(os.path.dirname(__file__), '..', 'src', 'data', 'nba_players_detailed.csv'),
+        "box_score": box_score_path
+    }
+    if not build_replica(table_data=table_data):
+        sys.exit("Could not build the SQLite stand-in")
+
+
+def sqlite_schema(path):
+    """
+    Reads the stand-in's tables in the shape schema.load_schema returns for MySQL
+    The replica has no primary keys, so each table's first replica index stands in for one
+    """
+    from src.services.replica import REPLICA_INDEXES
+
+    connection = sqlite3.connect(path)
+    try:
+        tables = {}
+        names = [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        for name in names:
+            columns = connection.execute(f"PRAGMA table_info({name})").fetchall()
+            indexes = {}
+            for index in connection.execute(f"PRAGMA index_list({name})").fetchall():
+                indexes[index[1]] = {
+                    "columns": [row[2] for row in connection.execute(f"PRAGMA index_info({index[1]})")],
+                    "unique": bool(index[2])
+                }
+            tables[name] = {
+                "rows": connection.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0],
+                "columns": [{
+                    "name": column[1],
+                    "type": column[2].lower(),
+                    "data_type": column[2].lower(),
+                    "nullable": "NO" if column[3] else "YES",
+                    "key": "",
+                    "default": column[4],
+                    "extra": ""
+                } for column in columns],
+                "primary_keys": list(REPLICA_INDEXES.get(name, [[]])[0]),
+                "foreign_keys": [],
+                "indexes": indexes
+            }
+    finally:
+        connection.close()
+    return {"tables": tables, "database": "benchmark"}
+
+
+def use_stand_in():
+    """
+    Sends the two MySQL-only reads (schema metadata, entity index) to the SQLite stand-in;
+    SELECTs reach it through the replica routing in db.execute_sql
+    """
+    from src.services import schema, entities
+    from src.services.replica import query_replica
+    from src.utils.config import REPLICA_PATH
+
+    def stand_in_query(query, *args, **kwargs):
+        return query_replica(query) or {"success": False, "error": "The stand-in could not run the query"}
+
+    schema.load_schema = lambda: sqlite_schema(REPLICA_PATH)
+    entities.execute_query = stand_in_query
+
+
+def percentiles(values):
+    """
+    Returns the count, mean and nearest-rank p50/p95/p99 of a list of milliseconds
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    summary = {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 3)}
+    for percentile in PERCENTILES:
+        rank = max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)
+        summary[f"p{percentile}"] = round(ordered[rank], 3)
+    return summary
+
+
+def stage_latencies(spans_path):
+    """
+    Groups the telemetry spans by stage and summarizes their durations
+    """
+    durations = {}
+    with open(spans_path, encoding="utf-8") as file:
+        for line in file:
+            span = json.loads(line)
+            durations.setdefault(span["name"], []).append(span["duration_ms"])
+    return {name: percentiles(values) for name, values in sorted(durations.items())}
+
+
+def run_corpus(handle_query, questions, repeats, concurrency, stream):
+    """
+    Replays the questions repeats times on concurrency threads
+    Returns (wall seconds, [(pass number, milliseconds, result)])
+    """
+    def ask(task):
+        repeat, question = task
+        on_event = (lambda stage, payload: None) if stream else None
+        start = time.perf_counter()
+        result = handle_query(question, on_event=on_event)
+        return repeat, (time.perf_counter() - start) * 1000, result
+
+    tasks = [(repeat, question) for repeat in range(repeats) for question in questions]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(ask, tasks))
+    return time.perf_counter() - start, timings
+
+
+def check_baseline(report, baseline_path, max_regression):
+    """
+    Compares throughput and end-to-end p95 with a saved report, returns the regressions found
+    """
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions = []
+    if report["throughput_qps"] < baseline["throughput_qps"] * (1 - max_regression):
+        regressions.append(
+            f"throughput {report['throughput_qps']:.2f} q/s vs {baseline['throughput_qps']:.2f} q/s")
+    for phase in ("cold", "warm"):
+        now = report["latency_ms"][phase].get("p95")
+        before = baseline["latency_ms"].get(phase, {}).get("p95")
+        if now is not None and before and now > before * (1 + max_regression):
+            regressions.append(f"{phase} p95 {now:.1f} ms vs {before:.1f} ms")
+    return regressions
+
+
+def print_report(report):
+    """
+    Prints the summary tables
+    """
+    print(f"\n{report['questions']} questions in {report['wall_seconds']:.2f}s: "
+          f"{report['throughput_qps']:.2f} questions/s, {report['errors']} errors, "
+          f"{report['llm_requests']} LLM requests")
+    print(f"\n{'latency (ms)':<22}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    rows = [(phase, report["latency_ms"][phase]) for phase in ("cold", "warm", "all")]
+    rows += [(f"  {name}", summary) for name, summary in report["stages_ms"].items()]
+    for name, summary in rows:
+        if summary["count"]:
+            print(f"{name:<22}{summary['count']:>7}{summary['p50']:>10.2f}"
+                  f"{summary['p95']:>10.2f}{summary['p99']:>10.2f}")
+    memory = report["memory"]
+    print(f"\npeak RSS {memory['peak_rss_mb']:.1f} MB", end="")
+    if memory.get("tracemalloc_peak_mb") is not None:
+        print(f", peak Python allocations {memory['tracemalloc_peak_mb']:.1f} MB", end="")
+    print(f"\ncoalescing: {report['coalescing']}")
+
+
+def main():
+    """
+    Runs the benchmark and prints (and optionally saves) the report
+    """
+    parser = argparse.ArgumentParser(description="Benchmark handle_query offline")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the corpus (the first is cold)")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per mock completion")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per mock token")
+    parser.add_argument("--stream", action="store_true", help="stream SQL and explanations like the UI")
+    parser.add_argument("--seasons", type=int, default=1, help="seasons of synthetic box scores")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tracemalloc", action="store_true", help="also track peak Python allocations (slower)")
+    parser.add_argument("--output", help="save the report as JSON")
+    parser.add_argument("--baseline", help="fail if the report regresses against this saved report")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="nba_benchmark_")
+    configure_environment(work_dir)
+
+    from src.utils.config import EXAMPLE_QUERIES
+    answers = {
+        question: EXAMPLE_QUERIES[sql] if isinstance(sql, int) else sql
+        for question, sql in CORPUS
+    }
+    server, mock_url, counters = start_mock_openai(answers, args.llm_latency, args.token_latency)
+    os.environ["OPENAI_BASE_URL"] = mock_url
+
+    print(f"Building the SQLite stand-in in {work_dir}...")
+    build_stand_in(work_dir, args.seasons, args.seed)
+    use_stand_in()
+
+    from src.services.input import handle_query
+    from src.services.single_flight import single_flight_stats
+    from src.services.telemetry import close_exporter
+    from src.utils.config import TELEMETRY_PATH
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    wall, timings = run_corpus(
+        handle_query, [question for question, _ in CORPUS], args.repeats, args.concurrency, args.stream)
+    tracemalloc_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    close_exporter()
+    server.shutdown()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+    report = {
+        "config": vars(args),
+        "questions": len(timings),
+        "wall_seconds": round(wall, 3),
+        "throughput_qps": round(len(timings) / wall, 3),
+        "errors": sum(1 for _, _, result in timings if result.get("error")),
+        "llm_requests": counters["requests"],
+        "latency_ms": {
+            "cold": percentiles([ms for repeat, ms, _ in timings if repeat == 0]),
+            "warm": percentiles([ms for repeat, ms, _ in timings if repeat > 0]),
+            "all": percentiles([ms for _, ms, _ in timings])
+        },
+        "stages_ms": stage_latencies(TELEMETRY_PATH),
+        "memory": {
+            "peak_rss_mb": round(peak_rss_mb, 1),
+            "tracemalloc_peak_mb": round(tracemalloc_peak / (1024 * 1024), 1) if tracemalloc_peak else None
+        },
+        "coalescing": single_flight_stats()
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved report to {args.output}")
+    if args.baseline:
+        regressions = check_baseline(report, args.baseline, args.max_regression)
+        if regressions:
+            print("Regressions against the baseline: " + "; ".join(regressions))
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+synthetic.py
+
+This file contains the synthetic NBA data used by the benchmarks: seasons of
+games between the real teams in src/data, with traditional and advanced box
+scores for the real rosters shaped like the stats.nba.com PlayerStats result
+sets the scraper reads, as DataFrames or as the JSON responses themselves.
+Everything is drawn from a seeded generator, so the same arguments always
+produce the same data.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'data')
+
+REGULAR_SEASON_GAMES = 1230
+PLAYOFF_GAMES = 80
+FIRST_SEASON = 2023
+
+IDENTITY_COLUMNS = [
+    'GAME_ID', 'TEAM_ID', 'TEAM_ABBREVIATION', 'TEAM_CITY', 'PLAYER_ID', 'PLAYER_NAME',
+    'NICKNAME', 'START_POSITION', 'COMMENT', 'MIN'
+]
+TRADITIONAL_COLUMNS = IDENTITY_COLUMNS + [
+    'FGM', 'FGA', 'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'FTM', 'FTA', 'FT_PCT', 'OREB', 'DREB',
+    'REB', 'AST', 'STL', 'BLK', 'TO', 'PF', 'PTS', 'PLUS_MINUS'
+]
+ADVANCED_COLUMNS = IDENTITY_COLUMNS + [
+    'OFF_RATING', 'DEF_RATING', 'NET_RATING', 'AST_PCT', 'AST_TOV', 'OREB_PCT', 'DREB_PCT',
+    'REB_PCT', 'EFG_PCT', 'TS_PCT', 'USG_PCT', 'PACE', 'POSS', 'PIE'
+]
+GAME_COLUMNS = ['GAME_DATE', 'SEASON', 'SEASON_TYPE']
+
+
+def load_reference_tables():
+    """
+    Reads the real players and teams (uppercase columns only, like sql_upload does)
+    """
+    players = pd.read_csv(os.path.join(DATA_DIR, 'nba_players_detailed.csv'))
+    teams = pd.read_csv(os.path.join(DATA_DIR, 'nba_teams_detailed.csv'))
+    players = players[[col for col in players.columns if col.upper() == col]]
+    teams = teams[[col for col in teams.columns if col.upper() == col]].drop_duplicates(subset=['TEAM_ID'])
+    return players, teams
+
+
+def season_label(start_year):
+    """
+    Formats a season the way the NBA API does ("2023-24")
+    """
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+
+def synthetic_games(teams, seasons=1, seed=7, playoffs=True):
+    """
+    Builds a schedule of REGULAR_SEASON_GAMES (and PLAYOFF_GAMES) games per season between random pairs of teams
+    Returns a DataFrame of GAME_ID, GAME_DATE, SEASON, SEASON_TYPE, HOME_TEAM_ID, AWAY_TEAM_ID
+    """
+    rng = np.random.default_rng(seed)
+    team_ids = teams['TEAM_ID'].to_numpy()
+    frames = []
+    for offset in range(seasons):
+        start_year = FIRST_SEASON - offset
+        season_types = [('Regular Season', '2', REGULAR_SEASON_GAMES, 10, 170)]
+        if playoffs:
+            season_types.append(('Playoffs', '4', PLAYOFF_GAMES, 200, 60))
+        for season_type, type_code, count, first_day, days in season_types:
+            pairs = np.array([rng.choice(len(team_ids), 2, replace=False) for _ in range(count)])
+            dates = pd.Timestamp(f"{start_year}-10-01") + pd.to_timedelta(
+                np.sort(rng.integers(first_day, first_day + days, count)), unit='D')
+            frames.append(pd.DataFrame({
+                'GAME_ID': [f"00{type_code}{start_year % 100:02d}{number:05d}" for number in range(1, count + 1)],
+                'GAME_DATE': dates.strftime('%Y-%m-%d'),
+                'SEASON': season_label(start_year),
+                'SEASON_TYPE': season_type,
+                'HOME_TEAM_ID': team_ids[pairs[:, 0]],
+                'AWAY_TEAM_ID': team_ids[pairs[:, 1]]
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def player_game_rows(players, teams, games, rng):
+    """
+    Picks the players who appear in each game: 8 to 10 from each team's roster
+    """
+    rosters = {
+        team_id: roster[['PERSON_ID', 'DISPLAY_FIRST_LAST']].to_numpy()
+        for team_id, roster in players.groupby('TEAM_ID')}
+    team_info = teams.set_index('TEAM_ID')
+    rows = []
+    for game in games.itertuples(index=False):
+        for team_id in (game.HOME_TEAM_ID, game.AWAY_TEAM_ID):
+            roster = rosters.get(team_id)
+            if roster is None or len(roster) == 0:
+                continue
+            used = min(len(roster), int(rng.integers(8, 11)))
+            for order, index in enumerate(rng.choice(len(roster), used, replace=False)):
+                rows.append((
+                    game.GAME_ID, team_id, team_info.at[team_id, 'ABBREVIATION'],
+                    team_info.at[team_id, 'CITY'], int(roster[index][0]), roster[index][1],
+                    team_info.at[team_id, 'NICKNAME'], ('F', 'F', 'C', 'G', 'G')[order] if order < 5 else '',
+                    game.GAME_DATE, game.SEASON, game.SEASON_TYPE))
+    return pd.DataFrame(rows, columns=[
+        'GAME_ID', 'TEAM_ID', 'TEAM_ABBREVIATION', 'TEAM_CITY', 'PLAYER_ID', 'PLAYER_NAME',
+        'NICKNAME', 'START_POSITION'] + GAME_COLUMNS)
+
+
+def synthetic_box_scores(players, teams, games, seed=7):
+    """
+    Draws a traditional and an advanced box score line for every player in every game
+    Returns (traditional, advanced) DataFrames with the PlayerStats columns plus GAME_DATE, SEASON and SEASON_TYPE
+    """
+    rng = np.random.default_rng(seed)
+    base = player_game_rows(players, teams, games, rng)
+    n = len(base)
+    minutes = rng.uniform(4, 40, n)
+    seconds = rng.integers(0, 60, n)
+    base['COMMENT'] = ''
+    base['MIN'] = [f"{int(m)}:{s:02d}" for m, s in zip(minutes, seconds)]
+
+    fga = rng.poisson(minutes * 0.42)
+    fgm = rng.binomial(fga, 0.47)
+    fg3a = rng.binomial(fga, 0.38)
+    fg3m = np.minimum(rng.binomial(fg3a, 0.36), fgm)
+    fta = rng.poisson(minutes * 0.1)
+    ftm = rng.binomial(fta, 0.78)
+    oreb = rng.poisson(minutes * 0.05)
+    dreb = rng.poisson(minutes * 0.15)
+    ast = rng.poisson(minutes * 0.12)
+    tov = rng.poisson(minutes * 0.05)
+    pts = 2 * fgm + fg3m + ftm
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        traditional = base.assign(
+            FGM=fgm, FGA=fga, FG_PCT=np.round(np.where(fga > 0, fgm / fga, 0), 3),
+            FG3M=fg3m, FG3A=fg3a, FG3_PCT=np.round(np.where(fg3a > 0, fg3m / fg3a, 0), 3),
+            FTM=ftm, FTA=fta, FT_PCT=np.round(np.where(fta > 0, ftm / fta, 0), 3),
+            OREB=oreb, DREB=dreb, REB=oreb + dreb, AST=ast,
+            STL=rng.poisson(minutes * 0.03), BLK=rng.poisson(minutes * 0.02), TO=tov,
+            PF=rng.poisson(minutes * 0.06), PTS=pts,
+            PLUS_MINUS=np.round(rng.normal(0, 8, n)).astype(int))
+
+        off_rating = np.round(rng.normal(112, 10, n), 1)
+        def_rating = np.round(rng.normal(112, 10, n), 1)
+        shots = fga + 0.44 * fta
+        advanced = base.assign(
+            OFF_RATING=off_rating, DEF_RATING=def_rating, NET_RATING=np.round(off_rating - def_rating, 1),
+            AST_PCT=np.round(rng.uniform(0, 0.4, n), 3),
+            AST_TOV=np.round(np.where(tov > 0, ast / tov, ast), 2),
+            OREB_PCT=np.round(rng.uniform(0, 0.15, n), 3), DREB_PCT=np.round(rng.uniform(0, 0.3, n), 3),
+            REB_PCT=np.round(rng.uniform(0, 0.2, n), 3),
+            EFG_PCT=np.round(np.where(fga > 0, (fgm + 0.5 * fg3m) / fga, 0), 3),
+            TS_PCT=np.round(np.where(shots > 0, pts / (2 * shots), 0), 3),
+            USG_PCT=np.round(rng.uniform(0.08, 0.35, n), 3),
+            PACE=np.round(rng.normal(99, 3, n), 2), POSS=np.round(minutes * 2.1).astype(int),
+            PIE=np.round(rng.uniform(-0.05, 0.25, n), 3))
+
+    return traditional[TRADITIONAL_COLUMNS + GAME_COLUMNS], advanced[ADVANCED_COLUMNS + GAME_COLUMNS]
+
+
+def combined_box_scores(traditional, advanced):
+    """
+    Joins the traditional and advanced lines into box_score table rows, as data_clean does
+    """
+    extra = [col for col in advanced.columns if col not in traditional.columns]
+    return traditional.merge(advanced[['GAME_ID', 'PLAYER_ID'] + extra], on=['GAME_ID', 'PLAYER_ID'])
+
+
+def league_game_rows(games):
+    """
+    Shapes a schedule like the LeagueGameFinder results the scraper is given: one row per team per game
+    """
+    home = games.assign(TEAM_ID=games['HOME_TEAM_ID'], MATCHUP='vs.')
+    away = games.assign(TEAM_ID=games['AWAY_TEAM_ID'], MATCHUP='@')
+    rows = pd.concat([home, away]).sort_values(['GAME_DATE', 'GAME_ID'], kind='stable')
+    return rows[['SEASON', 'TEAM_ID', 'GAME_ID', 'GAME_DATE', 'MATCHUP']].reset_index(drop=True)
+
+
+def player_stats_payloads(box_scores, columns, endpoint):
+    """
+    Renders each game's box score lines as the stats.nba.com JSON response for that game
+    Returns {(endpoint, GAME_ID): response bytes}
+    """
+    values = box_scores[columns].astype(object)
+    rows = values.where(values.notna(), None).to_numpy().tolist()
+    payloads = {}
+    for game_id, positions in box_scores.groupby('GAME_ID', sort=False).indices.items():
+        payloads[(endpoint, game_id)] = json.dumps({
+            "resource": "boxscore",
+            "parameters": {"GameID": game_id, "StartPeriod": 0, "EndPeriod": 10},
+            "resultSets": [{
+                "name": "PlayerStats",
+                "headers": columns,
+                "rowSet": [rows[position] for position in positions]
+            }]
+        }, default=lambda value: value.item()).encode('utf-8')
+    return payloads
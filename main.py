@@ -5,20 +5,43 @@ This file contains the main function for the NBA database app on Streamlit
 """
 
 import os
-import re
 import sys
 import time
+import tempfile
+import importlib.util
 import pandas as pd
 import streamlit as st
 import mysql.connector
 from sqlalchemy import exc as sqlalchemy_exc
 from pandas.errors import EmptyDataError, ParserError
-from src.services.input import handle_query
-from src.services.modification import execute_modification, verify_modification
-from src.services.db import execute_sql
+from src.services.modification import verify_modification, split_modification
+from src.services.db import get_pool
+from src.services.translation import get_openai_client
+from src.services.schema import get_schema
+from src.services.entities import get_entity_index
+from src.services.pagination import first_page
+from src.utils.sql_parser import parse_sql
+from src.utils.config import OPENAI_API_KEY, DEFAULT_QUERY_LIMIT, RESULT_PAGE_SIZE, API_URL
+from src.services.history import history_entry, add_history_entry, history_result
+
+if API_URL:
+    from src.services.api_client import (
+        handle_query,
+        execute_modification,
+        paging_plan,
+        fetch_page,
+        estimate_count,
+        export_result
+    )
+else:
+    from src.services.input import handle_query
+    from src.services.modification import execute_modification
+    from src.services.pagination import paging_plan, fetch_page, estimate_count, export_result
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
+STAGE_INTENTS = ('schema_explore', 'data_query', 'data_modification')
+
 st.set_page_config(
     page_title="NBA Database Explorer",
     page_icon="🏀",
@@ -74,22 +97,149 @@ def init_session_state():
     """
     if 'query_history' not in st.session_state:
         st.session_state.query_history = []
+    if 'displayed_entry' not in st.session_state:
+        st.session_state.displayed_entry = None
+        st.session_state.displayed_from_history = False
+    if 'pager' not in st.session_state:
+        st.session_state.pager = None
+    if 'pending_modification' not in st.session_state:
+        st.session_state.pending_modification = None
+        st.session_state.confirmed_modification = None
+
+
+@st.cache_resource
+def load_shared_resources():
+    """
+    Creates the process-wide resources once when the server starts, so the first query of
+    every session reuses them: the MySQL pool, the OpenAI client, the schema metadata and
+    the player/team entity index
+    A thin client (API_URL set) leaves all of these to the API server
+    """
+    if API_URL:
+        return {}
+    return {
+        "pool": get_pool(),
+        "openai_client": get_openai_client() if OPENAI_API_KEY else None,
+        "schema": get_schema(),
+        "entity_index": get_entity_index()
+    }
+
+
+def progress_renderer():
+    """
+    Creates placeholders for the live stages of a query and returns the on_event callback that fills them:
+    the SQL appears while it is written, the first rows as soon as they are fetched, then the explanation
+    """
+    status = st.empty()
+    sql_box = st.empty()
+    rows_box = st.empty()
+    explanation_box = st.empty()
+    streamed = {"sql": "", "explanation": ""}
+    status.info("Understanding your question...")
+
+    def on_event(stage, payload):
+        if stage == "intent":
+            status.info("Writing SQL..." if payload["intent"] in STAGE_INTENTS else "Processing your query...")
+        elif stage == "sql_token":
+            streamed["sql"] += payload["text"]
+            sql_box.code(streamed["sql"], language="sql")
+        elif stage == "sql":
+            streamed["sql"] = payload["sql_query"]
+            sql_box.code(streamed["sql"], language="sql")
+        elif stage == "validation" and not payload["valid"]:
+            status.warning(f"The SQL did not pass validation: {payload['error']}")
+        elif stage == "execution_start":
+            status.info("Running the query...")
+        elif stage == "rows":
+            rows = payload["result"].get("data") or []
+            row_count = payload["result"].get("row_count", len(rows))
+            status.info(f"{row_count} rows returned. Explaining the query...")
+            if rows:
+                rows_box.dataframe(pd.DataFrame(rows[:RESULT_PAGE_SIZE]), use_container_width=True)
+        elif stage == "explanation_token":
+            streamed["explanation"] += payload["text"]
+            explanation_box.markdown(streamed["explanation"])
+        elif stage == "error":
+            status.error(payload["error"])
+
+    return on_event
 
 
 def handle_user_query(query):
     """
     Processes user query and returns results
+    Each stage is shown as it happens, then replaced by the full result
+    The session history keeps a compact entry whose rows live in the shared result store
     """
-    with st.spinner('Processing your query...'):
-        result = handle_query(query)
+    live = st.empty()
+    with live.container():
+        start = time.perf_counter()
+        result = handle_query(query, on_event=progress_renderer())
+    live.empty()
 
-        st.session_state.query_history.append({
-            "query": query,
-            "result": result,
-            "timestamp": time.strftime("%H:%M:%S")
-        })
+    entry = history_entry(query, result, time.perf_counter() - start)
+    add_history_entry(st.session_state.query_history, entry)
+    show_entry(entry, from_history=False)
 
-        return result
+    return result
+
+
+def display_history():
+    """
+    Lists past queries of this session, newest first, with a button to show each result again
+    """
+    history = st.session_state.query_history
+    if not history:
+        return
+
+    with st.expander(f"Query history ({len(history)})"):
+        for index in range(len(history) - 1, -1, -1):
+            entry = history[index]
+            details = f"{entry['elapsed']:.2f}s"
+            if entry.get("row_count") is not None:
+                details += f", {entry['row_count']} rows"
+            st.button(
+                f"{entry['timestamp']} · {entry['query']} ({details})",
+                key=f"history_{index}",
+                on_click=show_entry,
+                args=(entry,))
+
+
+def show_entry(entry, from_history=True):
+    """
+    Makes an entry the displayed result, kept across reruns (e.g. paging), starting at its first page
+    Also the history buttons' callback, so the selection is made before the page reruns
+    """
+    reset_pager()
+    st.session_state.displayed_entry = entry
+    st.session_state.displayed_from_history = from_history
+
+
+def display_history_entry(entry, from_history=True):
+    """
+    Re-displays a past result from the result store without running the query again
+    """
+    if from_history:
+        st.caption(f"From your history: \"{entry['query']}\" at {entry['timestamp']} ({entry['elapsed']:.2f}s)")
+    if entry.get("error"):
+        st.error(f"Error: {entry['error']}")
+        return
+    if entry.get("query_type") == 'data_modification':
+        if not from_history:
+            return
+        st.markdown("#### SQL Query")
+        st.markdown(
+            f"<div class='sql-code'>{entry['sql_query']}</div>",
+            unsafe_allow_html=True)
+        st.info("Modifications are not re-run from the history. Submit the request again to repeat it.")
+        return
+
+    result = history_result(entry)
+    if result is None:
+        if entry.get("result_handle") is not None:
+            st.info("This result is no longer stored. Submit the question again to re-run it.")
+        return
+    display_data_results(result)
 
 
 def display_data_results(result):
@@ -109,58 +259,231 @@ def display_data_results(result):
                     st.write(result['explanation'])
 
         if 'raw_result' in result and 'data' in result['raw_result'] and result['raw_result']['data']:
-            df = pd.DataFrame(result['raw_result']['data'])
-            st.dataframe(df, use_container_width=True)
+            display_result_pages(result)
         else:
             st.markdown(result['formatted_result'])
     else:
         st.warning("No results to display.")
 
 
-def execute_modification_directly(result):
+def reset_pager():
     """
-    Executes a modification query
+    Forgets the displayed result's page and removes its prepared download
     """
-    st.markdown("### Data Modification")
+    pager = st.session_state.get("pager")
+    if pager and pager.get("download"):
+        try:
+            os.remove(pager["download"]["path"])
+        except OSError:
+            pass
+    st.session_state.pager = None
+
+
+def get_pager(result):
+    """
+    Gets the paging state of the displayed result, starting a new one when the result changes
+    Results that may have been cut off at DEFAULT_QUERY_LIMIT are paged from the database,
+    everything else from the rows already fetched
+    """
+    pager = st.session_state.pager
+    if pager is not None and pager["sql_query"] == result.get("sql_query"):
+        return pager
+
+    reset_pager()
+    raw_result = result["raw_result"]
+    plan = None
+    if result.get("sql_query") and raw_result.get("source") != "schema_cache" \
+            and not raw_result.get("cost_guard") and len(raw_result["data"]) >= DEFAULT_QUERY_LIMIT \
+            and not parse_sql(result["sql_query"])["has_limit"]:
+        plan = paging_plan(result["sql_query"])
+    pager = {
+        "sql_query": result.get("sql_query"),
+        "plan": plan,
+        "page": 0,
+        "keys": [None],
+        "estimate": (raw_result.get("rows_estimate") or estimate_count(plan)) if plan else None,
+        "download": None
+    }
+    st.session_state.pager = pager
+    return pager
+
+
+def change_page(step):
+    """
+    Previous/Next button callback
+    """
+    st.session_state.pager["page"] = max(st.session_state.pager["page"] + step, 0)
+
+
+def display_result_pages(result):
+    """
+    Displays one page of RESULT_PAGE_SIZE rows at a time with a row count (or estimate) and a download
+    """
+    pager = get_pager(result)
+    page = pager["page"]
+    rows = result["raw_result"]["data"]
+
+    if pager["plan"] is not None:
+        page_result = first_page(pager["plan"], result["raw_result"]) if page == 0 else None
+        if page_result is None:
+            page_result = fetch_page(pager["plan"], page, pager["keys"][page])
+        if not page_result["success"]:
+            st.error(f"Could not fetch page {page + 1}: {page_result['error']}")
+            return
+        page_rows = page_result["rows"]
+        has_more = page_result["has_more"]
+        if has_more and len(pager["keys"]) == page + 1:
+            pager["keys"].append(page_result["next_key"])
+        if has_more:
+            total = f"about {pager['estimate']:,} rows (estimate)" if pager["estimate"] else "more rows"
+        else:
+            total = f"{page * RESULT_PAGE_SIZE + len(page_rows):,} rows"
+    else:
+        start = page * RESULT_PAGE_SIZE
+        page_rows = rows[start:start + RESULT_PAGE_SIZE]
+        has_more = len(rows) > start + RESULT_PAGE_SIZE
+        total = f"{len(rows):,} rows"
+
+    st.dataframe(pd.DataFrame(page_rows), use_container_width=True)
+    if page > 0 or has_more:
+        previous_column, status_column, next_column = st.columns([1, 3, 1])
+        previous_column.button(
+            "Previous", key="page_previous", disabled=page == 0, on_click=change_page, args=(-1,))
+        status_column.caption(f"Page {page + 1} · {total}")
+        next_column.button(
+            "Next", key="page_next", disabled=not has_more, on_click=change_page, args=(1,))
+    display_download(result, pager)
+
+
+def display_download(result, pager):
+    """
+    Offers the whole result as CSV or Parquet, streamed from the database when it is paged from there
+    """
+    formats = ["CSV", "Parquet"] if importlib.util.find_spec("pyarrow") else ["CSV"]
+    with st.expander("Download results"):
+        fmt = st.radio("Format", formats, horizontal=True, key="download_format")
+        if st.button("Prepare download", key="prepare_download"):
+            extension = fmt.lower()
+            with tempfile.NamedTemporaryFile(suffix=f".{extension}", delete=False) as sink:
+                if pager["plan"] is not None:
+                    export = export_result(pager["plan"], sink, extension)
+                else:
+                    df = pd.DataFrame(result["raw_result"]["data"])
+                    if extension == "parquet":
+                        df.to_parquet(sink, index=False)
+                    else:
+                        sink.write(df.to_csv(index=False).encode("utf-8"))
+                    export = {"success": True, "row_count": len(df)}
+            if export["success"]:
+                if pager.get("download"):
+                    os.remove(pager["download"]["path"])
+                pager["download"] = {
+                    "path": sink.name,
+                    "file_name": f"nba_results.{extension}",
+                    "mime": "text/csv" if extension == "csv" else "application/octet-stream",
+                    "row_count": export["row_count"]
+                }
+            else:
+                os.remove(sink.name)
+                st.error(f"Could not export the results: {export['error']}")
 
+        download = pager.get("download")
+        if download:
+            with open(download["path"], "rb") as file:
+                st.download_button(
+                    f"Download {download['row_count']:,} rows",
+                    file,
+                    file_name=download["file_name"],
+                    mime=download["mime"],
+                    key="download_results")
+
+
+def preview_modification(result):
+    """
+    Previews a modification in a rolled-back transaction and keeps it in the session until the
+    user confirms it; nothing is written in this run
+    """
     if 'sql_query' not in result:
         st.error("No SQL query found in the result")
         return
 
     sql_query = result['sql_query']
+    statements = split_modification(sql_query)
+    preview_result = execute_modification(sql_query, dry_run=True)
+    if not preview_result.get("success", False):
+        st.markdown("### Data Modification")
+        st.error(f"Could not preview the modification: {preview_result.get('error', 'Unknown error')}")
+        return
+
+    st.session_state.pending_modification = {
+        "sql_query": sql_query,
+        "statement_count": len(statements),
+        "explanation": result.get("explanation", ""),
+        "preview": preview_result
+    }
+    display_pending_modification()
+
+
+def display_pending_modification():
+    """
+    Shows the planned modification with its preview and the buttons that apply or discard it
+    """
+    pending = st.session_state.pending_modification
+    preview_result = pending["preview"]
+
+    st.markdown("### Data Modification")
     st.markdown("#### SQL Query")
     st.markdown(
-        f"<div class='sql-code'>{sql_query}</div>",
+        f"<div class='sql-code'>{pending['sql_query']}</div>",
         unsafe_allow_html=True)
+    st.write(f"Preview of {pending['statement_count']} statement(s) in a rolled-back transaction:")
 
-    if sql_query.strip().upper().startswith("DELETE"):
-        try:
-            where_match = re.search(
-                r"WHERE\s+(.*?)(?:;|$)",
-                sql_query,
-                re.IGNORECASE | re.DOTALL)
-
-            if where_match:
-                where_clause = where_match.group(1).strip()
-                check_query = f"SELECT * FROM players WHERE {where_clause} LIMIT 1"
-
-                st.write("Checking if player exists...")
-                check_result = execute_sql(check_query)
-
-                if check_result.get(
-                    "success",
-                        False) and check_result.get("data"):
-                    player_data = check_result.get("data")[0]
-                    st.success(
-                        f"Found player: {player_data.get('FIRST_NAME', '')} {player_data.get('LAST_NAME', '')}")
-                else:
-                    st.warning(
-                        "Player not found in database. Deletion may have no effect.")
-        except (mysql.connector.Error, sqlalchemy_exc.SQLAlchemyError) as e:
-            st.error(f"Database error while checking player: {str(e)}")
-        except re.error as e:
-            st.error(f"Invalid SQL query pattern: {str(e)}")
+    if preview_result.get("before"):
+        st.success(
+            f"Found {len(preview_result['before'])} matching rows, "
+            f"{preview_result['affected_rows']} rows would be affected")
+        st.dataframe(pd.DataFrame(preview_result["before"]), use_container_width=True)
+    else:
+        st.warning(
+            f"No existing rows match. {preview_result['affected_rows']} rows would be affected.")
+    if preview_result.get("after"):
+        with st.expander("Rows after the modification"):
+            st.dataframe(pd.DataFrame(preview_result["after"]), use_container_width=True)
+
+    st.info("Nothing has been changed yet. Confirm to apply the modification.")
+    confirm_column, cancel_column = st.columns(2)
+    confirm_column.button("Confirm", key="confirm_modification", on_click=confirm_modification)
+    cancel_column.button("Cancel", key="cancel_modification", on_click=cancel_modification)
+
+
+def confirm_modification():
+    """
+    The Confirm button's callback: the pending modification runs on the rerun it triggers
+    """
+    st.session_state.confirmed_modification = st.session_state.pending_modification
+    st.session_state.pending_modification = None
+
+
+def cancel_modification():
+    """
+    The Cancel button's callback: discards the pending modification
+    """
+    st.session_state.pending_modification = None
+
+
+def execute_confirmed_modification():
+    """
+    Executes the modification the user confirmed, once
+    """
+    confirmed = st.session_state.confirmed_modification
+    st.session_state.confirmed_modification = None
+    sql_query = confirmed["sql_query"]
 
+    st.markdown("### Data Modification")
+    st.markdown("#### SQL Query")
+    st.markdown(
+        f"<div class='sql-code'>{sql_query}</div>",
+        unsafe_allow_html=True)
     st.write("Executing SQL modification...")
 
     try:
@@ -173,6 +496,11 @@ def execute_modification_directly(result):
                 sql_query, execution_result)
 
             if verification_result.get("success", False):
+                if verification_result.get("before"):
+                    with st.expander("Records before your modification"):
+                        st.dataframe(
+                            pd.DataFrame(verification_result["before"]),
+                            use_container_width=True)
                 if verification_result.get("data"):
                     st.markdown("#### Verification Result")
                     df = pd.DataFrame(verification_result.get("data", []))
@@ -205,6 +533,7 @@ def main():
     Main function to run the NBA database explorer
     """
     init_session_state()
+    load_shared_resources()
 
     st.title("🏀 NBA Database Explorer")
 
@@ -218,6 +547,7 @@ def main():
         """)
 
     if st.button("Submit", key="submit_query"):
+        st.session_state.pending_modification = None
         if query:
             result = handle_user_query(query)
 
@@ -227,11 +557,22 @@ def main():
             elif query_type == 'data_query':
                 display_data_results(result)
             elif query_type == 'data_modification':
-                execute_modification_directly(result)
+                preview_modification(result)
+            elif result.get('error'):
+                st.error(f"Error: {result['error']}")
             else:
                 st.warning(f"Unrecognized query type: {query_type}")
         else:
             st.warning("Please enter a query.")
+    elif st.session_state.confirmed_modification is not None:
+        execute_confirmed_modification()
+    elif st.session_state.pending_modification is not None:
+        display_pending_modification()
+    elif st.session_state.displayed_entry is not None:
+        display_history_entry(
+            st.session_state.displayed_entry, st.session_state.displayed_from_history)
+
+    display_history()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""
+api_client.py
+
+This file contains the client for the headless API (api.py). Its functions
+mirror the local services the Streamlit app calls (handle_query,
+execute_modification and the result paging functions), so main.py can run
+as a thin client of an API server by setting API_URL instead of connecting
+to the database and OpenAI itself.
+"""
+
+import json
+import requests
+from src.utils.config import API_URL, API_REQUEST_TIMEOUT, API_MODIFICATIONS_KEY
+
+
+def api_error(e):
+    """
+    Describes a failed API call, using the server's detail message when there is one
+    """
+    response = getattr(e, "response", None)
+    if response is not None:
+        try:
+            return f"API error {response.status_code}: {response.json()['detail']}"
+        except (ValueError, KeyError, TypeError):
+            return f"API error {response.status_code}"
+    return f"Could not reach the API: {str(e)}"
+
+
+def post(path, payload, stream=False, headers=None):
+    """
+    POSTs JSON to the API and returns the response, raising on HTTP errors
+    """
+    response = requests.post(
+        f"{API_URL}{path}", json=payload, stream=stream, headers=headers, timeout=API_REQUEST_TIMEOUT + 5)
+    response.raise_for_status()
+    return response
+
+
+def handle_query(user_query, on_event=None):
+    """
+    Runs a question on the API server, passing its stage events to on_event as they arrive
+    Returns the same result dict as input.handle_query
+    """
+    try:
+        response = post("/query/stream", {"question": user_query}, stream=True)
+        result = None
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["stage"] == "result":
+                    result = event["payload"]
+                elif on_event is not None:
+                    on_event(event["stage"], event["payload"])
+        if result is None:
+            return {"query_type": None, "processed_query": user_query,
+                    "error": "The request timed out", "status": "Request failed"}
+        return result
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        return {"query_type": None, "processed_query": user_query,
+                "error": api_error(e), "status": "Request failed"}
+
+
+def execute_modification(sql_query, dry_run=False):
+    """
+    Previews (dry_run) or runs a modification on the API server with API_MODIFICATIONS_KEY
+    """
+    try:
+        path = "/modifications/preview" if dry_run else "/modifications/confirm"
+        return post(path, {"sql_query": sql_query}, headers={"X-API-Key": API_MODIFICATIONS_KEY}).json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {"success": False, "error": api_error(e)}
+
+
+def paging_plan(sql_query, params=None):
+    """
+    Gets the paging plan for a SELECT from the API server, with its row estimate in plan["estimate"]
+    Returns None when the query can't be paged; params aren't used, the server parameterizes the query
+    """
+    try:
+        response = post("/results/plan", {"sql_query": sql_query}).json()
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+    plan = response["plan"]
+    plan["estimate"] = response["estimate"]
+    return plan
+
+
+def estimate_count(plan):
+    """
+    Returns the row estimate that came with the plan
+    """
+    return plan.get("estimate")
+
+
+def fetch_page(plan, page, after=None):
+    """
+    Fetches one page from the API server, updating the plan if the server switched its paging mode
+    Only the plan's query and params are sent; the server plans the query again itself
+    """
+    try:
+        response = post("/results/page", {
+            "sql_query": plan["sql_query"],
+            "params": list(plan["params"]),
+            "page": page,
+            "after": list(after) if after is not None else None
+        }).json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {"success": False, "error": api_error(e)}
+    plan.update({key: value for key, value in response.pop("plan").items() if key != "estimate"})
+    return response
+
+
+def export_result(plan, sink, fmt='csv'):
+    """
+    Downloads the whole result as CSV or Parquet from the API server into a binary file
+    """
+    try:
+        response = post("/results/export", {
+            "sql_query": plan["sql_query"],
+            "params": list(plan["params"]),
+            "format": fmt
+        }, stream=True)
+        with response:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                sink.write(chunk)
+            row_count = int(response.headers.get("X-Row-Count", 0))
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {"success": False, "error": api_error(e)}
+    return {"success": True, "row_count": row_count}
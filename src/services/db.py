@@ -5,17 +5,92 @@ This file contains functions for connecting to the MySQL database
 and executing SQL queries
 """
 
-import re
+import time
+import threading
+from collections import OrderedDict
 import mysql.connector
-from mysql.connector import Error
-from openai import APIError, RateLimitError, APIConnectionError
-from src.utils.config import DB_CONFIG, DANGEROUS_SQL_KEYWORDS
+from mysql.connector import Error, PoolError, pooling
+from src.utils.config import (
+    DB_CONFIG,
+    DB_POOL_SIZE,
+    PREPARED_STATEMENTS,
+    PREPARED_STATEMENT_CACHE_SIZE,
+    MODIFICATION_IMAGE_LIMIT,
+    DANGEROUS_SQL_KEYWORDS,
+    DEFAULT_QUERY_LIMIT,
+    COST_GUARD_ENABLED,
+    COST_GUARD_MAX_ROWS,
+    COST_GUARD_REJECT_ROWS,
+    COST_GUARD_ACTION,
+    COST_GUARD_LIMIT,
+    QUERY_MAX_EXECUTION_MS
+)
+from src.utils.sql_parser import parse_sql, check_references, bound_select, add_optimizer_hint
+from src.utils.query_plan import summarize_plan
+from src.utils.summary_tables import SUMMARY_TABLES, refresh_summary_tables
+from src.services.replica import query_replica, invalidate_replica, replica_available
+from src.services.query_cache import get_cached_result, cache_result, invalidate_tables
+from src.services.schema import schema_columns, primary_keys, answer_schema_query
+from src.services.resources import get_resource
+from src.services.single_flight import single_flight
+from src.services.telemetry import span
+from src.services.history import estimate_size
+from src.services.query_log import log_statement
+
+ALLOWED_STATEMENTS = ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'SHOW', 'DESCRIBE', 'EXPLAIN']
+
+_pool_lock = threading.Lock()
+_prepared_cursors = {}
+
+def create_pool():
+    """
+    Creates the connection pool (None if it fails)
+    Sessions aren't reset when a connection returns to the pool so its prepared statements survive;
+    connections autocommit so reads never hold a stale snapshot between checkouts
+    """
+    try:
+        return pooling.MySQLConnectionPool(
+            pool_name="nba_pool",
+            pool_size=min(DB_POOL_SIZE, pooling.CNX_POOL_MAXSIZE),
+            pool_reset_session=False,
+            autocommit=True,
+            **DB_CONFIG)
+    except Error as e:
+        print(f"Could not create connection pool: {e}")
+        return None
+
+def close_pool(pool):
+    """
+    Closes the idle pooled connections and forgets their prepared statements on shutdown
+    """
+    with _pool_lock:
+        _prepared_cursors.clear()
+    try:
+        # MySQLConnectionPool has no public close, this is what it uses when it's reconfigured
+        pool._remove_connections()
+    except Error as e:
+        print(f"Error closing pooled connections: {e}")
+
+def get_pool():
+    """
+    Gets the process-wide connection pool, creating it on first use (None if pooling is disabled or fails)
+    """
+    if DB_POOL_SIZE <= 0:
+        return None
+    return get_resource("mysql_pool", create_pool, close_pool)
 
 def get_connection():
     """
-    Establishes connection to MySQL database
+    Establishes connection to MySQL database, taken from the pool when one is available
+    Closing a pooled connection returns it to the pool
     """
     try:
+        pool = get_pool()
+        if pool is not None:
+            try:
+                return pool.get_connection()
+            except PoolError:
+                print("Connection pool exhausted, opening a direct connection")
         connection = mysql.connector.connect(**DB_CONFIG)
         return connection
     except Error as e:
@@ -39,6 +114,43 @@ def close_connection(connection, cursor=None):
             print(f"Error closing connection: {e}")
 
 
+def prepared_cursor(connection, query, dictionary=True):
+    """
+    Gets a cursor with the query prepared server-side, reusing the statement already prepared for
+    the same query on this pooled connection (up to PREPARED_STATEMENT_CACHE_SIZE per connection)
+    Returns (cursor, operation, cached); cached cursors must stay open when the connection is closed
+    """
+    operation = query
+    if not isinstance(connection, pooling.PooledMySQLConnection):
+        return connection.cursor(prepared=True, dictionary=dictionary), operation, False
+
+    with _pool_lock:
+        statements = _prepared_cursors.setdefault(connection.connection_id, OrderedDict())
+    key = (query, dictionary)
+    if key in statements:
+        statements.move_to_end(key)
+        cursor, operation = statements[key]
+        return cursor, operation, True
+
+    cursor = connection.cursor(prepared=True, dictionary=dictionary)
+    statements[key] = (cursor, operation)
+    while len(statements) > PREPARED_STATEMENT_CACHE_SIZE:
+        _, (evicted, _) = statements.popitem(last=False)
+        try:
+            evicted.close()
+        except Error:
+            pass
+    return cursor, operation, True
+
+
+def forget_prepared(connection, query, dictionary=True):
+    """
+    Drops a cached prepared statement after it failed
+    """
+    statements = _prepared_cursors.get(getattr(connection, "connection_id", None), {})
+    statements.pop((query, dictionary), None)
+
+
 def execute_query(
         query,
         params=None,
@@ -47,8 +159,10 @@ def execute_query(
         dictionary=True):
     """
     Execute a SQL query and return the results.
+    Parameterized queries run as server-side prepared statements, cached per pooled connection
     """
-    connection = get_connection()
+    with span("db_connect"):
+        connection = get_connection()
     if not connection:
         return {
             "success": False,
@@ -56,16 +170,24 @@ def execute_query(
         }
 
     cursor = None
+    cached = False
     try:
-        cursor = connection.cursor(dictionary=dictionary)
-
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+        with span("db_execute", prepared=bool(params and PREPARED_STATEMENTS)):
+            if params and PREPARED_STATEMENTS:
+                cursor, operation, cached = prepared_cursor(connection, query, dictionary)
+                cursor.execute(operation, tuple(params))
+            elif params:
+                cursor = connection.cursor(dictionary=dictionary)
+                cursor.execute(query, params)
+            else:
+                cursor = connection.cursor(dictionary=dictionary)
+                cursor.execute(query)
 
         if fetch:
-            results = cursor.fetchall()
+            with span("db_fetch") as current:
+                results = cursor.fetchall()
+                if current.recording:
+                    current.set(rows=len(results), bytes=estimate_size(results) if dictionary else None)
             column_names = [
                 desc[0] for desc in cursor.description] if cursor.description else []
 
@@ -93,51 +215,58 @@ def execute_query(
                 "message": "Query executed successfully."
             }
 
-        close_connection(connection, cursor)
+        close_connection(connection, None if cached else cursor)
         return result_info
 
     except Error as e:
         error_message = str(e)
+        if cached:
+            forget_prepared(connection, query, dictionary)
         close_connection(connection, cursor)
         return {
             "success": False,
             "error": error_message
         }
-    except (APIError, RateLimitError, APIConnectionError) as e:
-        close_connection(connection, cursor)
-        return {
-            "success": False,
-            "error": f"Unexpected error: {str(e)}"
-        }
 
 
-def execute_sql(sql_query):
+def execute_sql(sql_query, params=None):
     """
     Executes a SQL query and returns the results or affected rows (modification)
+    sql_query may be a skeleton with %s placeholders filled from params
+    Concurrent identical SELECTs share one execution (marked "shared"); writes always run
+    Every statement that reaches a database is recorded in the slow-query log
     """
-    sql_upper = sql_query.strip().upper()
+    prepared = prepare_sql(sql_query)
+    if not prepared["success"]:
+        return {
+            "success": False,
+            "error": prepared["error"]
+        }
+
+    parsed = prepared["parsed"]
+    source_query = sql_query
+    sql_query = prepared["sql_query"]
+    statement_type = parsed["statement_type"]
 
-    if sql_upper.startswith(("SHOW", "DESCRIBE", "DESC", "EXPLAIN")):
+    if statement_type in ("SHOW", "DESCRIBE", "EXPLAIN"):
         query_type = "SCHEMA"
+    elif statement_type in ("INSERT", "UPDATE", "DELETE"):
+        query_type = statement_type
     else:
         query_type = "SELECT"
-        if sql_upper.startswith("INSERT"):
-            query_type = "INSERT"
-        elif sql_upper.startswith("UPDATE"):
-            query_type = "UPDATE"
-        elif sql_upper.startswith("DELETE"):
-            query_type = "DELETE"
 
     if query_type == "DELETE":
-        try:
-            connection = get_connection()
-            if not connection:
-                return {
-                    "success": False,
-                    "error": "Failed to connect to database for DELETE operation"}
+        start = time.perf_counter()
+        connection = get_connection()
+        if not connection:
+            return {
+                "success": False,
+                "error": "Failed to connect to database for DELETE operation"}
 
+        cursor = None
+        try:
             cursor = connection.cursor()
-            cursor.execute(sql_query)
+            cursor.execute(sql_query, params or None)
             connection.commit()
 
             affected_rows = cursor.rowcount
@@ -147,100 +276,356 @@ def execute_sql(sql_query):
                 "result_type": "modification",
                 "affected_rows": affected_rows,
                 "message": f"DELETE executed successfully. {affected_rows} rows affected."}
-
-            cursor.close()
-            connection.close()
-            return result
-
-        except (APIError, RateLimitError, APIConnectionError) as e:
-            return {
+        except Error as e:
+            result = {
                 "success": False,
                 "error": f"Error executing DELETE: {str(e)}"
             }
+        finally:
+            close_connection(connection, cursor)
+
+        log_statement(parsed, sql_query, params, (time.perf_counter() - start) * 1000, result)
+        if result["success"]:
+            refresh_summaries(parsed["tables"])
+            invalidate_tables(parsed["tables"])
+            invalidate_replica()
+        return result
 
     if query_type == "SCHEMA":
-        return execute_query(sql_query, fetch=True, commit=False)
+        result = answer_schema_query(parsed)
+        if result is None:
+            start = time.perf_counter()
+            result = execute_query(sql_query, params, fetch=True, commit=False)
+            log_statement(parsed, sql_query, params, (time.perf_counter() - start) * 1000, result)
+        return result
     elif query_type == "SELECT":
-        result = execute_query(sql_query, fetch=True, commit=False)
+        cache_key = (parsed["normalized"], tuple(params or ()))
+        result = get_cached_result(cache_key)
+        if result is None:
+            result, shared = single_flight(
+                ("select", cache_key),
+                lambda: execute_select(sql_query, source_query, parsed, params, cache_key))
+            if result is None:
+                return {
+                    "success": False,
+                    "error": "Timed out waiting for the same query to finish"
+                }
+            if shared:
+                # A new dict: the leader's result, and the rows inside it, stay untouched
+                result = {**result, "shared": True}
     else:
-        result = execute_query(sql_query, fetch=False, commit=True)
+        start = time.perf_counter()
+        result = execute_query(sql_query, params, fetch=False, commit=True)
+        log_statement(parsed, sql_query, params, (time.perf_counter() - start) * 1000, result)
+        if result["success"]:
+            refresh_summaries(parsed["tables"])
+            invalidate_tables(parsed["tables"])
+            invalidate_replica()
 
     return result
 
 
-def validate_sql(sql_query):
+def execute_select(sql_query, source_query, parsed, params, cache_key):
+    """
+    Runs a SELECT that missed the result cache: on the replica when it can answer it,
+    otherwise through the cost guard on MySQL; successful results are cached
+    The logged latency includes the guard's EXPLAIN, and rows examined are its estimate
+    (also returned as "rows_estimate", so the result pager doesn't have to EXPLAIN the query again)
+    """
+    start = time.perf_counter()
+    plan = None
+    result = query_replica(sql_query, params)
+    if result is None:
+        guard = guard_select(source_query, parsed, params)
+        plan = guard["plan"]
+        if guard["action"] == "reject":
+            return {
+                "success": False,
+                "error": guard["reason"],
+                "plan": guard["plan"]
+            }
+        if guard["action"] == "replica":
+            result = query_replica(sql_query, params, allow_stale=True)
+        if result is None:
+            result = execute_query(
+                add_optimizer_hint(
+                    guard["sql_query"],
+                    f"MAX_EXECUTION_TIME({QUERY_MAX_EXECUTION_MS})"),
+                params,
+                fetch=True,
+                commit=False)
+        if guard["action"] != "allow":
+            result["cost_guard"] = {"action": guard["action"], "reason": guard["reason"]}
+        if plan is not None and result["success"]:
+            result["rows_estimate"] = plan["rows_examined"]
+    log_statement(
+        parsed, sql_query, params, (time.perf_counter() - start) * 1000, result,
+        plan["rows_examined"] if plan else None, result.get("source", "mysql"))
+    cache_result(cache_key, parsed["tables"], result)
+    return result
+
+
+def read_image(cursor, image, before=None):
     """
-    Ensures that the SQL query is valid, makes sure UPDATE and DELETE queries have a WHERE clause
+    Reads the rows a modification touches: by primary key when the keys are known, otherwise by its WHERE clause
+    The pre-image (before is None) locks the rows it reads; the post-image reads the pre-image's keys back
     """
-    print("Validating SQL")
-    print(sql_query)
-    for keyword in DANGEROUS_SQL_KEYWORDS:
-        if re.search(r'\b' + keyword + r'\b', sql_query.upper()):
-            return False, f"Query contains disallowed operation: {keyword}"
+    key_columns = image["key_columns"]
+    key_values = image["key_values"]
+    if before and key_columns and not key_values:
+        key_values = [tuple(row[column] for column in key_columns) for row in before]
+
+    params = None
+    if key_columns and key_values:
+        row_placeholder = f"({', '.join(['%s'] * len(key_columns))})"
+        query = f"""
+            SELECT * FROM {image['table']}
+            WHERE ({', '.join(key_columns)}) IN ({', '.join([row_placeholder] * len(key_values))})
+        """
+        params = tuple(value for values in key_values for value in values)
+    elif image["where"]:
+        query = f"SELECT * FROM {image['table']} WHERE {image['where']}"
+        params = image.get("where_params") or None
+    else:
+        return [], []
 
-    try:
-        parts = sql_query.strip().upper().split()
-        if not parts:
-            return False, "Empty query"
-
-        allowed_commands = [
-            'SELECT',
-            'INSERT',
-            'UPDATE',
-            'DELETE',
-            'SHOW',
-            'DESCRIBE',
-            'DESC',
-            'EXPLAIN']
-
-        if parts[0] not in allowed_commands:
-            return False, f"""
-                Query must start with one of {', '.join(allowed_commands)}, found: {parts[0]}
-            """
+    query += f" LIMIT {MODIFICATION_IMAGE_LIMIT}"
+    if before is None:
+        query += " FOR UPDATE"
+    cursor.execute(query, params)
+    return cursor.fetchall(), list(cursor.column_names)
 
-        return True, ""
-    except (APIError, RateLimitError, APIConnectionError) as e:
-        return False, f"SQL validation error: {str(e)}"
 
-def get_primary_keys(table_name):
+def summary_rows(batches, pre_images, post_images):
+    """
+    Collects the box_score rows a transaction's statements touched, before and after they ran
+    Returns None when some of them aren't known: a statement without an image or a WHERE clause,
+    an image cut off at MODIFICATION_IMAGE_LIMIT, or an UPDATE that changed the rows' primary keys
+    """
+    rows = []
+    reads = iter(zip(pre_images, post_images))
+    for batch in batches:
+        parsed = parse_sql(batch["sql_query"])
+        images = [(image, next(reads)) for image in batch["images"] if image]
+        if "box_score" not in parsed["tables"]:
+            continue
+        if not images or None in batch["images"]:
+            return None
+        for image, ((before, _), (after, _)) in images:
+            if not (image["where"] or image["key_values"]) \
+                    or MODIFICATION_IMAGE_LIMIT in (len(before), len(after)) \
+                    or (parsed["statement_type"] == "UPDATE" and len(after) != len(before)):
+                return None
+            rows += before + after
+    return rows
+
+
+def refresh_summaries(tables, rows=None):
     """
-    Gets primary key information for a specific table
+    Brings the summary tables that have been built up to date after a committed write to their sources
+    Writes to box_score alone refresh only the keys of the given rows (all keys when rows is None);
+    a write to players or teams, whose names and teams the summaries copy, rebuilds the tables reading them
     """
+    written = set(tables)
+    stale = [
+        name for name, spec in SUMMARY_TABLES.items()
+        if written & set(spec['sources']) and primary_keys(name) is not None]
+    if not stale:
+        return
+
+    incremental = [name for name in stale if written & set(SUMMARY_TABLES[name]['sources']) == {'box_score'}]
+    rebuilt = [name for name in stale if name not in incremental]
+    if incremental:
+        refresh_summary_tables(rows=rows, table_names=incremental)
+    if rebuilt:
+        refresh_summary_tables(table_names=rebuilt)
+    invalidate_tables(stale)
+
+
+def execute_modification_transaction(batches, dry_run=False):
+    """
+    Runs the pre-image reads, the modifications and the post-image reads in one transaction on one connection
+    batches is a list of {"sql_query", "params_list", "images"}: a batch with params_list runs its
+    parameterized sql_query once per params tuple through executemany (INSERTs become one multi-row
+    statement), otherwise sql_query runs as is. images describe the rows each statement touches
+    ({"table", "where", "where_params", "key_columns", "key_values"}, None skips the reads)
+    dry_run rolls the transaction back, previewing the change without applying it
+    """
+    connection = get_connection()
+    if not connection:
+        return {
+            "success": False,
+            "error": "Failed to connect to the database"
+        }
+
+    cursor = None
+    tables = set()
     try:
-        print(f"Getting primary keys for table: {table_name}")
-        connection = mysql.connector.connect(**DB_CONFIG)
+        connection.start_transaction()
         cursor = connection.cursor(dictionary=True)
 
-        sanitized_table = ''.join(
-            c for c in table_name if c.isalnum() or c == '_')
+        images = [image for batch in batches for image in batch["images"] if image]
+        pre_images = [read_image(cursor, image) for image in images]
+
+        affected_rows = 0
+        statements = []
+        for batch in batches:
+            if batch.get("params_list") and len(batch["params_list"]) > 1:
+                cursor.executemany(batch["sql_query"], batch["params_list"])
+            elif batch.get("params_list"):
+                cursor.execute(batch["sql_query"], batch["params_list"][0])
+            else:
+                cursor.execute(batch["sql_query"])
+            affected_rows += max(cursor.rowcount, 0)
+            tables.update(parse_sql(batch["sql_query"])["tables"])
+            statements.append({
+                "sql_query": batch["sql_query"],
+                "statements": len(batch.get("params_list") or [None]),
+                "affected_rows": cursor.rowcount
+            })
+
+        post_images = [read_image(cursor, image, rows) for image, (rows, _) in zip(images, pre_images)]
+
+        if dry_run:
+            connection.rollback()
+            message = f"Preview: {affected_rows} rows would be affected. Nothing was changed."
+        else:
+            connection.commit()
+            message = f"Query executed successfully. {affected_rows} rows affected."
+        close_connection(connection, cursor)
+    except Error as e:
+        try:
+            connection.rollback()
+        except Error:
+            pass
+        close_connection(connection, cursor)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    if not dry_run:
+        refresh_summaries(tables, summary_rows(batches, pre_images, post_images))
+        invalidate_tables(tables)
+        invalidate_replica()
+
+    return {
+        "success": True,
+        "result_type": "modification",
+        "affected_rows": affected_rows,
+        "statement_count": sum(batch["statements"] for batch in statements),
+        "batches": statements,
+        "before": [row for rows, _ in pre_images for row in rows],
+        "after": [row for rows, _ in post_images for row in rows],
+        "column_names": next((columns for _, columns in pre_images + post_images if columns), []),
+        "dry_run": dry_run,
+        "message": message
+    }
+
+
+def explain_select(sql_query, params=None):
+    """
+    Runs EXPLAIN FORMAT=JSON for a SELECT and summarizes the plan, returns None if it can't be explained
+    """
+    result = execute_query(f"EXPLAIN FORMAT=JSON {sql_query}", params, fetch=True, dictionary=False)
+    if not result["success"] or not result["data"]:
+        return None
+    try:
+        return summarize_plan(result["data"][0][0])
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Could not read query plan: {e}")
+        return None
+
+
+def guard_select(sql_query, parsed, params=None):
+    """
+    Estimates the rows a SELECT will examine and decides how to run it
+    sql_query is the query before prepare_sql bounded it, so the guard can tighten an injected LIMIT
+    Returns {"action": "allow" | "limit" | "replica" | "reject", "sql_query", "reason", "plan"}
+    """
+    bounded_query = bound_select(sql_query, parsed, DEFAULT_QUERY_LIMIT)
+    decision = {"action": "allow", "sql_query": bounded_query, "reason": "", "plan": None}
+    if not COST_GUARD_ENABLED:
+        return decision
+
+    plan = explain_select(bounded_query, params)
+    if plan is None:
+        return decision
+    decision["plan"] = plan
+    rows = plan["rows_examined"]
+
+    if rows <= COST_GUARD_MAX_ROWS and not plan["cartesian"]:
+        return decision
+
+    reason = f"Query would examine about {rows:,} rows"
+    if plan["cartesian"]:
+        reason += " (a join without a join condition)"
+    if plan["full_scans"]:
+        reason += f", with full scans of {', '.join(dict.fromkeys(plan['full_scans']))}"
+    reason += ". Add filters on indexed columns or a LIMIT"
+    if "box_score" in parsed["tables"]:
+        reason += (", or read season totals and averages from player_season_stats, "
+                   "team_season_stats or team_game_totals instead of aggregating box_score")
+    decision["reason"] = reason + "."
+
+    if plan["cartesian"] or rows > COST_GUARD_REJECT_ROWS or COST_GUARD_ACTION == "reject":
+        decision["action"] = "reject"
+    elif COST_GUARD_ACTION == "replica" and replica_available(allow_stale=True):
+        decision["action"] = "replica"
+    else:
+        decision["action"] = "limit"
+        decision["sql_query"] = bound_select(sql_query, parsed, COST_GUARD_LIMIT)
 
-        cursor.execute("SHOW TABLES LIKE %s", (sanitized_table,))
-        if not cursor.fetchone():
-            return {"error": f"Table '{table_name}' not found"}
+    print(f"Cost guard: {decision['action']} - {decision['reason']}")
+    return decision
 
-        cursor.execute(f"DESCRIBE {sanitized_table}")
-        columns = cursor.fetchall()
-        primary_keys = [col["Field"] for col in columns if col["Key"] == "PRI"]
 
-        if primary_keys:
-            placeholders = ", ".join(primary_keys)
-            cursor.execute(
-                f"SELECT {placeholders} FROM {sanitized_table} LIMIT 5")
-            examples = cursor.fetchall()
+def prepare_sql(sql_query):
+    """
+    Parses and validates a query once, appending a LIMIT to unbounded SELECTs
+    Returns {"success", "sql_query", "parsed", "error"}; the parse is memoized for reuse downstream
+    """
+    parsed = parse_sql(sql_query)
+    error = None
+
+    if parsed["error"]:
+        error = f"Could not parse query: {parsed['error']}"
+    elif parsed["statement_count"] > 1:
+        error = "Multiple statements are not allowed"
+    else:
+        disallowed = [
+            keyword for keyword in DANGEROUS_SQL_KEYWORDS
+            if keyword == parsed["statement_type"] or keyword in parsed["keywords"]]
+        if disallowed:
+            error = f"Query contains disallowed operation: {disallowed[0]}"
+        elif parsed["statement_type"] not in ALLOWED_STATEMENTS:
+            error = f"""
+                Query must start with one of {', '.join(ALLOWED_STATEMENTS)}, found: {parsed['statement_type']}
+            """
         else:
-            examples = []
-
-        result = {
-            "query_type": "schema_explore",
-            "result_type": "primary_keys",
-            "table": sanitized_table,
-            "primary_keys": primary_keys,
-            "example_values": examples
+            reference_errors = check_references(parsed, schema_columns())
+            if reference_errors:
+                error = "; ".join(reference_errors)
+
+    if error:
+        return {
+            "success": False,
+            "sql_query": sql_query,
+            "parsed": parsed,
+            "error": error
         }
+    return {
+        "success": True,
+        "sql_query": bound_select(sql_query, parsed, DEFAULT_QUERY_LIMIT),
+        "parsed": parsed,
+        "error": None
+    }
 
-        cursor.close()
-        connection.close()
 
-        return result
-    except Error as e:
-        return {"error": f"Database error: {e}"}
+def validate_sql(sql_query):
+    """
+    Ensures that the SQL query is a single allowed statement that only references existing tables and columns
+    Callers report the outcome on their "validate" span
+    """
+    prepared = prepare_sql(sql_query)
+    return prepared["success"], prepared["error"] or ""
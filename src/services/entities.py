@@ -0,0 +1,241 @@
+"""
+entities.py
+
+This file contains the in-memory entity index used to resolve player and team
+names in a question to their integer IDs. The index is built once from the
+players and teams tables and covers display names, slugs, nicknames,
+abbreviations and cities, with exact matching through a dict lookup of word
+windows and fuzzy matching through a trigram index.
+"""
+
+import re
+import threading
+from collections import Counter
+from src.services.db import execute_query
+from src.utils.config import ENTITY_FUZZY_THRESHOLD
+
+# Abbreviations that are also common words are only matched by nickname
+AMBIGUOUS_ABBREVIATIONS = {'was', 'min', 'den', 'sas', 'mem', 'phi'}
+
+# Words that are never the start or end of a fuzzy name mention
+FUZZY_STOPWORDS = {
+    'the', 'and', 'for', 'with', 'from', 'that', 'this', 'what', 'which', 'who',
+    'whose', 'show', 'list', 'find', 'give', 'tell', 'many', 'much', 'most',
+    'more', 'least', 'than', 'over', 'under', 'have', 'does', 'did', 'all',
+    'top', 'best', 'players', 'player', 'team', 'teams', 'games', 'game',
+    'points', 'rebounds', 'assists', 'steals', 'blocks', 'stats', 'season',
+    'average', 'averages', 'scored', 'scorers', 'score', 'play', 'played',
+    'plays', 'tallest', 'shortest', 'roster', 'table', 'tables', 'columns',
+    'league', 'career', 'total', 'totals', 'home', 'away', 'against', 'last',
+    'first', 'playoffs', 'regular', 'per', 'into', 'their', 'they', 'about'
+}
+
+NORMALIZE_PATTERN = re.compile(r"[^a-z0-9 ]+")
+
+_index = {}
+_index_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """
+    Lowercases a name and reduces punctuation ("O'Neal", "lebron-james", "James, LeBron") to spaces
+    """
+    name = str(name).lower().replace("'", "").replace(".", "")
+    return ' '.join(NORMALIZE_PATTERN.sub(' ', name).split())
+
+
+def trigrams(text):
+    """
+    Returns the set of character trigrams of a padded name
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def add_alias(aliases, alias, entity):
+    """
+    Adds an alias for an entity, keeping every entity that shares the alias
+    """
+    alias = normalize_name(alias)
+    if not alias or alias in ('nan', 'none'):
+        return
+    entities = aliases.setdefault(alias, [])
+    if all(existing["id"] != entity["id"] or existing["type"] != entity["type"]
+           for existing in entities):
+        entities.append(entity)
+
+
+def build_entity_index(team_rows, player_rows):
+    """
+    Builds the alias table and the trigram postings
+    """
+    aliases = {}
+
+    for team in team_rows:
+        entity = {"type": "team", "id": int(team["TEAM_ID"]), "name": str(team["NICKNAME"])}
+        add_alias(aliases, team["NICKNAME"], entity)
+        add_alias(aliases, team["CITY"], entity)
+        add_alias(aliases, f"{team['CITY']} {team['NICKNAME']}", entity)
+        if str(team["ABBREVIATION"]).lower() not in AMBIGUOUS_ABBREVIATIONS:
+            add_alias(aliases, team["ABBREVIATION"], entity)
+
+    for player in player_rows:
+        entity = {
+            "type": "player",
+            "id": int(player["PERSON_ID"]),
+            "name": str(player["DISPLAY_FIRST_LAST"])
+        }
+        add_alias(aliases, player["DISPLAY_FIRST_LAST"], entity)
+        add_alias(aliases, player.get("PLAYER_SLUG"), entity)
+        add_alias(aliases, player.get("DISPLAY_LAST_COMMA_FIRST"), entity)
+
+    postings = {}
+    alias_trigrams = {}
+    for alias in aliases:
+        grams = trigrams(alias)
+        alias_trigrams[alias] = len(grams)
+        for gram in grams:
+            postings.setdefault(gram, []).append(alias)
+
+    return {
+        "aliases": aliases,
+        "max_words": max((len(alias.split()) for alias in aliases), default=0),
+        "postings": postings,
+        "alias_trigrams": alias_trigrams
+    }
+
+
+def load_entity_index():
+    """
+    Loads the players and teams tables and builds the index
+    """
+    teams = execute_query("SELECT TEAM_ID, ABBREVIATION, NICKNAME, CITY FROM teams")
+    players = execute_query(
+        "SELECT PERSON_ID, DISPLAY_FIRST_LAST, DISPLAY_LAST_COMMA_FIRST, PLAYER_SLUG FROM players")
+    if not teams["success"] or not players["success"]:
+        print(f"Could not load entity index: {teams.get('error') or players.get('error')}")
+    return build_entity_index(
+        teams.get("data", []) if teams["success"] else [],
+        players.get("data", []) if players["success"] else [])
+
+
+def get_entity_index():
+    """
+    Gets the entity index, building it once per process
+    """
+    if "index" not in _index:
+        with _index_lock:
+            if "index" not in _index:
+                _index["index"] = load_entity_index()
+    return _index["index"]
+
+
+def invalidate_entity_index():
+    """
+    Drops the index after players or teams change so the next lookup rebuilds it
+    """
+    with _index_lock:
+        _index.pop("index", None)
+
+
+def fuzzy_lookup(mention, index=None):
+    """
+    Finds the alias closest to a mention by trigram Jaccard similarity
+    Returns (alias, score) or (None, 0.0) if nothing clears the threshold
+    """
+    index = index or get_entity_index()
+    grams = trigrams(normalize_name(mention))
+    shared = Counter()
+    for gram in grams:
+        shared.update(index["postings"].get(gram, ()))
+
+    best_alias, best_score = None, 0.0
+    for alias, count in shared.items():
+        score = count / (len(grams) + index["alias_trigrams"][alias] - count)
+        if score > best_score:
+            best_alias, best_score = alias, score
+    if best_score < ENTITY_FUZZY_THRESHOLD:
+        return None, 0.0
+    return best_alias, best_score
+
+
+def resolve_mentions(query):
+    """
+    Resolves player and team mentions in a question to entities
+    Exact alias matches are found first, then uncovered word spans are matched fuzzily
+    Returns {"teams", "players", "mentions", "ambiguous"}; each mention records its word position
+    ("start", "size") in normalize_name(query)
+    """
+    index = get_entity_index()
+    words = normalize_name(query).split()
+    mentions = []
+    ambiguous = []
+    covered = [False] * len(words)
+
+    # Exact matches, longest window first
+    for size in range(min(index["max_words"], len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            if any(covered[start:start + size]):
+                continue
+            text = ' '.join(words[start:start + size])
+            if text in index["aliases"]:
+                covered[start:start + size] = [True] * size
+                mentions.append((start, text, index["aliases"][text], "exact", 1.0))
+
+    # Fuzzy matches over the remaining word spans
+    start = 0
+    while start < len(words):
+        matched = False
+        for size in (3, 2, 1):
+            span = words[start:start + size]
+            if (len(span) < size or any(covered[start:start + size])
+                    or span[0] in FUZZY_STOPWORDS or span[-1] in FUZZY_STOPWORDS):
+                continue
+            text = ' '.join(span)
+            if len(text) < 4:
+                continue
+            alias, score = fuzzy_lookup(text, index)
+            if alias:
+                covered[start:start + size] = [True] * size
+                mentions.append((start, text, index["aliases"][alias], "fuzzy", round(score, 3)))
+                start += size
+                matched = True
+                break
+        if not matched:
+            start += 1
+
+    resolved = {"teams": [], "players": [], "mentions": [], "ambiguous": ambiguous}
+    for start, text, entities, match_type, score in sorted(mentions, key=lambda m: m[0]):
+        if len(entities) > 1:
+            ambiguous.append({"mention": text, "candidates": entities})
+            continue
+        entity = entities[0]
+        bucket = resolved["teams"] if entity["type"] == "team" else resolved["players"]
+        if entity not in bucket:
+            bucket.append(entity)
+            resolved["mentions"].append({
+                "mention": text, "entity": entity, "match": match_type, "score": score,
+                "start": start, "size": len(text.split())})
+    return resolved
+
+
+def entity_prompt_context(resolved):
+    """
+    Describes resolved entities for the translation prompt so generated SQL filters on IDs
+    """
+    lines = []
+    for mention in resolved["mentions"]:
+        entity = mention["entity"]
+        if entity["type"] == "team":
+            lines.append(
+                f'- "{mention["mention"]}" is the {entity["name"]}: '
+                f'use teams.TEAM_ID / players.TEAM_ID / box_score.TEAM_ID = {entity["id"]}')
+        else:
+            lines.append(
+                f'- "{mention["mention"]}" is {entity["name"]}: '
+                f'use players.PERSON_ID / box_score.PLAYER_ID = {entity["id"]}')
+    if not lines:
+        return ""
+    return (
+        "Resolved names (filter on these integer IDs instead of matching name strings):\n"
+        + "\n".join(lines))
@@ -0,0 +1,259 @@
+"""
+history.py
+
+This file contains the query history store. Each session keeps a bounded list
+of compact entries (question, SQL, timing and a result handle), while the
+result rows live in one shared in-process store that evicts least recently
+used results past RESULT_STORE_MAX_BYTES. Evicted results are spilled to
+Parquet files when HISTORY_SPILL is on and pyarrow is installed, otherwise
+they are dropped and the history entry shows that the result has expired.
+"""
+
+import os
+import sys
+import time
+import uuid
+import atexit
+import threading
+from collections import OrderedDict
+import pandas as pd
+from src.utils.config import (
+    HISTORY_MAX_ENTRIES,
+    HISTORY_MAX_BYTES,
+    RESULT_STORE_MAX_BYTES,
+    HISTORY_SPILL,
+    HISTORY_SPILL_DIR,
+    HISTORY_SPILL_MAX_BYTES
+)
+
+SIZE_SAMPLE_ROWS = 100
+
+_results = OrderedDict()
+_spilled = OrderedDict()
+_results_lock = threading.Lock()
+_store_state = {"bytes": 0, "spilled_bytes": 0}
+
+
+def estimate_size(rows):
+    """
+    Estimates the memory held by a list of row dicts from a sample of its rows
+    """
+    if not rows:
+        return 0
+    sample = rows[:SIZE_SAMPLE_ROWS]
+    sample_size = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+        for row in sample)
+    return sys.getsizeof(rows) + sample_size * len(rows) // len(sample)
+
+
+def entry_size(entry):
+    """
+    Estimates the memory held by a compact history entry
+    """
+    return sum(sys.getsizeof(value) for value in entry.values()) + sys.getsizeof(entry)
+
+
+def spill_path(handle):
+    """
+    Returns the Parquet file a result is spilled to
+    """
+    return os.path.join(HISTORY_SPILL_DIR, f"{handle}.parquet")
+
+
+def spill_result(handle, payload):
+    """
+    Writes an evicted result to Parquet, dropping the oldest spilled results past HISTORY_SPILL_MAX_BYTES
+    Returns False if spilling is off, pyarrow is missing or the rows can't be written
+    """
+    if not HISTORY_SPILL or not payload["data"]:
+        return False
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+
+    path = spill_path(handle)
+    try:
+        os.makedirs(HISTORY_SPILL_DIR, exist_ok=True)
+        pd.DataFrame(payload["data"], columns=payload["column_names"] or None).to_parquet(path, index=False)
+        size = os.path.getsize(path)
+    except (OSError, ValueError, TypeError, pyarrow.ArrowException) as e:
+        print(f"Could not spill result {handle}: {e}")
+        return False
+
+    _spilled[handle] = (path, size, payload["formatted_result"])
+    _store_state["spilled_bytes"] += size
+    while _store_state["spilled_bytes"] > HISTORY_SPILL_MAX_BYTES and len(_spilled) > 1:
+        drop_spilled(next(iter(_spilled)))
+    return True
+
+
+def drop_spilled(handle):
+    """
+    Deletes a spilled result file (the caller holds the lock)
+    """
+    spilled = _spilled.pop(handle, None)
+    if spilled is None:
+        return
+    _store_state["spilled_bytes"] -= spilled[1]
+    try:
+        os.remove(spilled[0])
+    except OSError:
+        pass
+
+
+def evict_results():
+    """
+    Evicts least recently used results until the store fits RESULT_STORE_MAX_BYTES (the caller holds the lock)
+    """
+    while _store_state["bytes"] > RESULT_STORE_MAX_BYTES and _results:
+        handle, (size, payload) = _results.popitem(last=False)
+        _store_state["bytes"] -= size
+        spill_result(handle, payload)
+
+
+def store_result(result):
+    """
+    Puts the rows of a query result in the shared store
+    Returns the handle to read them back with, or None if there's nothing to keep
+    """
+    raw_result = result.get("raw_result") or {}
+    rows = raw_result.get("data") or []
+    if not rows and not result.get("formatted_result"):
+        return None
+
+    payload = {
+        "data": rows,
+        "column_names": raw_result.get("column_names") or [],
+        "formatted_result": "" if rows else result.get("formatted_result", "")
+    }
+    size = estimate_size(rows) + sys.getsizeof(payload["formatted_result"])
+    handle = uuid.uuid4().hex
+    with _results_lock:
+        _results[handle] = (size, payload)
+        _store_state["bytes"] += size
+        evict_results()
+    return handle
+
+
+def load_result(handle):
+    """
+    Reads a stored result back from memory or its spill file
+    Returns None once it has been evicted
+    """
+    if handle is None:
+        return None
+    with _results_lock:
+        entry = _results.get(handle)
+        if entry is not None:
+            _results.move_to_end(handle)
+            return entry[1]
+        spilled = _spilled.get(handle)
+    if spilled is None:
+        return None
+
+    path, _, formatted_result = spilled
+    try:
+        df = pd.read_parquet(path)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Could not read spilled result {handle}: {e}")
+        return None
+    return {
+        "data": df.to_dict('records'),
+        "column_names": list(df.columns),
+        "formatted_result": formatted_result
+    }
+
+
+def release_result(handle):
+    """
+    Drops a stored result from memory and disk once no history entry points to it
+    """
+    if handle is None:
+        return
+    with _results_lock:
+        entry = _results.pop(handle, None)
+        if entry is not None:
+            _store_state["bytes"] -= entry[0]
+        drop_spilled(handle)
+
+
+@atexit.register
+def clear_spilled_results():
+    """
+    Removes this process's spill files on shutdown (their handles die with the sessions)
+    """
+    with _results_lock:
+        for handle in list(_spilled):
+            drop_spilled(handle)
+
+
+def result_store_stats():
+    """
+    Returns the number and estimated size of stored and spilled results
+    """
+    with _results_lock:
+        return {
+            "results": len(_results),
+            "bytes": _store_state["bytes"],
+            "spilled": len(_spilled),
+            "spilled_bytes": _store_state["spilled_bytes"]
+        }
+
+
+def history_entry(query, result, elapsed):
+    """
+    Builds the compact history entry for a query, moving its rows into the shared store
+    """
+    raw_result = result.get("raw_result") or {}
+    return {
+        "query": query,
+        "query_type": result.get("query_type"),
+        "sql_query": result.get("sql_query"),
+        "explanation": result.get("explanation"),
+        "status": result.get("status"),
+        "error": result.get("error"),
+        "row_count": raw_result.get("row_count"),
+        "source": raw_result.get("source"),
+        "cost_guard": raw_result.get("cost_guard"),
+        "elapsed": round(elapsed, 3),
+        "timestamp": time.strftime("%H:%M:%S"),
+        "result_handle": store_result(result)
+    }
+
+
+def add_history_entry(history, entry):
+    """
+    Appends an entry to a session's history, dropping the oldest entries (and their stored results)
+    past HISTORY_MAX_ENTRIES or HISTORY_MAX_BYTES
+    """
+    history.append(entry)
+    total = sum(entry_size(item) for item in history)
+    while len(history) > 1 and (len(history) > HISTORY_MAX_ENTRIES or total > HISTORY_MAX_BYTES):
+        oldest = history.pop(0)
+        total -= entry_size(oldest)
+        release_result(oldest["result_handle"])
+    return history
+
+
+def history_result(entry):
+    """
+    Rebuilds a displayable result from a history entry, or None if its rows have been evicted
+    """
+    payload = load_result(entry.get("result_handle"))
+    if payload is None:
+        return None
+    return {
+        "query_type": entry["query_type"],
+        "sql_query": entry["sql_query"],
+        "explanation": entry["explanation"],
+        "raw_result": {
+            "data": payload["data"],
+            "column_names": payload["column_names"],
+            "row_count": len(payload["data"]),
+            "source": entry.get("source"),
+            "cost_guard": entry.get("cost_guard")
+        },
+        "formatted_result": payload["formatted_result"]
+    }
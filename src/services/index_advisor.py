@@ -0,0 +1,282 @@
+"""
+index_advisor.py
+
+This file contains the index advisor for generated SQL. It reads the slowest
+fingerprints from the slow-query log, runs EXPLAIN on the latest example of
+each, and suggests indexes on the columns those queries filter, join, group
+and sort box_score, players and teams by (skipping tables the plan already
+reads through an index), or the summary table that answers a box_score
+aggregate. With --apply it creates the indexes and builds missing summary
+tables.
+
+Run from the repository root:
+    python -m src.services.index_advisor --top 10 [--apply]
+"""
+
+import re
+import json
+import time
+import argparse
+from src.utils.sql_parser import parse_sql, predicate_columns
+from src.utils.summary_tables import refresh_summary_tables
+from src.utils.sql_upload import mark_schema_changed
+from src.services.schema import get_schema
+from src.services.query_log import slowest_fingerprints
+from src.services.db import execute_query, explain_select
+
+ADVISED_TABLES = ('box_score', 'players', 'teams')
+MAX_INDEX_COLUMNS = 4
+MAX_INDEXES_PER_TABLE = 2
+
+# TEXT/BLOB columns (pandas creates string columns as TEXT) can only be indexed by a prefix
+TEXT_TYPES = {'tinytext', 'text', 'mediumtext', 'longtext', 'tinyblob', 'blob', 'mediumblob', 'longblob'}
+INDEX_PREFIX_LENGTH = 32
+
+# GROUP BY columns that make a box_score aggregate per player or per team
+PLAYER_KEYS = {'player_id', 'player_name', 'person_id', 'display_first_last'}
+TEAM_KEYS = {'team_id', 'team_name', 'team_abbreviation', 'abbreviation', 'nickname', 'city'}
+SUMMARY_GROUPS = {
+    'player_season_stats': 'player and season',
+    'team_season_stats': 'team and season',
+    'team_game_totals': 'team and game'
+}
+AGGREGATE_PATTERN = re.compile(r'\b(?:sum|avg|count|min|max) \(', re.IGNORECASE)
+
+
+def find_table(tables, name):
+    """
+    Looks a table up in the schema by case-insensitive name, returns (name, table) or (None, None)
+    """
+    for table_name, table in tables.items():
+        if table_name.lower() == name.lower():
+            return table_name, table
+    return None, None
+
+
+def resolve_columns(columns, query_tables, tables):
+    """
+    Maps the parser's lowercase (table, column) pairs to schema names, finding the table of
+    unqualified columns among the query's tables; pairs that don't resolve are dropped
+    """
+    resolved = []
+    for table, column in columns:
+        for candidate in [table] if table else query_tables:
+            table_name, table_info = find_table(tables, candidate)
+            if table_info is None:
+                continue
+            names = {entry["name"].lower(): entry["name"] for entry in table_info["columns"]}
+            if column in names:
+                resolved.append((table_name, names[column]))
+                break
+    return list(dict.fromkeys(resolved))
+
+
+def is_indexed(table_info, columns):
+    """
+    Checks whether an existing index (the primary key included) starts with the given columns
+    """
+    wanted = [column.lower() for column in columns]
+    for index in table_info["indexes"].values():
+        if [column.lower() for column in index["columns"][:len(wanted)]] == wanted:
+            return True
+    return False
+
+
+def index_statement(table_name, table_info, columns):
+    """
+    Builds the CREATE INDEX statement, indexing TEXT columns by a prefix
+    """
+    types = {entry["name"]: entry["data_type"].lower() for entry in table_info["columns"]}
+    parts = [
+        f"{column}({INDEX_PREFIX_LENGTH})" if types.get(column) in TEXT_TYPES else column
+        for column in columns]
+    index_name = f"idx_{table_name}_{'_'.join(columns).lower()}"[:64]
+    return f"CREATE INDEX {index_name} ON {table_name} ({', '.join(parts)})"
+
+
+def index_candidates(usage, query_tables, tables):
+    """
+    Proposes indexes per advised table: equality columns first, then one range column, or else the
+    GROUP BY / ORDER BY columns the index could return in order, plus one index per join column
+    Returns [(table, columns)] that no existing index already starts with
+    """
+    resolved = {key: resolve_columns(columns, query_tables, tables) for key, columns in usage.items()}
+    candidates = []
+    for name in query_tables:
+        table_name, table_info = find_table(tables, name)
+        if table_info is None or table_name.lower() not in ADVISED_TABLES:
+            continue
+
+        def table_columns(key):
+            return [column for table, column in resolved[key] if table == table_name]
+
+        leading = table_columns("equality") + table_columns("range")[:1]
+        if not table_columns("range"):
+            leading += table_columns("group") or table_columns("order")
+        if leading:
+            candidates.append((table_name, tuple(dict.fromkeys(leading))[:MAX_INDEX_COLUMNS]))
+        candidates += [(table_name, (column,)) for column in table_columns("join")]
+
+    return [
+        (table_name, columns) for table_name, columns in dict.fromkeys(candidates)
+        if not is_indexed(find_table(tables, table_name)[1], columns)]
+
+
+def summary_table_for(parsed, usage, tables):
+    """
+    Picks the summary table that answers a box_score aggregate grouped by player, team or team game
+    Returns {"kind": "summary_table", "table", "exists", "reason"} or None
+    """
+    if "box_score" not in parsed["tables"] or "GROUP" not in parsed["keywords"] \
+            or not AGGREGATE_PATTERN.search(parsed["fingerprint"]):
+        return None
+
+    grouped = {column for _, column in usage["group"]}
+    if "game_id" in grouped and grouped & TEAM_KEYS:
+        table = "team_game_totals"
+    elif grouped & PLAYER_KEYS:
+        table = "player_season_stats"
+    elif grouped & TEAM_KEYS:
+        table = "team_season_stats"
+    else:
+        return None
+
+    exists = find_table(tables, table)[1] is not None
+    reason = f"aggregates box_score per {SUMMARY_GROUPS[table]}; " + (
+        f"read the pre-aggregated {table} table instead" if exists else f"{table} hasn't been built")
+    return {"kind": "summary_table", "table": table, "exists": exists, "reason": reason}
+
+
+def advise(top=10, since=None, path=None):
+    """
+    Runs EXPLAIN on the slowest logged SELECTs that read the advised tables and collects suggestions
+    Returns a list of the slow-query log summaries, each with "plan" and "suggestions" added
+    """
+    tables = get_schema()["tables"]
+    advice = []
+    for entry in slowest_fingerprints(top, since, path):
+        if entry["statement_type"] != "SELECT" or not entry["sql_query"] \
+                or not set(entry["tables"]) & set(ADVISED_TABLES):
+            continue
+
+        sql_query = entry["sql_query"]
+        parsed = parse_sql(sql_query)
+        usage = predicate_columns(sql_query)
+        if usage is None:
+            continue
+        plan = explain_select(sql_query, entry["params"])
+        scanned = None
+        if plan is not None:
+            scanned = {parsed["aliases"].get(name.lower()) or name.lower() for name in plan["full_scans"] if name}
+
+        suggestions = []
+        for table_name, columns in index_candidates(usage, parsed["tables"], tables):
+            if scanned is not None and table_name.lower() not in scanned:
+                continue
+            suggestions.append({
+                "kind": "index",
+                "table": table_name,
+                "columns": list(columns),
+                "statement": index_statement(table_name, find_table(tables, table_name)[1], columns)
+            })
+        summary = summary_table_for(parsed, usage, tables)
+        if summary:
+            suggestions.append(summary)
+        advice.append({**entry, "plan": plan, "suggestions": suggestions})
+    return advice
+
+
+def apply_advice(advice):
+    """
+    Creates the suggested indexes and builds the summary tables that don't exist yet
+    Only suggestions whose query could be EXPLAINed are applied, and at most MAX_INDEXES_PER_TABLE
+    indexes are created per table in one run (the slowest fingerprints' suggestions first)
+    """
+    verified = [entry for entry in advice if entry["plan"] is not None]
+    skipped = len(advice) - len(verified)
+    if skipped:
+        print(f"Skipping {skipped} of the slow queries: EXPLAIN failed, so their suggestions are unverified")
+
+    statements = []
+    per_table = {}
+    for table_name, statement in dict.fromkeys(
+            (suggestion["table"], suggestion["statement"]) for entry in verified
+            for suggestion in entry["suggestions"] if suggestion["kind"] == "index"):
+        if per_table.get(table_name, 0) >= MAX_INDEXES_PER_TABLE:
+            print(f"Skipping {statement}: already creating {MAX_INDEXES_PER_TABLE} indexes on {table_name}")
+            continue
+        per_table[table_name] = per_table.get(table_name, 0) + 1
+        statements.append(statement)
+
+    changed = False
+    for statement in statements:
+        print(f"Running {statement}")
+        result = execute_query(statement, fetch=False, commit=True)
+        if result["success"]:
+            changed = True
+        else:
+            print(f"Could not create the index: {result['error']}")
+
+    if any(suggestion["kind"] == "summary_table" and not suggestion["exists"]
+           for entry in verified for suggestion in entry["suggestions"]):
+        print("Building summary tables...")
+        changed = refresh_summary_tables() or changed
+
+    if changed:
+        mark_schema_changed()
+    return changed
+
+
+def print_advice(advice):
+    """
+    Prints each slow fingerprint with its plan and suggestions
+    """
+    if not advice:
+        print("No logged SELECTs on box_score, players or teams to advise on.")
+        return
+    for number, entry in enumerate(advice, 1):
+        examined = f", ~{entry['avg_rows_examined']:,} rows examined" if entry["avg_rows_examined"] is not None else ""
+        returned = f", {entry['avg_rows_returned']:,} returned" if entry["avg_rows_returned"] is not None else ""
+        print(f"\n{number}. {entry['calls']} calls, {entry['total_ms']:,.1f} ms total, "
+              f"p95 {entry['p95_ms']:,.1f} ms{examined}{returned}")
+        print(f"   {entry['fingerprint'][:200]}")
+        plan = entry["plan"]
+        if plan is None:
+            print("   plan: EXPLAIN failed, suggestions are unverified")
+        else:
+            scans = f", full scans of {', '.join(dict.fromkeys(plan['full_scans']))}" if plan["full_scans"] else ""
+            print(f"   plan: ~{plan['rows_examined']:,} rows examined, cost {plan['query_cost']:,.1f}{scans}")
+        for suggestion in entry["suggestions"]:
+            if suggestion["kind"] == "index":
+                print(f"   -> {suggestion['statement']}")
+            else:
+                print(f"   -> summary table {suggestion['table']}: {suggestion['reason']}")
+        if not entry["suggestions"]:
+            print("   -> no suggestion")
+
+
+def main():
+    """
+    Prints (or saves, or applies) the advice for the slowest logged queries
+    """
+    parser = argparse.ArgumentParser(description="Suggest indexes and summary tables from the slow-query log")
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest fingerprints to explain")
+    parser.add_argument("--since-hours", type=float, help="only read queries logged in the last N hours")
+    parser.add_argument("--log", help="read another query log file")
+    parser.add_argument("--json", help="save the advice as JSON")
+    parser.add_argument("--apply", action="store_true", help="create the indexes and missing summary tables")
+    args = parser.parse_args()
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours else None
+    advice = advise(args.top, since, args.log)
+    print_advice(advice)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(advice, file, indent=2, default=str)
+        print(f"\nSaved advice to {args.json}")
+    if args.apply:
+        apply_advice(advice)
+
+
+if __name__ == "__main__":
+    main()
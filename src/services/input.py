@@ -3,52 +3,126 @@ input.py
 
 This file contains the functions for handling the user's input
 This means acquiring the intent from nlp.py, then sending the
-query to the appropriate service.
+query to the appropriate service. Callers can pass an on_event
+callback to follow each stage (intent, SQL as it is generated,
+validation, execution, rows, explanation) as it happens.
 """
 
-from src.services.translation import translate_to_sql, format_sql_results, format_schema_results
-from src.services.db import execute_sql
+from src.services.translation import (
+    translate_to_sql,
+    format_sql_results,
+    format_schema_results,
+    generate_sql_explanation,
+    explain_translation,
+    notify,
+    token_callback
+)
 from src.services.modification import handle_data_modification
+from src.services.repair import execute_with_repair
+from src.services.telemetry import span
+from src.utils.sql_parser import render_sql
+from src.utils.nlp import user_input
 
-def user_input(query):
+def executed_query(translation_result, execution_result):
     """
-    Processes the user's input to determine their intent and clean the query
-    Returns a tuple of (intent, cleaned_query)
+    Returns the SQL that actually ran, with its parameters filled in for display
     """
-    query = query.lower().strip()
+    repair = execution_result.get("repair")
+    if repair:
+        return repair["sql_query"]
+    return render_sql(translation_result["sql_query"], translation_result.get("params"))
 
-    schema_keywords = ['show', 'describe', 'structure', 'schema', 'tables', 'columns']
-    if any(keyword in query for keyword in schema_keywords):
-        return "schema_explore", query
 
-    modification_keywords = ['insert', 'update', 'delete', 'add', 'remove', 'change']
-    if any(keyword in query for keyword in modification_keywords):
-        return "data_modification", query
+def query_explanation(clean_query, translation_result, execution_result, on_event=None):
+    """
+    Explains the SQL that ran, re-explaining a repaired query
+    Runs after the rows are shown, streaming the explanation as "explanation_token" events
+    """
+    on_token = token_callback(on_event, "explanation_token")
+    repair = execution_result.get("repair")
+    with span("explain"):
+        if repair:
+            explanation = generate_sql_explanation(repair["sql_query"], clean_query, on_token=on_token)
+        else:
+            explanation = explain_translation(clean_query, translation_result, on_token=on_token)
+    notify(on_event, "explanation", text=explanation)
+    return explanation
+
+
+def run_translation(clean_query, translation_result, on_event=None):
+    """
+    Executes a translated query (repairing it if it fails) and reports the execution stages
+    Returns (execution_result, sql_query) where sql_query is the SQL that ran
+    """
+    notify(on_event, "execution_start",
+           sql_query=render_sql(translation_result["sql_query"], translation_result.get("params")))
+    with span("execute") as current:
+        execution_result = execute_with_repair(
+            clean_query, translation_result["sql_query"], translation_result.get("params"))
+        current.set(
+            success=execution_result["success"],
+            rows=execution_result.get("row_count"),
+            repaired=bool(execution_result.get("repair")),
+            cached=execution_result.get("cached", False),
+            shared=execution_result.get("shared", False))
+    sql_query = executed_query(translation_result, execution_result)
+    if execution_result.get("repair"):
+        notify(on_event, "sql", sql_query=sql_query, source="repair")
+    if execution_result["success"]:
+        notify(on_event, "rows", result=execution_result)
+    else:
+        notify(on_event, "error", error=execution_result["error"])
+    return execution_result, sql_query
 
-    return "data_query", query
 
-def handle_query(user_query):
+def format_result(user_intent, execution_result):
+    """
+    Formats an execution result for display
+    """
+    with span("format", rows=execution_result.get("row_count")):
+        if user_intent == "schema_explore":
+            return format_schema_results(execution_result)
+        return format_sql_results(execution_result)
+
+
+def handle_query(user_query, on_event=None):
     """
     Handles the user's input and returns the results of the query 
     (includes processing, translation, execution, and formatting)
+    on_event(stage, payload) is called as each stage finishes: "intent", "sql_token", "sql",
+    "validation", "execution_start", "rows", "explanation_token", "explanation" and "error"
+    Each question is traced as one "handle_query" span with a child span per stage
+    """
+    with span("handle_query") as current:
+        result = route_query(user_query, on_event)
+        current.set(query_type=result.get("query_type"), status=result.get("status"))
+    return result
+
+
+def route_query(user_query, on_event=None):
+    """
+    Sends the user's query to the service for its intent (see handle_query)
     """
-    user_intent, clean_query = user_input(user_query)
+    with span("intent") as current:
+        user_intent, clean_query = user_input(user_query)
+        current.set(intent=user_intent)
+    notify(on_event, "intent", intent=user_intent, query=clean_query)
 
     if user_intent == "schema_explore":
         print("Schema exploration")
-        translation_result = translate_to_sql(clean_query)
+        translation_result = translate_to_sql(clean_query, on_event=on_event, explain=False)
 
-        if translation_result["success"]:
-            sql_query = translation_result["sql_query"]
-            execution_result = execute_sql(sql_query)
+        if translation_result.get("sql_query"):
+            execution_result, sql_query = run_translation(clean_query, translation_result, on_event)
 
             if execution_result["success"]:
-                formatted_result = format_schema_results(execution_result)
+                explanation = query_explanation(clean_query, translation_result, execution_result, on_event)
+                formatted_result = format_result(user_intent, execution_result)
 
                 return {
                     "query_type": user_intent,
                     "sql_query": sql_query,
-                    "explanation": translation_result.get("explanation", ""),
+                    "explanation": explanation,
                     "raw_result": execution_result,
                     "formatted_result": formatted_result
                 }
@@ -59,24 +133,31 @@ def handle_query(user_query):
                 "status": "Execution failed"
             }
     elif user_intent == "data_query":
-        translation_result = translate_to_sql(clean_query)
+        translation_result = translate_to_sql(clean_query, on_event=on_event, explain=False)
 
-        if translation_result["success"]:
-            sql_query = translation_result["sql_query"]
-            execution_result = execute_sql(sql_query)
+        if translation_result.get("sql_query"):
+            execution_result, sql_query = run_translation(clean_query, translation_result, on_event)
 
             if execution_result["success"]:
-                formatted_result = format_sql_results(execution_result)
+                explanation = query_explanation(clean_query, translation_result, execution_result, on_event)
+                formatted_result = format_result(user_intent, execution_result)
 
                 return {
                     "query_type": user_intent,
                     "processed_query": clean_query,
                     "sql_query": sql_query,
-                    "explanation": translation_result["explanation"],
+                    "explanation": explanation,
                     "raw_result": execution_result,
                     "formatted_result": formatted_result,
                     "status": "Executed successfully"
                 }
+            if not translation_result["success"]:
+                return {
+                    "query_type": user_intent,
+                    "processed_query": clean_query,
+                    "error": translation_result["error"],
+                    "status": "Translation failed"
+                }
             return {
                 "query_type": user_intent,
                 "processed_query": clean_query,
@@ -91,7 +172,7 @@ def handle_query(user_query):
             "status": "Translation failed"
         }
     elif user_intent == "data_modification":
-        modification_result = handle_data_modification(clean_query)
+        modification_result = handle_data_modification(clean_query, on_event=on_event)
 
         if modification_result["success"]:
             return {
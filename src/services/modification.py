@@ -5,21 +5,28 @@ This file contains functions for translating natural language
 modification queries into valid SQL queries
 """
 
-import re
-import mysql.connector
-from src.services.db import execute_sql, get_primary_keys
-from src.services.translation import call_language_model, validate_sql
-from src.utils.config import NBA_SCHEMA_CONTEXT, SAMPLE_DATA, EXAMPLE_QUERIES
-
-def handle_data_modification(user_input):
+from src.services.db import prepare_sql, execute_modification_transaction
+from src.services.schema import get_schema_context, primary_keys, table_columns
+from src.services.translation import call_language_model, notify, token_callback
+from src.services.entities import (
+    resolve_mentions,
+    entity_prompt_context,
+    invalidate_entity_index
+)
+from src.utils.sql_parser import parse_sql, dml_target, split_sql, parameterize
+from src.utils.config import SAMPLE_DATA, EXAMPLE_QUERIES, MODIFICATION_MAX_STATEMENTS
+
+def handle_data_modification(user_input, on_event=None):
     """
     Process natural language requests for data modification (INSERT, UPDATE, DELETE)
+    A request that touches several records can become one set-based statement or a batch of statements
+    on_event receives "sql_token" events while the model writes the SQL, then "sql" and "validation"
     """
     prompt = f"""
         You are an expert SQL translator for an NBA database. Convert the following natural language request
-        into a valid MySQL data modification statement (INSERT, UPDATE, or DELETE).
+        into valid MySQL data modification statements (INSERT, UPDATE, or DELETE).
 
-        {NBA_SCHEMA_CONTEXT}
+        {get_schema_context()}
 
         Sample data:
         Players: {SAMPLE_DATA['players'][:2]}
@@ -30,189 +37,235 @@ def handle_data_modification(user_input):
         2. "Update Michael Jordan's team to the Lakers": {EXAMPLE_QUERIES[15]}
         3. "Delete the player with Person_ID 20777 (Added in example 1)": {EXAMPLE_QUERIES[16]}
 
+        {entity_prompt_context(resolve_mentions(user_input))}
+
         User Request: {user_input}
 
-        Return only the SQL statement without any explanation. Use precise column names from the schema.
+        Return only the SQL without any explanation. Use precise column names from the schema.
+        If the request changes several records the same way, use one set-based statement (e.g. WHERE PERSON_ID IN (...))
+        If the records need different values (e.g. adding several players), return one statement per record,
+        each ending with a semicolon and all with the same columns in the same order
         If creating a new record, include all required fields with reasonable default values if not provided
         If updating records, include appropriate WHERE clauses to target specific records
         If deleting records, include a very specific WHERE clause to prevent accidental deletion of multiple records
     """
 
-    sql_query = call_language_model(prompt)
-    is_valid, error_msg = validate_sql(sql_query)
-
-    if not is_valid:
+    sql_query = call_language_model(prompt, on_token=token_callback(on_event, "sql_token"))
+    notify(on_event, "sql", sql_query=sql_query, source="model")
+    statements = split_modification(sql_query)
+    error_msg = check_statement_count(statements)
+    for number, statement in enumerate(statements, start=1):
+        if error_msg:
+            break
+        _, error_msg = check_modification(statement)
+        if error_msg and len(statements) > 1:
+            error_msg = f"Statement {number}: {error_msg}"
+    notify(on_event, "validation", valid=not error_msg, error=error_msg)
+
+    if error_msg:
         return {
             "success": False,
             "error": error_msg,
             "original_request": user_input
         }
 
+    if len(statements) > 1:
+        sql_query = ";\n".join(statements) + ";"
+        explanation = f"""
+            This will run {len(statements)} statements in one transaction.
+            Please review the combined preview and press Confirm to apply it, or Cancel and rephrase the request.
+        """
+    else:
+        explanation = """
+            This will modify data in the database.
+            Please review the preview and press Confirm to apply it, or Cancel and rephrase the request.
+        """
+
     return {
         "success": True,
         "sql_query": sql_query,
+        "statements": statements,
         "status": "Ready for confirmation",
-        "explanation": """
-            This will modify data in the database. 
-            Please confirm by typing 'confirm' or modify the SQL query.
-        """,
+        "explanation": explanation,
         "original_request": user_input}
 
 
-def execute_modification(sql_query):
+def split_modification(sql_query):
     """
-    Execute a data modification query with additional safety checks
+    Splits a generated modification into its statements (empty if it can't be tokenized)
     """
-    if sql_query.strip().upper().startswith(
-            "DELETE") and "WHERE" not in sql_query.upper():
-        return {
-            "success": False,
-            "error": "DELETE operations must include a WHERE clause for safety"
-        }
+    try:
+        return split_sql(sql_query)
+    except ValueError:
+        return []
+
+
+def check_statement_count(statements):
+    """
+    Checks that a modification has between one and MODIFICATION_MAX_STATEMENTS statements
+    """
+    if not statements:
+        return "Could not read any SQL statements from the request"
+    if len(statements) > MODIFICATION_MAX_STATEMENTS:
+        return f"Too many statements ({len(statements)}), the limit is {MODIFICATION_MAX_STATEMENTS}"
+    return None
+
+
+def check_modification(statement):
+    """
+    Validates one modification statement with additional safety checks
+    Returns (parsed, error) where error is None for a safe statement
+    """
+    prepared = prepare_sql(statement)
+    if not prepared["success"]:
+        return prepared["parsed"], prepared["error"]
+    parsed = prepared["parsed"]
+
+    if parsed["statement_type"] == "DELETE" and not parsed["has_where"]:
+        return parsed, "DELETE operations must include a WHERE clause for safety"
+    if parsed["statement_type"] == "UPDATE" and not parsed["has_where"]:
+        return parsed, "UPDATE operations must include a WHERE clause for safety"
+    if parsed["statement_type"] not in ("INSERT", "UPDATE", "DELETE"):
+        return parsed, "Only INSERT, UPDATE and DELETE statements can be executed as modifications"
+    return parsed, None
+
 
-    if sql_query.strip().upper().startswith(
-            "UPDATE") and "WHERE" not in sql_query.upper():
+def modification_image(sql_query):
+    """
+    Describes the rows a modification touches so they can be read before and after it runs
+    UPDATE and DELETE are read by their WHERE clause, INSERT by the primary key values it inserts
+    Returns None when the target can't be determined (e.g. multi-table statements)
+    """
+    target = dml_target(sql_query)
+    if target is None:
+        return None
+
+    where, where_params = parameterize(target["where"]) if target["where"] else (None, ())
+    image = {
+        "table": target["table"],
+        "where": where,
+        "where_params": where_params or (),
+        "key_columns": primary_keys(target["table"]) or [],
+        "key_values": []
+    }
+    if target["statement_type"] == "INSERT":
+        columns = target["insert_columns"] or table_columns(target["table"]) or []
+        positions = {column.lower(): i for i, column in enumerate(columns)}
+        key_positions = [positions.get(column.lower()) for column in image["key_columns"]]
+        if not image["key_columns"] or None in key_positions:
+            return None
+        for row in target["insert_rows"]:
+            values = tuple(row[i] if i < len(row) else None for i in key_positions)
+            if None in values:
+                return None
+            image["key_values"].append(values)
+    return image
+
+
+def merge_images(images):
+    """
+    Combines the images of a batch of same-shape statements so each batch is read once before and once after
+    """
+    if not images or None in images:
+        return None
+    first = images[0]
+    if any(image["table"] != first["table"] for image in images):
+        return None
+    wheres = [image["where"] for image in images]
+    return {
+        "table": first["table"],
+        "where": " OR ".join(f"({where})" for where in wheres) if None not in wheres else None,
+        "where_params": tuple(param for image in images for param in image["where_params"]),
+        "key_columns": first["key_columns"],
+        "key_values": [values for image in images for values in image["key_values"]]
+    }
+
+
+def build_batches(statements):
+    """
+    Groups consecutive statements that differ only in their literals into one parameterized
+    batch for executemany, keeping the statements' order
+    """
+    batches = []
+    for statement in statements:
+        skeleton, params = parameterize(statement)
+        image = modification_image(statement)
+        if params is not None and batches and batches[-1]["sql_query"] == skeleton:
+            batches[-1]["params_list"].append(params)
+            batches[-1]["images"].append(image)
+        elif params is not None:
+            batches.append({"sql_query": skeleton, "params_list": [params], "images": [image]})
+        else:
+            batches.append({"sql_query": statement, "params_list": None, "images": [image]})
+
+    for batch in batches:
+        batch["images"] = [merge_images(batch["images"])]
+    return batches
+
+
+def execute_modification(sql_query, dry_run=False):
+    """
+    Execute a data modification (one statement or a batch) with additional safety checks
+    Every statement runs in one transaction, and the touched rows are read before and after the change;
+    dry_run rolls it back to preview the change
+    """
+    statements = split_modification(sql_query)
+    error = check_statement_count(statements)
+    if error:
         return {
             "success": False,
-            "error": "UPDATE operations must include a WHERE clause for safety"
+            "error": error
         }
 
-    result = execute_sql(sql_query)
+    tables = set()
+    for number, statement in enumerate(statements, start=1):
+        parsed, error = check_modification(statement)
+        if error:
+            return {
+                "success": False,
+                "error": f"Statement {number}: {error}" if len(statements) > 1 else error
+            }
+        tables.update(parsed["tables"])
+
+    result = execute_modification_transaction(build_batches(statements), dry_run=dry_run)
+    if result.get("success") and not dry_run and {"players", "teams"} & tables:
+        invalidate_entity_index()
     return result
 
 
 def verify_modification(sql_query, execution_result):
     """
     Allows the user to verify the results of their modification
+    Uses the rows read back inside the modification's transaction, so no further queries are run
     """
-    if not execution_result.get("success", False):
+    if not execution_result.get("success", False) or "after" not in execution_result:
         return execution_result
 
-    try:
-        sql_upper = sql_query.upper()
-        verification_sql = None
-
-        if sql_upper.startswith("INSERT"):
-            match = re.search(r"INSERT\s+INTO\s+(\w+)", sql_upper)
-            if not match:
-                return execution_result
-
-            table_name = match.group(1).lower()
-
-            pk_info = get_primary_keys(table_name)
-            if 'error' in pk_info or not pk_info.get('primary_keys'):
-                verification_sql = f"""
-                    SELECT * FROM {table_name} ORDER BY {pk_info.get('primary_keys', ['id'])[0]} DESC LIMIT 1
-                """
-            else:
-                values_match = re.search(
-                    r"VALUES\s*\((.*?)\)",
-                    sql_query,
-                    re.IGNORECASE | re.DOTALL)
-                if not values_match:
-                    verification_sql = f"""
-                        SELECT * FROM {table_name} ORDER BY {pk_info.get('primary_keys')[0]} DESC LIMIT 1
-                    """
-                else:
-                    values = values_match.group(1).split(',')
-                    pk_columns = pk_info.get('primary_keys', [])
-
-                    pk_values = {}
-                    col_match = re.search(
-                        r"INSERT\s+INTO\s+\w+\s*\((.*?)\)",
-                        sql_query,
-                        re.IGNORECASE | re.DOTALL)
-                    if col_match:
-                        columns = [c.strip()
-                                   for c in col_match.group(1).split(',')]
-                        for i, col in enumerate(columns):
-                            if i < len(values) and col in pk_columns:
-                                pk_values[col] = values[i].strip().strip("'\"")
-
-                    if pk_values:
-                        where_clauses = []
-                        for col, val in pk_values.items():
-                            where_clauses.append(f"{col} = {val}")
-                        verification_sql = f"""
-                            SELECT * FROM {table_name} WHERE {' AND '.join(where_clauses)}
-                        """
-                    else:
-                        verification_sql = f"""
-                            SELECT * FROM {table_name} ORDER BY {pk_info.get('primary_keys')[0]} DESC LIMIT 1
-                        """
-
-        elif sql_upper.startswith("UPDATE"):
-            match = re.search(r"UPDATE\s+(\w+)", sql_upper)
-            if not match:
-                return execution_result
-
-            table_name = match.group(1).lower()
-
-            where_match = re.search(
-                r"WHERE\s+(.*?)(?:ORDER BY|LIMIT|$)",
-                sql_query,
-                re.IGNORECASE | re.DOTALL)
-            if not where_match:
-                verification_sql = f"SELECT * FROM {table_name} LIMIT 5"
-            else:
-                where_clause = where_match.group(1).strip()
-                verification_sql = f"SELECT * FROM {table_name} WHERE {where_clause} LIMIT 5"
-
-        elif sql_upper.startswith("DELETE"):
-            match = re.search(r"DELETE\s+FROM\s+(\w+)", sql_upper)
-            if not match:
-                return execution_result
-
-            table_name = match.group(1).lower()
-
-            where_match = re.search(
-                r"WHERE\s+(.*?)(?:ORDER BY|LIMIT|$)",
-                sql_query,
-                re.IGNORECASE | re.DOTALL)
-            if not where_match:
-                verification_sql = f"SELECT COUNT(*) as remaining_records FROM {table_name}"
-            else:
-                where_clause = where_match.group(1).strip()
-                verification_sql = f"""
-                    SELECT COUNT(*) as remaining_records FROM {table_name} WHERE {where_clause}
-                """
-
+    statement_types = {
+        parse_sql(statement)["statement_type"] for statement in split_modification(sql_query)}
+    verification_result = {
+        "success": True,
+        "result_type": "data",
+        "data": execution_result["after"],
+        "column_names": execution_result.get("column_names", []),
+        "row_count": len(execution_result["after"]),
+        "before": execution_result.get("before", []),
+        "original_change": execution_result.get("message", ""),
+        "affected_rows": execution_result.get("affected_rows", 0)
+    }
+
+    if statement_types == {"DELETE"}:
+        count = len(execution_result["after"])
+        if count == 0:
+            verification_result["message"] = """
+                Verification successful: All matching records were deleted.
+            """
         else:
-            return execution_result
-
-        verification_result = execute_sql(verification_sql)
-
-        if verification_result.get("success", False):
-            if sql_upper.startswith("DELETE"):
-                count = verification_result.get(
-                    "data", [
-                        {}])[0].get(
-                    "remaining_records", 0)
-                if count == 0:
-                    verification_result["message"] = """
-                        Verification successful: All matching records were deleted.
-                    """
-                else:
-                    verification_result["message"] = f"""
-                        Verification: {count} similar records still exist in the database.
-                    """
-            else:
-                verification_result["message"] = """
-                    Verification: Here are the affected records after your modification:
-                """
-
-            verification_result["original_change"] = execution_result.get(
-                "message", "")
-            verification_result["affected_rows"] = execution_result.get(
-                "affected_rows", 0)
-
-            return verification_result
-        return execution_result
-
-    except (
-            mysql.connector.Error,
-            mysql.connector.IntegrityError,
-            mysql.connector.ProgrammingError
-        ) as e:
-        execution_result["verification_error"] = str(e)
-        return execution_result
+            verification_result["message"] = f"""
+                Verification: {count} similar records still exist in the database.
+            """
+    else:
+        verification_result["message"] = """
+            Verification: Here are the affected records after your modification:
+        """
+    return verification_result
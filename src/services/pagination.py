@@ -0,0 +1,224 @@
+"""
+pagination.py
+
+This file contains the queries behind the paginated result viewer. A
+single-table SELECT without ordering or grouping is paged by key: each page
+continues after the last primary key of the page before it, so every page
+is an index range read however deep it is. Any other SELECT is paged with
+LIMIT/OFFSET appended to the original query (or, when it has a LIMIT of its
+own, cut from its rows). Pages come with a total-count estimate
+from EXPLAIN, and a whole result can be exported as CSV or Parquet streamed
+from an unbuffered cursor.
+"""
+
+from mysql.connector import Error
+from src.services.db import get_connection, close_connection, execute_query, explain_select, prepare_sql
+from src.services.schema import primary_keys
+from src.utils.sql_parser import parse_sql, parameterize, select_parts, add_optimizer_hint
+from src.utils.sql_export import stream_query_batches, write_csv_batches, write_parquet_batches
+from src.utils.config import (
+    RESULT_PAGE_SIZE,
+    RESULT_EXPORT_MAX_ROWS,
+    EXPORT_BATCH_SIZE,
+    QUERY_MAX_EXECUTION_MS
+)
+
+
+def paging_plan(sql_query, params=None):
+    """
+    Decides how to page a SELECT; a literal query is parameterized first
+    The query goes through the same validation as execute_sql, so a plan only ever holds a single
+    SELECT over existing tables and columns
+    Returns {"mode": "keyset" | "offset", "sql_query", "params", ...}, or None for statements
+    that aren't valid SELECTs reading a table
+    """
+    if params is None:
+        try:
+            sql_query, params = parameterize(sql_query)
+        except ValueError:
+            return None
+    sql_query = sql_query.strip().rstrip(';').rstrip()
+    params = tuple(params or ())
+    prepared = prepare_sql(sql_query)
+    parsed = prepared["parsed"]
+    if not prepared["success"] or parsed["statement_type"] != 'SELECT' or not parsed["has_from"]:
+        return None
+
+    plan = {"mode": "offset", "sql_query": sql_query, "params": params}
+    parts = select_parts(sql_query)
+    key_columns = primary_keys(parts["table"]) if parts else None
+    if not key_columns:
+        return plan
+
+    head_end = parts["head_placeholders"]
+    where_end = head_end + parts["where_placeholders"]
+    limit = params[where_end] if parts["limit"] == '%s' else parts["limit"]
+    plan.update({
+        "mode": "keyset",
+        "head": parts["head"],
+        "head_params": params[:head_end],
+        "where": parts["where"],
+        "where_params": params[head_end:where_end],
+        "key_columns": key_columns,
+        "limit": limit
+    })
+    return plan
+
+
+def keyset_query(plan, after, limit):
+    """
+    Builds the query for the page that starts after the given primary key values
+    """
+    keys = ', '.join(f"`{column}`" for column in plan["key_columns"])
+    conditions = []
+    params = list(plan["head_params"])
+    if plan["where"]:
+        conditions.append(f"({plan['where']})")
+        params.extend(plan["where_params"])
+    if after is not None:
+        markers = ', '.join(['%s'] * len(after))
+        conditions.append(f"({keys}) > ({markers})" if len(after) > 1 else f"{keys} > %s")
+        params.extend(after)
+
+    sql_query = plan["head"]
+    if conditions:
+        sql_query += " WHERE " + " AND ".join(conditions)
+    return f"{sql_query} ORDER BY {keys} LIMIT %s", tuple(params) + (limit,)
+
+
+def offset_query(plan, page):
+    """
+    Builds the query for an offset page by appending LIMIT/OFFSET to the statement itself; wrapping it
+    in a derived table would fail on joins that select two columns of the same name
+    A query with a LIMIT of its own is run as it is and the page is cut from its rows
+    Returns (sql_query, params, rows to skip)
+    """
+    if parse_sql(plan["sql_query"])["has_limit"]:
+        return plan["sql_query"], plan["params"], page * RESULT_PAGE_SIZE
+    return (
+        f"{plan['sql_query']} LIMIT %s OFFSET %s",
+        plan["params"] + (RESULT_PAGE_SIZE + 1, page * RESULT_PAGE_SIZE),
+        0)
+
+
+def fetch_page(plan, page, after=None):
+    """
+    Fetches one page of RESULT_PAGE_SIZE rows (page counts from 0)
+    Keyset plans need the key that ended the previous page (the previous page's "next_key")
+    Returns {"success", "rows", "column_names", "page", "has_more", "next_key"}
+    """
+    skip = 0
+    if plan["mode"] == "keyset":
+        limit = RESULT_PAGE_SIZE + 1
+        if plan["limit"] is not None:
+            limit = min(limit, max(int(plan["limit"]) - page * RESULT_PAGE_SIZE, 0))
+        if limit == 0:
+            return {"success": True, "rows": [], "column_names": [], "page": page,
+                    "has_more": False, "next_key": None}
+        sql_query, params = keyset_query(plan, after, limit)
+    else:
+        sql_query, params, skip = offset_query(plan, page)
+
+    result = execute_query(
+        add_optimizer_hint(sql_query, f"MAX_EXECUTION_TIME({QUERY_MAX_EXECUTION_MS})"),
+        params,
+        fetch=True,
+        commit=False)
+    if not result["success"]:
+        return {"success": False, "error": result["error"]}
+
+    rows = result["data"][skip:]
+    has_more = len(rows) > RESULT_PAGE_SIZE
+    rows = rows[:RESULT_PAGE_SIZE]
+    next_key = None
+    if plan["mode"] == "keyset":
+        names = {name.lower(): name for name in result["column_names"]}
+        key_names = [names.get(column.lower()) for column in plan["key_columns"]]
+        if None in key_names:
+            # The keys aren't selected, so there's nothing to continue from
+            plan["mode"] = "offset"
+            return fetch_page(plan, page)
+        if has_more and rows:
+            next_key = tuple(rows[-1][name] for name in key_names)
+
+    return {
+        "success": True,
+        "rows": rows,
+        "column_names": result["column_names"],
+        "page": page,
+        "has_more": has_more,
+        "next_key": next_key
+    }
+
+
+def first_page(plan, result):
+    """
+    Builds page 0 from the rows the query already returned (bounded at DEFAULT_QUERY_LIMIT), so
+    showing a result doesn't run it again
+    Keyset plans can only continue from those rows when they came back in primary key order
+    Returns the same dict as fetch_page, or None when page 0 has to be fetched
+    """
+    rows = result["data"]
+    if len(rows) <= RESULT_PAGE_SIZE:
+        return None
+
+    next_key = None
+    if plan["mode"] == "keyset":
+        names = {name.lower(): name for name in result["column_names"]}
+        key_names = [names.get(column.lower()) for column in plan["key_columns"]]
+        if None in key_names:
+            return None
+        keys = [tuple(row[name] for name in key_names) for row in rows]
+        if any(previous >= key for previous, key in zip(keys, keys[1:])):
+            return None
+        next_key = keys[RESULT_PAGE_SIZE - 1]
+
+    return {
+        "success": True,
+        "rows": rows[:RESULT_PAGE_SIZE],
+        "column_names": result["column_names"],
+        "page": 0,
+        "has_more": True,
+        "next_key": next_key
+    }
+
+
+def estimate_count(plan):
+    """
+    Estimates the number of rows in the whole result from the EXPLAIN plan (None if it can't be explained)
+    This is the optimizer's row estimate, an upper bound for filtered queries
+    """
+    summary = explain_select(plan["sql_query"], plan["params"])
+    if summary is None:
+        return None
+    estimate = summary["rows_examined"]
+    if plan.get("limit") is not None:
+        estimate = min(estimate, int(plan["limit"]))
+    return estimate
+
+
+def export_result(plan, sink, fmt='csv'):
+    """
+    Streams the whole result (up to RESULT_EXPORT_MAX_ROWS rows) as CSV or Parquet to a binary file
+    Rows are read from an unbuffered cursor in EXPORT_BATCH_SIZE batches so memory stays constant
+    A query with a LIMIT of its own is exported as it is
+    Returns {"success", "row_count"} or {"success": False, "error"}
+    """
+    connection = get_connection()
+    if not connection:
+        return {"success": False, "error": "Failed to connect to the database"}
+
+    sql_query, params = plan["sql_query"], plan["params"]
+    if not parse_sql(sql_query)["has_limit"]:
+        sql_query, params = f"{sql_query} LIMIT %s", params + (RESULT_EXPORT_MAX_ROWS,)
+    batches = stream_query_batches(connection, sql_query, params, EXPORT_BATCH_SIZE)
+    try:
+        if fmt == 'parquet':
+            row_count = write_parquet_batches(batches, sink)
+        else:
+            row_count = write_csv_batches(batches, sink)
+    except Error as e:
+        return {"success": False, "error": str(e)}
+    finally:
+        close_connection(connection)
+    return {"success": True, "row_count": row_count}
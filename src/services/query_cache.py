@@ -0,0 +1,67 @@
+"""
+query_cache.py
+
+This file contains the in-process result cache for read-only queries.
+Entries are keyed by the parsed, normalized SQL, remember which tables they
+read, expire after QUERY_CACHE_TTL seconds and are evicted least recently
+used first. Writes invalidate every entry that read a written table, and
+entries cached before the last write recorded by any process (another
+worker, or a bulk load) are dropped when they are read.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from src.utils.config import QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+from src.services.replica import last_write
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_cached_result(key):
+    """
+    Returns a copy of the cached result for a key, or None if missing, expired or cached before the last write
+    """
+    written_at = last_write()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        expires_at, cached_at, _, result = entry
+        if expires_at < time.monotonic() or cached_at < written_at:
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+    return {**result, "cached": True}
+
+
+def cache_result(key, tables, result):
+    """
+    Stores a successful result along with the tables it was read from
+    """
+    if QUERY_CACHE_SIZE <= 0 or not result.get("success"):
+        return
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + QUERY_CACHE_TTL, time.time_ns(), frozenset(tables), result)
+        _cache.move_to_end(key)
+        while len(_cache) > QUERY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def invalidate_tables(tables):
+    """
+    Drops every cached result that read from one of the given tables
+    """
+    tables = set(tables)
+    with _cache_lock:
+        for key in [key for key, (_, _, read, _) in _cache.items() if read & tables]:
+            del _cache[key]
+
+
+def clear_query_cache():
+    """
+    Drops every cached result
+    """
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,151 @@
+"""
+query_log.py
+
+This file contains the slow-query log. execute_sql records every statement
+it runs with its literal-free fingerprint, latency, estimated rows examined
+(from the cost guard's EXPLAIN, when it ran) and rows returned or affected
+in a local SQLite file. The index advisor aggregates the log by fingerprint
+to find the access patterns worth indexing.
+"""
+
+import json
+import math
+import time
+import sqlite3
+import threading
+from src.utils.config import QUERY_LOG_ENABLED, QUERY_LOG_PATH, QUERY_LOG_MIN_MS, QUERY_LOG_MAX_ROWS
+from src.services.resources import get_resource
+
+PRUNE_EVERY = 1000
+
+_log_lock = threading.Lock()
+_log_state = {"inserts": 0, "failed": False}
+
+
+def open_log(path=None):
+    """
+    Opens (and creates) the log database, returns None if it can't be opened
+    """
+    try:
+        connection = sqlite3.connect(path or QUERY_LOG_PATH, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS query_log (
+                logged_at REAL NOT NULL,
+                fingerprint TEXT NOT NULL,
+                statement_type TEXT,
+                tables TEXT,
+                source TEXT,
+                latency_ms REAL NOT NULL,
+                rows_examined INTEGER,
+                rows_returned INTEGER,
+                success INTEGER NOT NULL,
+                sql_query TEXT,
+                params TEXT
+            )
+        """)
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_query_log_fingerprint ON query_log (fingerprint, logged_at)")
+        connection.commit()
+        return connection
+    except sqlite3.Error as e:
+        print(f"Could not open the query log at {path or QUERY_LOG_PATH}: {e}")
+        if path is None:
+            _log_state["failed"] = True
+        return None
+
+
+def get_log_connection():
+    """
+    Gets the process-wide log connection (writes are serialized by _log_lock)
+    """
+    return get_resource("query_log", open_log, close=lambda connection: connection.close())
+
+
+def log_statement(parsed, sql_query, params, latency_ms, result, rows_examined=None, source="mysql"):
+    """
+    Records one executed statement; statements faster than QUERY_LOG_MIN_MS are skipped
+    sql_query and params are kept so the advisor can EXPLAIN the latest example of each fingerprint;
+    only SELECTs keep them (other statements are logged by fingerprint), so the values written by
+    modifications aren't copied into the log
+    """
+    if not QUERY_LOG_ENABLED or _log_state["failed"] or latency_ms < QUERY_LOG_MIN_MS:
+        return
+    connection = get_log_connection()
+    if connection is None:
+        return
+
+    rows_returned = result.get("row_count", result.get("affected_rows"))
+    is_select = parsed["statement_type"] == "SELECT"
+    try:
+        with _log_lock:
+            connection.execute(
+                "INSERT INTO query_log VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), parsed["fingerprint"], parsed["statement_type"], ','.join(parsed["tables"]),
+                 source, round(latency_ms, 3), rows_examined, rows_returned, int(bool(result.get("success"))),
+                 sql_query if is_select else None,
+                 json.dumps(list(params), default=str) if params and is_select else None))
+            _log_state["inserts"] += 1
+            if _log_state["inserts"] % PRUNE_EVERY == 0:
+                connection.execute(
+                    "DELETE FROM query_log WHERE rowid <= (SELECT MAX(rowid) FROM query_log) - ?",
+                    (QUERY_LOG_MAX_ROWS,))
+            connection.commit()
+    except sqlite3.Error as e:
+        print(f"Could not write to the query log: {e}")
+
+
+def slowest_fingerprints(limit=10, since=None, path=None):
+    """
+    Aggregates the log by fingerprint, slowest total time first
+    since is a Unix timestamp; path reads another log file
+    Returns a list of {"fingerprint", "statement_type", "tables", "calls", "errors", "total_ms", "avg_ms",
+    "p95_ms", "max_ms", "avg_rows_examined", "avg_rows_returned", "sql_query", "params"} where sql_query
+    and params are the latest successful example
+    """
+    connection = open_log(path) if path else get_log_connection()
+    if connection is None:
+        return []
+
+    with _log_lock:
+        rows = connection.execute("""
+            SELECT fingerprint, statement_type, tables, COUNT(*), SUM(success = 0), SUM(latency_ms),
+                   AVG(latency_ms), MAX(latency_ms), AVG(rows_examined), AVG(rows_returned),
+                   (SELECT sample.rowid FROM query_log AS sample
+                    WHERE sample.fingerprint = query_log.fingerprint AND sample.success = 1
+                    ORDER BY sample.rowid DESC LIMIT 1)
+            FROM query_log
+            WHERE logged_at >= ?
+            GROUP BY fingerprint
+            ORDER BY SUM(latency_ms) DESC
+            LIMIT ?
+        """, (since or 0, limit)).fetchall()
+
+        summaries = []
+        for (fingerprint, statement_type, tables, calls, errors, total_ms, avg_ms, max_ms,
+             avg_rows_examined, avg_rows_returned, sample_id) in rows:
+            latencies = [row[0] for row in connection.execute(
+                "SELECT latency_ms FROM query_log WHERE fingerprint = ? AND logged_at >= ? ORDER BY latency_ms",
+                (fingerprint, since or 0))]
+            sample = connection.execute(
+                "SELECT sql_query, params FROM query_log WHERE rowid = ?", (sample_id,)).fetchone()
+            summaries.append({
+                "fingerprint": fingerprint,
+                "statement_type": statement_type,
+                "tables": tables.split(',') if tables else [],
+                "calls": calls,
+                "errors": errors,
+                "total_ms": round(total_ms, 3),
+                "avg_ms": round(avg_ms, 3),
+                "p95_ms": latencies[max(math.ceil(0.95 * len(latencies)) - 1, 0)],
+                "max_ms": max_ms,
+                "avg_rows_examined": round(avg_rows_examined) if avg_rows_examined is not None else None,
+                "avg_rows_returned": round(avg_rows_returned) if avg_rows_returned is not None else None,
+                "sql_query": sample[0] if sample else None,
+                "params": json.loads(sample[1]) if sample and sample[1] else None
+            })
+
+    if path:
+        connection.close()
+    return summaries
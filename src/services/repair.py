@@ -0,0 +1,266 @@
+"""
+repair.py
+
+This file contains the self-repair stage for generated SQL that fails
+validation or execution. The MySQL error and the schema of the tables the
+query touched are sent back to the model in a short prompt, retrying up to
+REPAIR_MAX_ATTEMPTS times within REPAIR_LATENCY_BUDGET seconds. Successful
+repairs are cached, and single-identifier fixes (e.g. TEAM_NAME -> NICKNAME)
+are learned as rules so the same mistake is fixed locally next time.
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from src.services.db import execute_sql
+from src.services.schema import schema_columns, get_schema_context
+from src.services.translation import call_language_model
+from src.utils.sql_parser import parse_sql, tokenize, parameterize, render_sql
+from src.utils.config import (
+    REPAIR_MAX_ATTEMPTS,
+    REPAIR_LATENCY_BUDGET,
+    REPAIR_CACHE_SIZE
+)
+
+# Errors that rewriting the query can't fix
+UNREPAIRABLE_ERRORS = re.compile(
+    r"failed to connect|lost connection|can't connect|maximum statement execution time"
+    r"|access denied|disallowed operation|multiple statements",
+    re.IGNORECASE)
+
+# Only reads are repaired; a repair must not turn a read into a write
+REPAIRABLE_STATEMENTS = ('SELECT', 'SHOW')
+
+UNKNOWN_IDENTIFIER_PATTERN = re.compile(
+    r"unknown (?:column|table):?\s*'?(?:\w+\.)?(\w+)'?", re.IGNORECASE)
+
+_repair_cache = OrderedDict()
+_identifier_fixes = {}
+_repair_stats = {
+    "attempted": 0,
+    "repaired": 0,
+    "failed": 0,
+    "model_calls": 0,
+    "local_fixes": 0,
+    "added_seconds": 0.0
+}
+_repair_lock = threading.Lock()
+
+
+def schema_sections():
+    """
+    Splits the schema context into per-table blocks and the shared notes
+    """
+    tables = {}
+    notes = []
+    for block in get_schema_context().strip().split('\n\n'):
+        match = re.match(r'Table: (\w+)', block)
+        if match:
+            tables[match.group(1).lower()] = block
+        elif not block.startswith('NBA Database Schema'):
+            notes.append(block)
+    return tables, notes
+
+
+def pruned_schema(sql_query):
+    """
+    Builds the schema context for a repair prompt from only the tables the query references
+    A query that references no known table gets the list of table names instead
+    """
+    tables, notes = schema_sections()
+    parsed = parse_sql(sql_query)
+    referenced = [table for table in parsed.get("tables", ()) if table in tables]
+
+    if not referenced:
+        known = sorted(set(tables) | set(schema_columns()))
+        return f"Available tables: {', '.join(known)}\n\n" + '\n\n'.join(notes)
+    return '\n\n'.join([tables[table] for table in referenced] + notes)
+
+
+def is_repairable(error):
+    """
+    Checks that an error came from the query itself rather than the connection or safety checks
+    """
+    return bool(error) and not UNREPAIRABLE_ERRORS.search(error)
+
+
+def learn_identifier_fix(failed_sql, repaired_sql):
+    """
+    Records a rule when a repair only swapped identifiers (e.g. TEAM_NAME -> NICKNAME)
+    """
+    try:
+        failed_tokens = tokenize(failed_sql)
+        repaired_tokens = tokenize(repaired_sql)
+    except ValueError:
+        return
+    if len(failed_tokens) != len(repaired_tokens):
+        return
+
+    swaps = {}
+    for (failed_kind, failed_value), (repaired_kind, repaired_value) in zip(failed_tokens, repaired_tokens):
+        if failed_value == repaired_value:
+            continue
+        if failed_kind != 'identifier' or repaired_kind != 'identifier':
+            return
+        if swaps.setdefault(failed_value.lower(), repaired_value) != repaired_value:
+            return
+
+    with _repair_lock:
+        _identifier_fixes.update(swaps)
+
+
+def apply_identifier_fix(sql_query, error):
+    """
+    Applies a learned identifier fix for the identifier named in the error, if there is one
+    """
+    match = UNKNOWN_IDENTIFIER_PATTERN.search(error or "")
+    if not match:
+        return None
+    replacement = _identifier_fixes.get(match.group(1).lower())
+    if not replacement:
+        return None
+    return re.sub(
+        r'(?<![\w`])`?' + re.escape(match.group(1)) + r'`?(?![\w`])',
+        replacement,
+        sql_query,
+        flags=re.IGNORECASE)
+
+
+def cache_repair(failed_sql, repaired_sql):
+    """
+    Caches a successful repair and learns any identifier fix from it
+    """
+    key = parse_sql(failed_sql).get("normalized", failed_sql)
+    with _repair_lock:
+        _repair_cache[key] = repaired_sql
+        _repair_cache.move_to_end(key)
+        while len(_repair_cache) > REPAIR_CACHE_SIZE:
+            _repair_cache.popitem(last=False)
+    learn_identifier_fix(failed_sql, repaired_sql)
+
+
+def cached_repair(sql_query):
+    """
+    Returns the cached repair for a failing query, if any
+    """
+    key = parse_sql(sql_query).get("normalized", sql_query)
+    with _repair_lock:
+        return _repair_cache.get(key)
+
+
+def request_repair(question, sql_query, error):
+    """
+    Asks the model to fix a failing query given the error and the pruned schema
+    """
+    prompt = f"""
+        The following MySQL query for an NBA database failed.
+
+        Question: {question}
+        Query: {sql_query}
+        Error: {error}
+
+        Relevant schema:
+        {pruned_schema(sql_query)}
+
+        Return only the corrected SQL query without any explanation.
+    """
+    with _repair_lock:
+        _repair_stats["model_calls"] += 1
+    return call_language_model(prompt)
+
+
+def record_repair(success, started_at):
+    """
+    Updates the repair counters
+    """
+    with _repair_lock:
+        _repair_stats["attempted"] += 1
+        _repair_stats["repaired" if success else "failed"] += 1
+        _repair_stats["added_seconds"] += time.perf_counter() - started_at
+
+
+def get_repair_stats():
+    """
+    Returns the repair counters with the success rate and average added latency
+    """
+    with _repair_lock:
+        stats = dict(_repair_stats)
+    attempted = stats["attempted"]
+    stats["success_rate"] = stats["repaired"] / attempted if attempted else 0.0
+    stats["avg_added_seconds"] = stats["added_seconds"] / attempted if attempted else 0.0
+    return stats
+
+
+def execute_literal(sql_query):
+    """
+    Executes a repaired query with its literals passed as parameters
+    """
+    try:
+        skeleton, params = parameterize(sql_query)
+    except ValueError:
+        skeleton, params = sql_query, None
+    return execute_sql(skeleton, params)
+
+
+def execute_with_repair(question, sql_query, params=None):
+    """
+    Executes a generated query (a skeleton and its params), repairing it on failure
+    Repairs work on the query with its literals filled in, and run parameterized again
+    Only SELECT and SHOW queries are repaired, and a candidate of another statement type is never run
+    A repaired result carries "repair": {"sql_query", "original_sql", "attempts", "source", "seconds"}
+    """
+    result = execute_sql(sql_query, params)
+    if result["success"] or REPAIR_MAX_ATTEMPTS <= 0 or not is_repairable(result.get("error")):
+        return result
+    sql_query = render_sql(sql_query, params)
+    statement_type = parse_sql(sql_query)["statement_type"]
+    if statement_type not in REPAIRABLE_STATEMENTS:
+        return result
+
+    started_at = time.perf_counter()
+    original_sql = sql_query
+    error = result["error"]
+    attempts = 0
+    tried = {parse_sql(sql_query).get("normalized", sql_query)}
+
+    while attempts < REPAIR_MAX_ATTEMPTS and time.perf_counter() - started_at < REPAIR_LATENCY_BUDGET:
+        attempts += 1
+        candidate = cached_repair(sql_query)
+        source = "cache"
+        if candidate is None:
+            candidate = apply_identifier_fix(sql_query, error)
+            source = "rule"
+        if candidate is None or parse_sql(candidate).get("normalized", candidate) in tried:
+            candidate = request_repair(question, sql_query, error)
+            source = "model"
+        elif source != "model":
+            with _repair_lock:
+                _repair_stats["local_fixes"] += 1
+        tried.add(parse_sql(candidate).get("normalized", candidate))
+
+        print(f"Repair attempt {attempts} ({source}): {candidate}")
+        if parse_sql(candidate)["statement_type"] != statement_type:
+            error = f"The corrected query must be a single {statement_type} statement"
+            continue
+        candidate_result = execute_literal(candidate)
+        if candidate_result["success"]:
+            cache_repair(original_sql, candidate)
+            record_repair(True, started_at)
+            candidate_result["repair"] = {
+                "sql_query": candidate,
+                "original_sql": original_sql,
+                "original_error": result["error"],
+                "attempts": attempts,
+                "source": source,
+                "seconds": round(time.perf_counter() - started_at, 3)
+            }
+            return candidate_result
+
+        sql_query, error = candidate, candidate_result.get("error")
+        if not is_repairable(error):
+            break
+
+    record_repair(False, started_at)
+    print(f"Repair failed after {attempts} attempts: {get_repair_stats()}")
+    return result
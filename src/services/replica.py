@@ -0,0 +1,360 @@
+"""
+replica.py
+
+This file contains the functions for the optional local SQLite read replica.
+The replica is an embedded database file built from the staged CSV data (or
+copied from MySQL) that read-only SELECTs can be routed to, with shims for
+common MySQL functions. Writes go to MySQL and mark the replica stale until
+it has been rebuilt in the background. Staleness is kept in a marker file
+next to the replica, so every worker process sees a write made by another.
+"""
+
+import os
+import re
+import math
+import sqlite3
+import time
+import datetime
+import threading
+import pandas as pd
+from sqlalchemy import create_engine, exc as sqlalchemy_exc
+from src.utils.config import DB_CONFIG, REPLICA_ENABLED, REPLICA_PATH
+from src.utils.sql_upload import load_table_dataframes, validate_file_paths
+from src.utils.summary_tables import SUMMARY_TABLES
+
+REPLICA_INDEXES = {
+    'teams': [['TEAM_ID']],
+    'players': [['PERSON_ID'], ['TEAM_ID']],
+    'box_score': [['GAME_ID', 'PLAYER_ID'], ['PLAYER_ID'], ['TEAM_ID']],
+    'player_season_stats': [['PLAYER_ID', 'SEASON', 'SEASON_TYPE'], ['TEAM_ID']],
+    'team_season_stats': [['TEAM_ID', 'SEASON', 'SEASON_TYPE']],
+    'team_game_totals': [['GAME_ID', 'TEAM_ID'], ['TEAM_ID']]
+}
+
+# Touched (with a nanosecond timestamp) by every write, also with the replica disabled; a replica built
+# (or a result cached, see query_cache.py) before the last write is stale
+REPLICA_WRITES_PATH = REPLICA_PATH + '.writes'
+
+# Division operators outside strings, comments and quoted identifiers
+DIVISION_PATTERN = re.compile(r"('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|/\*.*?\*/)|/", re.DOTALL)
+
+_replica_state = {
+    "refreshing": False
+}
+_state_lock = threading.Lock()
+_local = threading.local()
+
+
+def _mysql_if(condition, true_value, false_value):
+    return true_value if condition else false_value
+
+
+def _mysql_concat(*values):
+    if any(value is None for value in values):
+        return None
+    return ''.join(str(value) for value in values)
+
+
+def _mysql_concat_ws(separator, *values):
+    return str(separator).join(str(value) for value in values if value is not None)
+
+
+def _mysql_substring_index(value, delimiter, count):
+    if value is None:
+        return None
+    parts = str(value).split(delimiter)
+    if count > 0:
+        return delimiter.join(parts[:count])
+    if count < 0:
+        return delimiter.join(parts[count:])
+    return ''
+
+
+def _mysql_locate(substring, value, start=1):
+    if value is None or substring is None:
+        return None
+    return str(value).find(str(substring), start - 1) + 1
+
+
+def _mysql_right(value, length):
+    if value is None:
+        return None
+    return str(value)[-length:] if length > 0 else ''
+
+
+def _mysql_regexp(pattern, value):
+    if value is None or pattern is None:
+        return None
+    return 1 if re.search(pattern, str(value), re.IGNORECASE) else 0
+
+
+def _mysql_date_part(part):
+    def extract(value):
+        if value is None:
+            return None
+        try:
+            parsed = datetime.datetime.fromisoformat(str(value)[:19])
+        except ValueError:
+            return None
+        return getattr(parsed, part)
+    return extract
+
+
+def _mysql_math(func):
+    def apply(value, *args):
+        if value is None:
+            return None
+        return func(value, *args)
+    return apply
+
+
+MYSQL_FUNCTION_SHIMS = [
+    ("IF", 3, _mysql_if),
+    ("CONCAT", -1, _mysql_concat),
+    ("CONCAT_WS", -1, _mysql_concat_ws),
+    ("SUBSTRING_INDEX", 3, _mysql_substring_index),
+    ("LOCATE", 2, _mysql_locate),
+    ("LOCATE", 3, _mysql_locate),
+    ("REGEXP", 2, _mysql_regexp),
+    ("LEFT", 2, lambda value, n: None if value is None else str(value)[:n]),
+    ("RIGHT", 2, _mysql_right),
+    ("LCASE", 1, lambda value: None if value is None else str(value).lower()),
+    ("UCASE", 1, lambda value: None if value is None else str(value).upper()),
+    ("CEIL", 1, _mysql_math(math.ceil)),
+    ("CEILING", 1, _mysql_math(math.ceil)),
+    ("FLOOR", 1, _mysql_math(math.floor)),
+    ("POW", 2, _mysql_math(math.pow)),
+    ("POWER", 2, _mysql_math(math.pow)),
+    ("SQRT", 1, _mysql_math(math.sqrt)),
+    ("YEAR", 1, _mysql_date_part("year")),
+    ("MONTH", 1, _mysql_date_part("month")),
+    ("DAY", 1, _mysql_date_part("day")),
+    ("NOW", 0, lambda: datetime.datetime.now().isoformat(sep=' ', timespec='seconds')),
+    ("CURDATE", 0, lambda: datetime.date.today().isoformat())
+]
+
+
+def real_division(sql_query):
+    """
+    Makes / divide like MySQL (always a decimal result) instead of SQLite's integer division
+    Multiplying by 1.0 just before each / converts its left operand, since * and / bind equally
+    """
+    return DIVISION_PATTERN.sub(lambda match: match.group(1) or '* 1.0 /', sql_query)
+
+
+def register_mysql_shims(connection):
+    """
+    Registers MySQL-dialect functions that SQLite does not have built in
+    """
+    for name, num_args, func in MYSQL_FUNCTION_SHIMS:
+        connection.create_function(name, num_args, func, deterministic=name not in ("NOW", "CURDATE"))
+
+
+def write_dataframe(connection, table_name, df):
+    """
+    Writes a DataFrame to the replica with case-insensitive text columns (like MySQL)
+    """
+    text_columns = {
+        col: 'TEXT COLLATE NOCASE'
+        for col in df.columns
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])}
+    df.to_sql(
+        table_name,
+        connection,
+        if_exists='append',
+        index=False,
+        dtype=text_columns,
+        chunksize=1000)
+
+
+def copy_mysql_tables(connection):
+    """
+    Copies every MySQL table into the replica in chunks
+    """
+    connection_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+    engine = create_engine(connection_str)
+    try:
+        tables = pd.read_sql("SHOW TABLES", engine).iloc[:, 0].tolist()
+        for table_name in tables:
+            for chunk in pd.read_sql(f"SELECT * FROM `{table_name}`", engine, chunksize=10000):
+                write_dataframe(connection, table_name, chunk)
+        return tables
+    finally:
+        engine.dispose()
+
+
+def build_replica(source='csv', path=None, table_data=None):
+    """
+    Builds the replica file from the staged CSV files ('csv') or from MySQL ('mysql')
+    table_data ({table: csv path}) overrides the staged CSV files
+    The new file is swapped in atomically so readers never see a partial replica
+    """
+    path = path or REPLICA_PATH
+    building_path = f"{path}.building.{os.getpid()}"
+    writes_at_start = last_write()
+    if os.path.exists(building_path):
+        os.remove(building_path)
+
+    connection = sqlite3.connect(building_path)
+    built = False
+    try:
+        if source == 'mysql':
+            tables = copy_mysql_tables(connection)
+        else:
+            if not validate_file_paths(table_data):
+                return False
+            dfs = load_table_dataframes(table_data)
+            if dfs is None:
+                return False
+            for table_name, df in dfs.items():
+                write_dataframe(connection, table_name, df)
+            tables = list(dfs)
+
+        for table_name, spec in SUMMARY_TABLES.items():
+            if table_name not in tables:
+                connection.execute(
+                    f"CREATE TABLE {table_name} AS {spec['select'].format(where='')}")
+
+        for table_name, indexes in REPLICA_INDEXES.items():
+            for columns in indexes:
+                index_name = f"idx_{table_name}_{'_'.join(columns).lower()}"
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})")
+        connection.commit()
+        built = True
+    except (sqlite3.Error, sqlalchemy_exc.SQLAlchemyError, ValueError) as e:
+        print(f"Error building local replica: {e}")
+        return False
+    finally:
+        connection.close()
+        if not built:
+            os.remove(building_path)
+
+    # The replica's mtime records the last write it includes, so a write during the build leaves it stale
+    if writes_at_start:
+        os.utime(building_path, ns=(writes_at_start, writes_at_start))
+    os.replace(building_path, path)
+    print(f"Local replica built at {path}")
+    return True
+
+
+def last_write():
+    """
+    Returns the time (in ns) of the last write any process made to MySQL, 0 if none was recorded
+    """
+    try:
+        return os.stat(REPLICA_WRITES_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def replica_version():
+    """
+    Returns the replica file's (inode, mtime in ns), or None if it hasn't been built
+    A rebuild swaps in a new file, so the version changes in every process
+    """
+    try:
+        stat = os.stat(REPLICA_PATH)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def get_replica_connection():
+    """
+    Gets this thread's replica connection, reopening it after a rebuild (in any process)
+    """
+    version = replica_version()
+    cached = getattr(_local, "connection", None)
+    if cached and cached[0] == version:
+        return cached[1]
+    if cached:
+        cached[1].close()
+
+    connection = sqlite3.connect(f"file:{REPLICA_PATH}?mode=ro", uri=True)
+    connection.row_factory = sqlite3.Row
+    register_mysql_shims(connection)
+    _local.connection = (version, connection)
+    return connection
+
+
+def replica_stale():
+    """
+    Checks whether a write happened after the data in the replica was read
+    """
+    version = replica_version()
+    return version is None or last_write() > version[1]
+
+
+def replica_available(allow_stale=False):
+    """
+    Checks that the replica is enabled, built and (unless allow_stale) not stale
+    """
+    return REPLICA_ENABLED and os.path.exists(REPLICA_PATH) and (allow_stale or not replica_stale())
+
+
+def query_replica(sql_query, params=None, allow_stale=False):
+    """
+    Runs a read-only SELECT against the replica, returns None if it can't serve it
+    allow_stale lets expensive queries read a replica that is still being rebuilt
+    """
+    if not replica_available(allow_stale):
+        return None
+
+    try:
+        connection = get_replica_connection()
+        sqlite_query = real_division(sql_query.replace('%s', '?') if params else sql_query)
+        cursor = connection.execute(sqlite_query, params or ())
+        rows = cursor.fetchall()
+        column_names = [desc[0] for desc in cursor.description] if cursor.description else []
+        data = [dict(zip(column_names, row)) for row in rows]
+        return {
+            "success": True,
+            "result_type": "data",
+            "data": data,
+            "column_names": column_names,
+            "row_count": len(data),
+            "message": f"Query returned {len(data)} rows.",
+            "source": "replica"
+        }
+    except sqlite3.Error as e:
+        print(f"Replica could not run query, falling back to MySQL: {e}")
+        return None
+
+
+def refresh_replica():
+    """
+    Rebuilds the replica from MySQL until no write happened during the rebuild,
+    skipping if a rebuild is already running
+    """
+    with _state_lock:
+        if _replica_state["refreshing"]:
+            return
+        _replica_state["refreshing"] = True
+    try:
+        while build_replica(source='mysql') and replica_stale():
+            print("Database changed during replica rebuild, rebuilding again")
+    finally:
+        with _state_lock:
+            _replica_state["refreshing"] = False
+
+
+def invalidate_replica():
+    """
+    Records a write for every process (the replica and the cached results from before it are stale)
+    and rebuilds the replica in the background
+    """
+    try:
+        with open(REPLICA_WRITES_PATH, 'a', encoding='utf-8'):
+            pass
+        now = time.time_ns()
+        os.utime(REPLICA_WRITES_PATH, ns=(now, now))
+    except OSError as e:
+        print(f"Could not record the write: {e}")
+    if REPLICA_ENABLED:
+        threading.Thread(target=refresh_replica, daemon=True).start()
+
+
+if __name__ == "__main__":
+    import sys
+    build_replica(source=sys.argv[1] if len(sys.argv) > 1 else 'csv')
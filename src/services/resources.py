@@ -0,0 +1,65 @@
+"""
+resources.py
+
+This file contains the process-wide registry for shared resources (the MySQL
+connection pool, the OpenAI client). Each resource is created once per server
+process by the factory of the module that owns it, shared by every thread and
+session, and closed in reverse creation order when the process exits.
+"""
+
+import atexit
+import threading
+
+_resources = {}
+_closers = {}
+_resources_lock = threading.RLock()
+
+
+def get_resource(name, factory, close=None):
+    """
+    Gets a shared resource, creating it with factory() on first use
+    A factory that returns None isn't cached, so the next call tries again
+    close(resource) is called on shutdown or release and should handle its own errors
+    """
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+
+    with _resources_lock:
+        resource = _resources.get(name)
+        if resource is None:
+            resource = factory()
+            if resource is not None:
+                _resources[name] = resource
+                if close is not None:
+                    _closers[name] = close
+    return resource
+
+
+def release_resource(name):
+    """
+    Closes and drops one shared resource so the next lookup creates it again
+    """
+    with _resources_lock:
+        resource = _resources.pop(name, None)
+        close = _closers.pop(name, None)
+        if resource is not None and close is not None:
+            close(resource)
+
+
+@atexit.register
+def shutdown_resources():
+    """
+    Closes every shared resource, newest first
+    """
+    with _resources_lock:
+        for name in reversed(list(_resources)):
+            release_resource(name)
+
+
+def resource_status():
+    """
+    Returns the names of the shared resources created so far
+    """
+    with _resources_lock:
+        return list(_resources)
@@ -0,0 +1,308 @@
+"""
+schema.py
+
+This file contains the schema metadata service. Tables, columns, types,
+keys, foreign keys, indexes and row estimates are loaded from
+INFORMATION_SCHEMA once and kept in memory until a load or DDL touches the
+schema version marker. Schema questions (SHOW TABLES, DESCRIBE, SHOW INDEX)
+and primary key lookups are answered from memory, and the schema context
+used in prompts is generated from it.
+"""
+
+import os
+import re
+import threading
+import mysql.connector
+from src.utils.config import DB_CONFIG, NBA_SCHEMA_CONTEXT, SCHEMA_VERSION_PATH
+
+SHOW_TABLES_PATTERN = re.compile(r'^SHOW TABLES$')
+DESCRIBE_PATTERN = re.compile(r'^(?:DESCRIBE (\w+)|SHOW (?:COLUMNS|FIELDS) FROM (\w+))$')
+SHOW_INDEX_PATTERN = re.compile(r'^SHOW (?:INDEX|INDEXES|KEYS) FROM (\w+)$')
+
+_schema = {}
+_schema_lock = threading.Lock()
+
+
+def schema_version():
+    """
+    Returns the modification time of the schema version marker (0 if no load has written it)
+    """
+    try:
+        return os.path.getmtime(SCHEMA_VERSION_PATH)
+    except OSError:
+        return 0
+
+
+def load_schema():
+    """
+    Loads tables, columns, keys, foreign keys, indexes and row estimates from INFORMATION_SCHEMA
+    """
+    database = DB_CONFIG['database']
+    connection = mysql.connector.connect(**DB_CONFIG)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT TABLE_NAME AS table_name, TABLE_ROWS AS table_rows
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+        """, (database,))
+        tables = {
+            row["table_name"]: {
+                "rows": int(row["table_rows"] or 0),
+                "columns": [],
+                "primary_keys": [],
+                "foreign_keys": [],
+                "indexes": {}
+            }
+            for row in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT TABLE_NAME AS table_name, COLUMN_NAME AS name, COLUMN_TYPE AS type,
+                   DATA_TYPE AS data_type, IS_NULLABLE AS nullable, COLUMN_KEY AS `key`,
+                   COLUMN_DEFAULT AS `default`, EXTRA AS extra
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """, (database,))
+        for row in cursor.fetchall():
+            table = tables.get(row.pop("table_name"))
+            if table is not None:
+                table["columns"].append(row)
+
+        cursor.execute("""
+            SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name, CONSTRAINT_NAME AS constraint_name,
+                   REFERENCED_TABLE_NAME AS referenced_table, REFERENCED_COLUMN_NAME AS referenced_column
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = %s
+            ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+        """, (database,))
+        for row in cursor.fetchall():
+            table = tables.get(row["table_name"])
+            if table is None:
+                continue
+            if row["constraint_name"] == 'PRIMARY':
+                table["primary_keys"].append(row["column_name"])
+            elif row["referenced_table"]:
+                table["foreign_keys"].append({
+                    "column": row["column_name"],
+                    "references_table": row["referenced_table"],
+                    "references_column": row["referenced_column"]
+                })
+
+        cursor.execute("""
+            SELECT TABLE_NAME AS table_name, INDEX_NAME AS index_name, COLUMN_NAME AS column_name,
+                   SEQ_IN_INDEX AS seq, NON_UNIQUE AS non_unique
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """, (database,))
+        for row in cursor.fetchall():
+            table = tables.get(row["table_name"])
+            if table is not None:
+                index = table["indexes"].setdefault(
+                    row["index_name"], {"columns": [], "unique": not int(row["non_unique"])})
+                index["columns"].append(row["column_name"])
+    finally:
+        cursor.close()
+        connection.close()
+
+    return {"tables": tables, "database": database}
+
+
+def get_schema():
+    """
+    Gets the in-memory schema, loading it on first use and after the version marker changes
+    Returns {"tables": {}} if the database can't be reached (the next call retries)
+    """
+    version = schema_version()
+    cached = _schema.get("schema")
+    if cached and cached["version"] == version:
+        return cached
+
+    with _schema_lock:
+        cached = _schema.get("schema")
+        if cached and cached["version"] == version:
+            return cached
+        try:
+            schema = load_schema()
+        except mysql.connector.Error as e:
+            print(f"Could not load schema metadata: {e}")
+            return {"tables": {}, "database": DB_CONFIG['database'], "version": None}
+        schema["version"] = version
+        schema["context"] = build_schema_context(schema)
+        _schema["schema"] = schema
+        print(f"Loaded schema metadata for {len(schema['tables'])} tables")
+        return schema
+
+
+def invalidate_schema():
+    """
+    Drops the in-memory schema so the next lookup reloads it
+    """
+    with _schema_lock:
+        _schema.pop("schema", None)
+
+
+def schema_columns():
+    """
+    Returns {table: set(columns)} with lowercase names, used by SQL validation
+    """
+    return {
+        name.lower(): {column["name"].lower() for column in table["columns"]}
+        for name, table in get_schema()["tables"].items()}
+
+
+def primary_keys(table_name):
+    """
+    Returns the primary key columns of a table, or None if the table doesn't exist
+    """
+    for name, table in get_schema()["tables"].items():
+        if name.lower() == table_name.lower():
+            return list(table["primary_keys"])
+    return None
+
+
+def table_columns(table_name):
+    """
+    Returns the column names of a table in order, or None if the table doesn't exist
+    """
+    for name, table in get_schema()["tables"].items():
+        if name.lower() == table_name.lower():
+            return [column["name"] for column in table["columns"]]
+    return None
+
+
+def data_result(column_names, rows):
+    """
+    Shapes rows like execute_query's result for a SELECT
+    """
+    return {
+        "success": True,
+        "result_type": "data",
+        "data": rows,
+        "column_names": column_names,
+        "row_count": len(rows),
+        "message": f"Query returned {len(rows)} rows.",
+        "source": "schema_cache"
+    }
+
+
+def answer_schema_query(parsed):
+    """
+    Answers SHOW TABLES, DESCRIBE / SHOW COLUMNS and SHOW INDEX from memory
+    Returns None for anything else (or if the schema isn't loaded) so the caller asks MySQL
+    """
+    schema = get_schema()
+    tables = schema["tables"]
+    if not tables:
+        return None
+    fingerprint = parsed.get("fingerprint", "")
+
+    if SHOW_TABLES_PATTERN.match(fingerprint):
+        column = f"Tables_in_{schema['database']}"
+        return data_result([column], [{column: name} for name in tables])
+
+    match = DESCRIBE_PATTERN.match(fingerprint)
+    if match:
+        table = next((t for name, t in tables.items() if name.lower() == (match.group(1) or match.group(2))), None)
+        if table is None:
+            return None
+        rows = [{
+            "Field": column["name"],
+            "Type": column["type"],
+            "Null": column["nullable"],
+            "Key": column["key"],
+            "Default": column["default"],
+            "Extra": column["extra"]
+        } for column in table["columns"]]
+        return data_result(["Field", "Type", "Null", "Key", "Default", "Extra"], rows)
+
+    match = SHOW_INDEX_PATTERN.match(fingerprint)
+    if match:
+        name = next((name for name in tables if name.lower() == match.group(1)), None)
+        if name is None:
+            return None
+        rows = [{
+            "Table": name,
+            "Non_unique": 0 if index["unique"] else 1,
+            "Key_name": index_name,
+            "Seq_in_index": seq,
+            "Column_name": column
+        } for index_name, index in tables[name]["indexes"].items()
+            for seq, column in enumerate(index["columns"], start=1)]
+        return data_result(["Table", "Non_unique", "Key_name", "Seq_in_index", "Column_name"], rows)
+
+    return None
+
+
+def static_context_notes():
+    """
+    Reads the hand-written column descriptions, table notes and query notes from NBA_SCHEMA_CONTEXT
+    """
+    descriptions = {}
+    table_notes = {}
+    notes = []
+    for block in NBA_SCHEMA_CONTEXT.strip().split('\n\n'):
+        header = re.match(r'Table: (\w+)\s*(\(.*\))?', block)
+        if not header:
+            if block.startswith('Notes for SQL Queries'):
+                notes.append(block)
+            continue
+        table = header.group(1).lower()
+        table_notes[table] = header.group(2) or ""
+        for line in block.splitlines()[1:]:
+            match = re.match(r'- ([\w, ]+?) \(([^)]*)\): (.*)', line)
+            if match:
+                for column in match.group(1).split(','):
+                    descriptions[(table, column.strip())] = match.group(3)
+                    descriptions.setdefault((table, column.strip().lower()), match.group(3))
+    return descriptions, table_notes, notes
+
+
+def build_schema_context(schema):
+    """
+    Generates the schema context for prompts from the loaded schema, keeping the
+    hand-written descriptions and query notes from NBA_SCHEMA_CONTEXT
+    """
+    descriptions, table_notes, notes = static_context_notes()
+    blocks = ["NBA Database Schema:"]
+    relationships = []
+
+    for name, table in schema["tables"].items():
+        header = f"Table: {name}"
+        if table_notes.get(name.lower()):
+            header += f" {table_notes[name.lower()]}"
+        header += f" (~{table['rows']:,} rows)"
+        references = {fk["column"]: fk for fk in table["foreign_keys"]}
+        lines = [header]
+        for column in table["columns"]:
+            details = [column["data_type"]]
+            if column["name"] in table["primary_keys"]:
+                details.append("PRIMARY KEY")
+            if column["name"] in references:
+                fk = references[column["name"]]
+                details.append(f"references {fk['references_table']}.{fk['references_column']}")
+            line = f"- {column['name']} ({', '.join(details)})"
+            description = (descriptions.get((name.lower(), column["name"]))
+                           or descriptions.get((name.lower(), column["name"].lower())))
+            lines.append(f"{line}: {description}" if description else line)
+        blocks.append('\n'.join(lines))
+
+        for fk in table["foreign_keys"]:
+            relationships.append(
+                f"{len(relationships) + 1}. {name}.{fk['column']} references "
+                f"{fk['references_table']}.{fk['references_column']}")
+
+    if relationships:
+        blocks.append("Important Relationships:\n" + '\n'.join(relationships))
+    blocks.extend(notes)
+    return '\n' + '\n\n'.join(blocks) + '\n'
+
+
+def get_schema_context():
+    """
+    Returns the generated schema context, or the hand-written NBA_SCHEMA_CONTEXT if the schema can't be loaded
+    """
+    schema = get_schema()
+    return schema.get("context") or NBA_SCHEMA_CONTEXT
@@ -0,0 +1,66 @@
+"""
+single_flight.py
+
+This file contains the request coalescing ("single-flight") layer. When
+several threads ask for the same work at once (the same question, the same
+SELECT), the first one runs it and the others wait for its result instead
+of each calling OpenAI or MySQL. Errors raised by the running call are
+raised in every waiting caller too, and waiting callers give up after
+SINGLE_FLIGHT_TIMEOUT seconds.
+"""
+
+import threading
+from src.utils.config import SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_TIMEOUT
+
+_calls = {}
+_calls_lock = threading.Lock()
+_stats = {"calls": 0, "shared": 0, "timeouts": 0}
+
+
+def single_flight(key, function, timeout=None):
+    """
+    Runs function() once for all concurrent callers with the same key
+    Returns (result, shared): shared is True for callers that waited on another caller's call;
+    they get a shallow copy of a dict result, or None if the call didn't finish within the timeout
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return function(), False
+
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = {"done": threading.Event(), "result": None, "error": None}
+            _calls[key] = call
+            _stats["calls"] += 1
+        else:
+            _stats["shared"] += 1
+
+    if leader:
+        try:
+            call["result"] = function()
+            return call["result"], False
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with _calls_lock:
+                _calls.pop(key, None)
+            call["done"].set()
+
+    if not call["done"].wait(SINGLE_FLIGHT_TIMEOUT if timeout is None else timeout):
+        with _calls_lock:
+            _stats["timeouts"] += 1
+        return None, True
+    if call["error"] is not None:
+        raise call["error"]
+    result = call["result"]
+    return (dict(result) if isinstance(result, dict) else result), True
+
+
+def single_flight_stats():
+    """
+    Returns how many calls ran, how many callers shared another caller's call, and how many gave up waiting
+    """
+    with _calls_lock:
+        return {**_stats, "in_flight": len(_calls)}
@@ -0,0 +1,194 @@
+"""
+telemetry.py
+
+This file contains the tracing layer for the query pipeline. Each stage runs
+inside `with span("stage") as current:` and records counts (rows, bytes,
+tokens) with current.set(...). Spans nest per thread into one trace per
+question and are exported according to TELEMETRY_EXPORTER: to OpenTelemetry,
+as Prometheus metrics, or as JSON lines. With the exporter off, span()
+returns a shared no-op span, so the instrumentation is close to free.
+"""
+
+import json
+import time
+import atexit
+import random
+import threading
+import importlib.util
+from src.utils.config import TELEMETRY_EXPORTER, TELEMETRY_PATH, TELEMETRY_PROMETHEUS_PORT
+
+COUNTED_ATTRIBUTES = ('rows', 'bytes', 'prompt_tokens', 'completion_tokens')
+
+_exporter = {}
+_exporter_lock = threading.Lock()
+_local = threading.local()
+
+
+class NoopSpan:
+    """
+    Span returned while telemetry is off: entering, exiting and set() do nothing
+    """
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Span:
+    """
+    One timed stage of a trace; the enclosing span on the same thread is its parent
+    """
+    recording = True
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.trace_id = None
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.started_at = None
+        self.start = None
+        self.otel = None
+        self.otel_span = None
+
+    def __enter__(self):
+        exporter = get_exporter()
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1] if stack else None
+        self.trace_id = self.parent.trace_id if self.parent else f"{random.getrandbits(128):032x}"
+        stack.append(self)
+        if exporter["kind"] == "otel":
+            self.otel = exporter["tracer"].start_as_current_span(self.name, attributes=self.attributes)
+            self.otel_span = self.otel.__enter__()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        _local.stack.pop()
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc_value}"
+        if self.otel is not None:
+            self.otel.__exit__(exc_type, exc_value, traceback)
+        export_span(self, duration)
+        return False
+
+    def set(self, **attributes):
+        """
+        Adds attributes (counts, flags, names) to the span; None values are skipped
+        """
+        attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.attributes.update(attributes)
+        if self.otel_span is not None:
+            self.otel_span.set_attributes(attributes)
+
+
+def span(name, **attributes):
+    """
+    Starts a span for a pipeline stage, used as a context manager
+    Returns the shared no-op span when TELEMETRY_EXPORTER is off
+    """
+    if TELEMETRY_EXPORTER == 'off':
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def get_exporter():
+    """
+    Sets up the configured exporter on first use, falling back to JSON lines when
+    the OpenTelemetry API or prometheus_client isn't installed
+    """
+    if _exporter:
+        return _exporter
+    with _exporter_lock:
+        if not _exporter:
+            _exporter.update(create_exporter(TELEMETRY_EXPORTER))
+    return _exporter
+
+
+def create_exporter(kind):
+    """
+    Creates the exporter state for 'otel', 'prometheus' or 'jsonl'
+    """
+    if kind == 'otel':
+        if importlib.util.find_spec("opentelemetry") is not None:
+            from opentelemetry import trace
+            return {"kind": "otel", "tracer": trace.get_tracer("nba-database")}
+        print("opentelemetry is not installed, writing spans as JSON lines")
+    elif kind == 'prometheus':
+        if importlib.util.find_spec("prometheus_client") is not None:
+            return create_prometheus_exporter()
+        print("prometheus_client is not installed, writing spans as JSON lines")
+    return {"kind": "jsonl", "file": open(TELEMETRY_PATH, "a", encoding="utf-8"), "lock": threading.Lock()}
+
+
+def create_prometheus_exporter():
+    """
+    Creates the stage latency histogram and the counters, and serves them on TELEMETRY_PROMETHEUS_PORT
+    With several worker processes only the first one to bind the port serves metrics
+    """
+    from prometheus_client import Histogram, Counter, start_http_server
+    exporter = {
+        "kind": "prometheus",
+        "latency": Histogram(
+            "nba_stage_duration_seconds", "Duration of query pipeline stages", ["stage", "status"]),
+        "counters": {
+            name: Counter(f"nba_{name}", f"{name.replace('_', ' ').capitalize()} per stage", ["stage"])
+            for name in COUNTED_ATTRIBUTES
+        }
+    }
+    try:
+        start_http_server(TELEMETRY_PROMETHEUS_PORT)
+    except OSError as e:
+        print(f"Could not serve Prometheus metrics on port {TELEMETRY_PROMETHEUS_PORT}: {e}")
+    return exporter
+
+
+def export_span(finished, duration):
+    """
+    Sends a finished span to the exporter (OpenTelemetry spans are exported by the SDK itself)
+    """
+    exporter = _exporter
+    if exporter.get("kind") == "prometheus":
+        status = "error" if "error" in finished.attributes else "ok"
+        exporter["latency"].labels(finished.name, status).observe(duration)
+        for name, counter in exporter["counters"].items():
+            value = finished.attributes.get(name)
+            if value:
+                counter.labels(finished.name).inc(value)
+    elif exporter.get("kind") == "jsonl":
+        line = json.dumps({
+            "trace_id": finished.trace_id,
+            "span_id": finished.span_id,
+            "parent_id": finished.parent.span_id if finished.parent else None,
+            "name": finished.name,
+            "start": finished.started_at,
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": finished.attributes
+        }, default=str)
+        with exporter["lock"]:
+            exporter["file"].write(line + "\n")
+            exporter["file"].flush()
+
+
+@atexit.register
+def close_exporter():
+    """
+    Closes the JSON lines file at exit
+    """
+    with _exporter_lock:
+        if _exporter.get("kind") == "jsonl":
+            _exporter["file"].close()
+        _exporter.clear()
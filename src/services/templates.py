@@ -0,0 +1,271 @@
+"""
+templates.py
+
+This file contains the deterministic fast path that answers common question
+shapes ("top N scorers", "players on <team>", "tallest N players",
+"describe <table>") from parameterized SQL templates without calling the LLM.
+Team and player mentions are resolved to IDs by the entity index, and values
+are passed as parameters so every team's roster shares one SQL skeleton.
+"""
+
+import re
+from src.services.entities import resolve_mentions
+from src.utils.config import DEFAULT_TOP_N, TEMPLATE_FAST_PATH, TEMPLATE_MIN_GAMES, TEMPLATE_MIN_PLAYOFF_GAMES
+
+KNOWN_TABLES = [
+    'players', 'teams', 'box_score',
+    'player_season_stats', 'team_season_stats', 'team_game_totals'
+]
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'fifteen': 15,
+    'twenty': 20, 'twenty five': 25, 'fifty': 50
+}
+
+STAT_NOUNS = {
+    'scorers': 'PTS', 'scoring': 'PTS', 'points': 'PTS',
+    'rebounders': 'REB', 'rebounding': 'REB', 'rebounds': 'REB',
+    'passers': 'AST', 'assists': 'AST', 'playmakers': 'AST',
+    'stealers': 'STL', 'steals': 'STL',
+    'shot blockers': 'BLK', 'blockers': 'BLK', 'blocks': 'BLK'
+}
+
+STAT_LABELS = {
+    'PTS': 'points', 'REB': 'rebounds', 'AST': 'assists',
+    'STL': 'steals', 'BLK': 'blocks'
+}
+
+HEIGHT_INCHES_SQL = (
+    "CAST(SUBSTRING_INDEX(HEIGHT, '-', 1) AS UNSIGNED) * 12 + "
+    "CAST(SUBSTRING_INDEX(HEIGHT, '-', -1) AS UNSIGNED)")
+
+# N only counts next to the words that ask for N rows ("top 5", "list 7", "5 tallest players"), so
+# seasons ("2023-24") and jersey numbers aren't taken as a LIMIT
+NUMBER_TOKEN = r'(?<![-\d])(\d{1,3}|' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r')\b'
+NUMBER_PATTERN = re.compile(
+    r'\b(?:top|best|leading|first|list|show(?: me)?(?: the)?|give me(?: the)?)\s+' + NUMBER_TOKEN
+    + r'|' + NUMBER_TOKEN + r'\s+(?:\w+\s+){0,2}?(?:players|scorers|rebounders|passers|playmakers'
+    r'|stealers|shot blockers|blockers)\b')
+SEASON_PATTERN = re.compile(r'\b(\d{4}-\d{2})\b')
+PLAYOFFS_PATTERN = re.compile(r'\b(?:playoffs?|postseason)\b')
+STAT_PATTERN = re.compile(
+    r'\b(' + '|'.join(sorted(STAT_NOUNS, key=len, reverse=True)) + r')\b')
+SHOW_TABLES_PATTERN = re.compile(
+    r'^(?:show|list|what(?: are)?)(?: me)?(?: all)?(?: the)? tables'
+    r'(?: are)?(?: there)?(?: in the database)?\s*\??$')
+DESCRIBE_PATTERN = re.compile(
+    r'^(?:describe|show(?: me)?(?: the)? (?:columns|structure) (?:in|of|for))'
+    r'(?: the)? (\w+)(?: table)?\s*\??$')
+TOP_STAT_PATTERN = re.compile(
+    r'\b(?:top|best|leading)\b(?:\s+\w+){0,2}?\s+(?:scorers|rebounders|passers|shot blockers|blockers)\b'
+    r'|\bleads? the league in\b|\bmost (?:points|rebounds|assists|steals|blocks) per game\b')
+ROSTER_PATTERN = re.compile(
+    r'\broster\b|\bwho (?:plays|play) (?:for|on)\b|^(?:all )?(?:the )?players (?:on|for)\b'
+    r'|\b(?:list|show)\b(?: me)?(?: all)?(?: of)?(?: the)?(?:\s+\w+){1,3}?\s+players\b')
+# Counts, aggregates and filters on a team's players need real SQL, so they go to the LLM
+ROSTER_FILTER_PATTERN = re.compile(
+    r'\b(?:how many|count|number|average|avg|mean|total|which|oldest|youngest|old|age|ages|born'
+    r'|guards?|forwards?|centers?|position|height|tall|weight|college|country|draft|drafted|jersey)\b')
+HEIGHT_PATTERN = re.compile(r'\b(tallest|shortest|heaviest|lightest)\b(?:\s+\w+)?\s+players?\b')
+PLAYER_STATS_PATTERN = re.compile(r'\b(?:stats|averages?|per game|season)\b')
+# Qualifiers the stat templates can't express (positions, dates, home/away, opponents, single games,
+# totals, careers, thresholds); questions that have one go to the LLM instead of getting season averages
+STAT_FILTER_PATTERN = re.compile(
+    r'\b(?:among|guards?|forwards?|centers?|position|rookies?|veterans?|home|away|road|last|this|past|next'
+    r'|since|before|after|between|during|against|vs|versus|opponents?|week|weeks|month|months|night|tonight'
+    r'|yesterday|today|date|career|ever|all time|history|total|totals|combined|how many|count|number of'
+    r'|minimum|at least|more than|less than|fewer than|over|under|above|below|with|without|shooting'
+    r'|percentage|pct|efficient|efficiency|age|old|young|born|height|tall|college|country|draft|drafted'
+    r'|january|february|march|april|may|june|july|august|september|october|november|december'
+    r'|score|scored)\b'
+    r'|(?<!per )\b(?:a |one |single )?games?\b(?! played)|(?<![-\d])\b\d{4}\b(?!-\d{2})')
+
+def extract_entities(query, resolved=None):
+    """
+    Extracts the number, teams, players and stat mentioned in a cleaned query
+    """
+    resolved = resolved or resolve_mentions(query)
+
+    number_match = NUMBER_PATTERN.search(query)
+    number = None
+    if number_match:
+        token = number_match.group(1) or number_match.group(2)
+        number = int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+    stat_match = STAT_PATTERN.search(query)
+    season_match = SEASON_PATTERN.search(query)
+    return {
+        "number": number,
+        "season": season_match.group(1) if season_match else None,
+        "season_type": 'Playoffs' if PLAYOFFS_PATTERN.search(query) else 'Regular Season',
+        "teams": resolved["teams"],
+        "players": resolved["players"],
+        "stat": STAT_NOUNS[stat_match.group(1)] if stat_match else None
+    }
+
+
+def show_tables_template(query, entities):
+    """
+    "What tables are in the database?"
+    """
+    if SHOW_TABLES_PATTERN.search(query):
+        return "SHOW TABLES", (), "Lists every table in the NBA database."
+    return None
+
+
+def describe_table_template(query, entities):
+    """
+    "Describe the players table" / "Show me the columns in teams"
+    """
+    match = DESCRIBE_PATTERN.search(query)
+    if match and match.group(1) in KNOWN_TABLES:
+        table = match.group(1)
+        return f"DESCRIBE {table}", (), f"Shows the columns and types of the {table} table."
+    return None
+
+
+def top_stat_template(query, entities):
+    """
+    "Top 10 scorers", "best 5 rebounders on the Lakers", "who leads the league in assists",
+    "top 5 scorers in the 2023-24 playoffs"
+    """
+    if not TOP_STAT_PATTERN.search(query) or not entities["stat"] or entities["players"] \
+            or len(entities["teams"]) > 1 or STAT_FILTER_PATTERN.search(query):
+        return None
+
+    stat = entities["stat"]
+    limit = entities["number"] or (1 if 'lead' in query else DEFAULT_TOP_N)
+    min_games = TEMPLATE_MIN_PLAYOFF_GAMES if entities["season_type"] == 'Playoffs' else TEMPLATE_MIN_GAMES
+    team_filter = ""
+    explanation_team = ""
+    explanation_season = ""
+    params = [entities["season_type"], min_games]
+    if entities["season"]:
+        team_filter = " AND SEASON = %s"
+        explanation_season = f" {entities['season']}"
+        params.append(entities["season"])
+    if len(entities["teams"]) == 1:
+        team = entities["teams"][0]
+        team_filter += " AND TEAM_ID = %s"
+        explanation_team = f" on the {team['name']}"
+        params.append(team['id'])
+    params.append(limit)
+
+    sql = (
+        f"SELECT PLAYER_NAME, GAMES_PLAYED, AVG_{stat}, {stat}_TOTAL "
+        f"FROM player_season_stats WHERE SEASON_TYPE = %s AND GAMES_PLAYED >= %s{team_filter} "
+        f"ORDER BY AVG_{stat} DESC LIMIT %s")
+    explanation = (
+        f"Reads the player_season_stats summary table and returns the {limit} players"
+        f"{explanation_team} with the highest{explanation_season} {entities['season_type'].lower()} "
+        f"{STAT_LABELS[stat]} per game, among players with at least {min_games} games.")
+    return sql, tuple(params), explanation
+
+
+def height_template(query, entities):
+    """
+    "Show me the 5 tallest players" / "heaviest players on the Celtics"
+    """
+    match = HEIGHT_PATTERN.search(query)
+    if not match or entities["players"]:
+        return None
+
+    ordering = match.group(1)
+    limit = entities["number"] or DEFAULT_TOP_N
+    order_sql = {
+        'tallest': f"{HEIGHT_INCHES_SQL} DESC",
+        'shortest': f"{HEIGHT_INCHES_SQL} ASC",
+        'heaviest': "WEIGHT DESC",
+        'lightest': "WEIGHT ASC"
+    }[ordering]
+
+    where = "WHERE HEIGHT LIKE %s"
+    params = ['%-%']
+    if len(entities["teams"]) == 1:
+        where += " AND TEAM_ID = %s"
+        params.append(entities['teams'][0]['id'])
+    params.append(limit)
+
+    sql = (
+        f"SELECT DISPLAY_FIRST_LAST, HEIGHT, WEIGHT, POSITION FROM players "
+        f"{where} ORDER BY {order_sql} LIMIT %s")
+    return sql, tuple(params), f"Returns the {limit} {ordering} players from the players table."
+
+
+def roster_template(query, entities):
+    """
+    "List 7 Lakers players" / "Show the Knicks roster" / "who plays for the Celtics"
+    """
+    if len(entities["teams"]) != 1 or entities["stat"] or entities["players"]:
+        return None
+    if not ROSTER_PATTERN.search(query) or ROSTER_FILTER_PATTERN.search(query) or HEIGHT_PATTERN.search(query):
+        return None
+
+    team = entities["teams"][0]
+    params = (team['id'], entities["number"]) if entities["number"] else (team['id'],)
+    limit = " LIMIT %s" if entities["number"] else ""
+    sql = (
+        f"SELECT DISPLAY_FIRST_LAST, POSITION, JERSEY, HEIGHT FROM players "
+        f"WHERE TEAM_ID = %s{limit}")
+    return sql, params, f"Lists players whose current team is the {team['name']}."
+
+
+def player_stats_template(query, entities):
+    """
+    "LeBron James stats" / "What does Stephen Curry average per game?" / "Jokic stats in the 2023-24 playoffs"
+    """
+    if len(entities["players"]) != 1 or entities["teams"] or not PLAYER_STATS_PATTERN.search(query) \
+            or STAT_FILTER_PATTERN.search(query):
+        return None
+
+    player = entities["players"][0]
+    where = "WHERE PLAYER_ID = %s"
+    params = [player['id']]
+    explanation_season = "each season"
+    if entities["season"]:
+        where += " AND SEASON = %s"
+        params.append(entities["season"])
+        explanation_season = f"the {entities['season']} season"
+    if PLAYOFFS_PATTERN.search(query):
+        where += " AND SEASON_TYPE = %s"
+        params.append(entities["season_type"])
+        explanation_season += " (playoffs)"
+    sql = (
+        f"SELECT PLAYER_NAME, SEASON, SEASON_TYPE, GAMES_PLAYED, AVG_PTS, AVG_REB, AVG_AST, "
+        f"AVG_STL, AVG_BLK FROM player_season_stats {where}")
+    return sql, tuple(params), (
+        f"Reads {player['name']}'s per-game averages for {explanation_season} "
+        f"from the player_season_stats summary table.")
+
+
+TEMPLATES = [
+    ("show_tables", show_tables_template),
+    ("describe_table", describe_table_template),
+    ("top_stat", top_stat_template),
+    ("height_weight", height_template),
+    ("roster", roster_template),
+    ("player_stats", player_stats_template)
+]
+
+
+def match_template(query, resolved=None):
+    """
+    Returns {"template", "sql_query", "params", "explanation"} for the first template
+    that matches the cleaned query, or None so the caller falls back to the LLM
+    """
+    if not TEMPLATE_FAST_PATH:
+        return None
+
+    entities = extract_entities(query, resolved)
+    for name, template in TEMPLATES:
+        matched = template(query, entities)
+        if matched:
+            sql_query, params, explanation = matched
+            return {
+                "template": name,
+                "sql_query": sql_query,
+                "params": params,
+                "explanation": explanation
+            }
+    return None
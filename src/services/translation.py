@@ -6,26 +6,236 @@ schema exploration and query questions into valid SQL queries
 """
 
 import re
+import threading
+from collections import OrderedDict
 import openai
 from openai import APIError, RateLimitError, APIConnectionError
 from src.utils.config import (
+    OPENAI_API_KEY,
+    OPENAI_TIMEOUT,
+    OPENAI_MAX_RETRIES,
     LLM_MODEL,
     LLM_TEMPERATURE,
-    NBA_SCHEMA_CONTEXT,
+    LLM_STREAMING,
+    TRANSLATION_CACHE_SIZE,
     EXAMPLE_QUERIES,
     SAMPLE_DATA
 )
 from src.services.db import validate_sql
+from src.services.resources import get_resource
+from src.services.single_flight import single_flight
+from src.services.telemetry import span
+from src.services.schema import get_schema_context
+from src.services.templates import match_template
+from src.services.entities import resolve_mentions, entity_prompt_context, normalize_name
+from src.utils.sql_parser import parameterize, render_sql
 
+_translation_cache = OrderedDict()
+_translation_lock = threading.Lock()
 
-def translate_to_sql(query):
+
+def question_skeleton(query, resolved):
     """
-    Translates the user's question to a valid SQL query
+    Replaces the resolved team and player names and the numbers in a question with slots, so questions
+    that differ only in those ("Lakers roster" / "Celtics roster") share a cached translation
+    Returns (skeleton, slots), or (None, []) if a mention is ambiguous
     """
-    prompt = f"""
+    if resolved["ambiguous"]:
+        return None, []
+
+    words = normalize_name(query).split()
+    mentions = {mention["start"]: mention for mention in resolved["mentions"]}
+    parts = []
+    slots = []
+    index = 0
+    while index < len(words):
+        mention = mentions.get(index)
+        if mention:
+            parts.append(f"<{mention['entity']['type']}>")
+            slots.append(mention["entity"])
+            index += mention["size"]
+        elif words[index].isdigit():
+            parts.append("<number>")
+            slots.append(int(words[index]))
+            index += 1
+        else:
+            parts.append(words[index])
+            index += 1
+    return ' '.join(parts), slots
+
+
+def params_spec(params, slots):
+    """
+    Maps each SQL parameter to (slot index, "id" | "name" | None for a number) for the question slot
+    it came from, or (None, value) for a literal
+    Returns None if a slot isn't used or a value could come from more than one slot, since the
+    translation couldn't then be reused for other names
+    """
+    spec = []
+    used = set()
+    for param in params:
+        sources = []
+        for index, slot in enumerate(slots):
+            if isinstance(slot, dict):
+                if param == slot["id"]:
+                    sources.append((index, "id"))
+                elif isinstance(param, str) and param.lower() == slot["name"].lower():
+                    sources.append((index, "name"))
+            elif param == slot:
+                sources.append((index, None))
+        if len(sources) > 1:
+            return None
+        if sources:
+            spec.append(sources[0])
+            used.add(sources[0][0])
+        else:
+            spec.append((None, param))
+    if len(used) != len(slots):
+        return None
+    return spec
+
+
+def cache_translation(skeleton, slots, sql_query, params, explanation):
+    """
+    Caches an LLM translation under its question skeleton when every slot maps to a parameter
+    """
+    if skeleton is None or TRANSLATION_CACHE_SIZE <= 0:
+        return
+    spec = params_spec(params, slots)
+    if spec is None:
+        return
+    with _translation_lock:
+        _translation_cache[skeleton] = {
+            "sql_query": sql_query,
+            "spec": spec,
+            "slots": slots,
+            "explanation": explanation
+        }
+        _translation_cache.move_to_end(skeleton)
+        while len(_translation_cache) > TRANSLATION_CACHE_SIZE:
+            _translation_cache.popitem(last=False)
+
+
+def cached_translation(skeleton, slots):
+    """
+    Returns a cached translation with this question's names and numbers filled in, or None
+    """
+    if skeleton is None:
+        return None
+    with _translation_lock:
+        entry = _translation_cache.get(skeleton)
+        if entry is None:
+            return None
+        _translation_cache.move_to_end(skeleton)
+
+    params = []
+    for index, source in entry["spec"]:
+        if index is None:
+            params.append(source)
+        elif source is None:
+            params.append(slots[index])
+        else:
+            params.append(slots[index][source])
+
+    explanation = entry["explanation"]
+    for old, new in zip(entry["slots"], slots):
+        if isinstance(old, dict):
+            explanation = explanation.replace(old["name"], new["name"])
+        else:
+            explanation = re.sub(rf'\b{old}\b', str(new), explanation)
+    return {
+        "success": True,
+        "sql_query": entry["sql_query"],
+        "params": tuple(params),
+        "explanation": explanation
+    }
+
+
+def split_literals(sql_query):
+    """
+    Splits a generated query into a skeleton and parameters (unchanged if it can't be tokenized)
+    """
+    try:
+        skeleton, params = parameterize(sql_query)
+    except ValueError:
+        return sql_query, ()
+    return skeleton, params or ()
+
+
+def notify(on_event, stage, **payload):
+    """
+    Sends a stage event to the caller's on_event(stage, payload) callback, if there is one
+    """
+    if on_event is not None:
+        on_event(stage, payload)
+
+
+def token_callback(on_event, stage):
+    """
+    Returns an on_token callback that forwards streamed model output as stage events (None without on_event)
+    """
+    if on_event is None:
+        return None
+    return lambda text: on_event(stage, {"text": text})
+
+
+def translate_to_sql(query, on_event=None, explain=True):
+    """
+    Translates the user's question to a valid SQL skeleton and its parameters
+    Common question shapes are answered from templates without calling the LLM, and
+    questions that differ from an earlier one only in names or numbers reuse its translation
+    on_event receives "sql_token" events while the model writes the SQL, then "sql" and "validation"
+    With explain=False a model translation comes back without its explanation, so the caller can run
+    the query first and call explain_translation afterwards
+    Concurrent identical questions share one translation; callers that waited only get the
+    "sql" (source "shared") and "validation" events
+    """
+    key = ("translation", ' '.join(query.lower().split()), explain)
+    with span("translate") as current:
+        translation, shared = single_flight(key, lambda: translate_question(query, on_event, explain))
+        current.set(shared=shared, success=translation["success"] if translation else None)
+    if not shared:
+        return translation
+    if translation is None:
+        return {
+            "success": False,
+            "error": "Timed out waiting for the same question to be translated",
+            "original_query": query
+        }
+    notify(on_event, "sql", sql_query=render_sql(translation["sql_query"], translation["params"]), source="shared")
+    if "skeleton" in translation or not translation["success"]:
+        notify(on_event, "validation", valid=translation["success"], error=translation.get("error"))
+    return translation
+
+
+def translate_question(query, on_event=None, explain=True):
+    """
+    Translates one question (see translate_to_sql): template, cached translation or the LLM
+    """
+    resolved = resolve_mentions(query)
+    template = match_template(query, resolved)
+    if template:
+        print(f"Matched template: {template['template']}")
+        notify(on_event, "sql", sql_query=render_sql(template["sql_query"], template["params"]), source="template")
+        return {
+            "success": True,
+            "sql_query": template["sql_query"],
+            "params": template["params"],
+            "explanation": template["explanation"]
+        }
+
+    skeleton, slots = question_skeleton(query, resolved)
+    cached = cached_translation(skeleton, slots)
+    if cached:
+        print(f"Reused translation for: {skeleton}")
+        notify(on_event, "sql", sql_query=render_sql(cached["sql_query"], cached["params"]), source="cache")
+        return cached
+
+    with span("prompt_build") as current:
+        prompt = f"""
         You are an expert SQL translator for an NBA database. Convert the following natural language question to a valid MySQL query.
 
-        {NBA_SCHEMA_CONTEXT}
+        {get_schema_context()}
 
         Example NBA data:
         Players: {SAMPLE_DATA['players'][:1]}
@@ -43,32 +253,65 @@ def translate_to_sql(query):
             - "Show me the 5 tallest players": {EXAMPLE_QUERIES[6]}
             - "List 7 Lakers players": {EXAMPLE_QUERIES[7]}
             - "Show me the 5 teams with the most players": {EXAMPLE_QUERIES[8]}
-            - "Show top scorers, limit 10, ordered by average points descending": {EXAMPLE_QUERIES[11]}
-            - "Get player stats by team, limit 10, ordered by average points descending": {EXAMPLE_QUERIES[12]}
-            - "Find five teams and their average points, limit 5, ordered by average points descending": {EXAMPLE_QUERIES[13]}
+            - "Show top scorers, limit 10, ordered by average points descending": {EXAMPLE_QUERIES[17]}
+            - "Get player stats by team, limit 10, ordered by average points descending": {EXAMPLE_QUERIES[18]}
+            - "Find five teams and their average points, limit 5, ordered by average points descending": {EXAMPLE_QUERIES[19]}
+            - "Show the 10 highest scoring individual games": {EXAMPLE_QUERIES[11]}
+
+        {entity_prompt_context(resolved)}
 
         User Question: {query}
 
         Return only the SQL query without any explanation.
     """
-    sql_query = call_language_model(prompt)
+        current.set(prompt_chars=len(prompt))
+    sql_query = call_language_model(prompt, on_token=token_callback(on_event, "sql_token"))
     print("Translated SQL")
     print(sql_query)
-    is_valid, error_msg = validate_sql(sql_query)
+    notify(on_event, "sql", sql_query=sql_query, source="model")
+    sql_skeleton, params = split_literals(sql_query)
+    with span("validate") as current:
+        is_valid, error_msg = validate_sql(sql_skeleton)
+        current.set(valid=is_valid, error=error_msg or None)
+    notify(on_event, "validation", valid=is_valid, error=error_msg)
 
     if is_valid:
-        return {
+        translation = {
             "success": True,
-            "sql_query": sql_query,
-            "explanation": generate_sql_explanation(sql_query, query)
+            "sql_query": sql_skeleton,
+            "params": params,
+            "explanation": None,
+            "skeleton": skeleton,
+            "slots": slots
         }
+        if explain:
+            translation["explanation"] = explain_translation(query, translation)
+        return translation
     return {
         "success": False,
         "error": error_msg,
+        "sql_query": sql_skeleton,
+        "params": params,
         "original_query": query
     }
 
 
+def explain_translation(query, translation, on_token=None):
+    """
+    Returns a translation's explanation, generating (and caching the translation with) it for
+    model translations that were returned without one
+    """
+    if translation.get("explanation") is not None:
+        return translation["explanation"]
+    sql_query = render_sql(translation["sql_query"], translation["params"])
+    explanation = generate_sql_explanation(sql_query, query, on_token=on_token)
+    translation["explanation"] = explanation
+    cache_translation(
+        translation.get("skeleton"), translation.get("slots", []),
+        translation["sql_query"], translation["params"], explanation)
+    return explanation
+
+
 def build_sample_query(query_type=None):
     """
     Generates a sample SQL query for the NBA database
@@ -83,7 +326,7 @@ def build_sample_query(query_type=None):
     prompt = f"""
         You are an expert sample SQL query builder for an NBA database.
 
-        {NBA_SCHEMA_CONTEXT}
+        {get_schema_context()}
 
         Example NBA data:
         Players: {SAMPLE_DATA['players'][:1]}
@@ -94,9 +337,9 @@ def build_sample_query(query_type=None):
         1. "Show me the tallest players": {EXAMPLE_QUERIES[6]}
         2. "List Lakers players": {EXAMPLE_QUERIES[7]}
         3. "Count players by team": {EXAMPLE_QUERIES[8]}
-        4. "Show top scorers": {EXAMPLE_QUERIES[11]}
-        5. "Get player stats by team": {EXAMPLE_QUERIES[12]}
-        6. "Find all teams and their average points": {EXAMPLE_QUERIES[13]}
+        4. "Show top scorers": {EXAMPLE_QUERIES[17]}
+        5. "Get player stats by team": {EXAMPLE_QUERIES[18]}
+        6. "Find all teams and their average points": {EXAMPLE_QUERIES[19]}
 
         {type_guidance}
 
@@ -105,7 +348,9 @@ def build_sample_query(query_type=None):
 
     try:
         sql_query = call_language_model(prompt)
-        is_valid, error_msg = validate_sql(sql_query)
+        with span("validate") as current:
+            is_valid, error_msg = validate_sql(sql_query)
+            current.set(valid=is_valid, error=error_msg or None)
 
         if is_valid:
             explanation = generate_sql_explanation(sql_query, "Sample query")
@@ -129,23 +374,78 @@ def build_sample_query(query_type=None):
         }
 
 
-def call_language_model(prompt):
+def create_openai_client():
     """
-    Calls the openai API with an inputted prompt and returns the response
+    Creates the OpenAI client (one per process, its HTTP connections are kept alive between calls)
     """
-    try:
-        response = openai.chat.completions.create(
+    return openai.OpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+
+
+def close_openai_client(client):
+    """
+    Closes the OpenAI client's HTTP connections on shutdown
+    """
+    client.close()
+
+
+def get_openai_client():
+    """
+    Gets the process-wide OpenAI client
+    """
+    return get_resource("openai_client", create_openai_client, close_openai_client)
+
+
+def complete_chat(messages, on_token=None):
+    """
+    Runs a chat completion and returns its text
+    With on_token (and LLM_STREAMING on) the response is streamed and on_token(text) is called
+    for every piece as it arrives
+    """
+    with span("llm", model=LLM_MODEL) as current:
+        if current.recording:
+            current.set(prompt_chars=sum(len(message["content"]) for message in messages))
+        if on_token is None or not LLM_STREAMING:
+            response = get_openai_client().chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=LLM_TEMPERATURE
+            )
+            if response.usage is not None:
+                current.set(
+                    prompt_tokens=response.usage.prompt_tokens,
+                    completion_tokens=response.usage.completion_tokens)
+            return response.choices[0].message.content
+
+        stream = get_openai_client().chat.completions.create(
             model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": """
-                   You are an expert SQL translator for an NBA database.
-                   Generate only valid MySQL SQL queries without explanations or comments."
-                 """},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=LLM_TEMPERATURE
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            stream=True
         )
-        content = response.choices[0].message.content
+        pieces = []
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                pieces.append(text)
+                on_token(text)
+        # Streamed responses carry no usage; the API sends about one token per chunk
+        current.set(streamed=True, completion_tokens=len(pieces))
+        return ''.join(pieces)
+
+
+def call_language_model(prompt, on_token=None):
+    """
+    Calls the openai API with an inputted prompt and returns the response
+    on_token receives the response as it is streamed
+    """
+    try:
+        content = complete_chat([
+            {"role": "system", "content": """
+               You are an expert SQL translator for an NBA database.
+               Generate only valid MySQL SQL queries without explanations or comments."
+             """},
+            {"role": "user", "content": prompt}
+        ], on_token=on_token)
         content = re.sub(r'^```sql\s*', '', content, flags=re.IGNORECASE)
         content = re.sub(r'^```\s*', '', content)
         content = re.sub(r'\s*```$', '', content)
@@ -220,9 +520,10 @@ def format_schema_results(result):
     return response
 
 
-def generate_sql_explanation(sql_query, original_query):
+def generate_sql_explanation(sql_query, original_query, on_token=None):
     """
     Generates a human-readable explanation of what the SQL query does
+    on_token receives the explanation as it is streamed
     """
     prompt = f"""
         You are an expert at explaining SQL queries to users who might not be familiar with SQL.
@@ -232,24 +533,17 @@ def generate_sql_explanation(sql_query, original_query):
 
         SQL query: {sql_query}
 
-        {NBA_SCHEMA_CONTEXT}
+        {get_schema_context()}
 
         Do not number your explanation in steps, just have a newline for each line in the sql query. Keep it short and concise.
     """
     try:
-        response = openai.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": """
-                 You are an expert at explaining natural language to SQL translation
-                 """},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=LLM_TEMPERATURE
-        )
-        content = response.choices[0].message.content
-
-        return content
+        return complete_chat([
+            {"role": "system", "content": """
+             You are an expert at explaining natural language to SQL translation
+             """},
+            {"role": "user", "content": prompt}
+        ], on_token=on_token)
     except (APIError, RateLimitError, APIConnectionError) as e:
         print(f"Error calling OpenAI API: {e}")
 
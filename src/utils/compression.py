@@ -0,0 +1,84 @@
+"""
+compression.py
+
+This file contains the streaming compression helpers shared by the
+database export and restore utilities (gzip built in, zstd optional)
+"""
+
+import gzip
+import hashlib
+from src.utils.config import BACKUP_CHUNK_SIZE
+
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+    'none': ''
+}
+
+
+class HashingWriter:
+    """
+    File wrapper that computes a sha256 checksum of the bytes written to disk
+    """
+
+    def __init__(self, raw_file):
+        self.raw_file = raw_file
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.raw_file.write(data)
+
+    def flush(self):
+        self.raw_file.flush()
+
+    def close(self):
+        self.raw_file.close()
+
+
+def open_compressed_writer(raw_file, compression):
+    """
+    Wraps a binary file object in a streaming compressor
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=6)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).stream_writer(
+            raw_file, closefd=False)
+    if compression == 'none':
+        return raw_file
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def close_compressed_writer(writer, raw_file):
+    """
+    Flushes the compressor's trailing frame without closing the raw file
+    """
+    if writer is not raw_file:
+        writer.close()
+
+
+def open_compressed_reader(path, compression):
+    """
+    Opens a compressed file for streaming decompression
+    """
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+    if compression == 'none':
+        return open(path, 'rb')
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def file_checksum(path):
+    """
+    Computes the sha256 checksum of a file in fixed-size chunks
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(BACKUP_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
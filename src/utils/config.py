@@ -20,9 +20,20 @@ DB_CONFIG = {
 }
 
 """
-Configuration for OpenAI API key
+Configuration for the MySQL connection pool, prepared statements and modification previews/batches
+"""
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+PREPARED_STATEMENTS = os.getenv("PREPARED_STATEMENTS", "true").lower() == "true"
+PREPARED_STATEMENT_CACHE_SIZE = 64
+MODIFICATION_IMAGE_LIMIT = 100
+MODIFICATION_MAX_STATEMENTS = int(os.getenv("MODIFICATION_MAX_STATEMENTS", "50"))
+
+"""
+Configuration for OpenAI API key and the shared client (request timeout in seconds, retries on transient errors)
 """
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
 
 """
 Configuration for default sample limit
@@ -35,10 +46,170 @@ Configuration for dangerous SQL keywords
 DANGEROUS_SQL_KEYWORDS = ['DROP', 'TRUNCATE', 'ALTER', 'GRANT', 'REVOKE']
 
 """
-Configuration for LLM model
+Configuration for SQL validation and the query result cache
+(SELECTs without a LIMIT get DEFAULT_QUERY_LIMIT appended)
+"""
+DEFAULT_QUERY_LIMIT = int(os.getenv("DEFAULT_QUERY_LIMIT", "1000"))
+SQL_PARSE_CACHE_SIZE = 512
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "300"))
+
+"""
+Configuration for request coalescing: concurrent identical questions and SELECTs share one
+in-flight translation/execution, and callers waiting on another caller's work give up after
+SINGLE_FLIGHT_TIMEOUT seconds
+"""
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "60"))
+
+"""
+Configuration for the EXPLAIN cost guard run before SELECTs reach MySQL
+(above COST_GUARD_MAX_ROWS estimated rows examined the COST_GUARD_ACTION is
+'replica', 'limit' or 'reject'; above COST_GUARD_REJECT_ROWS queries are always rejected)
+"""
+COST_GUARD_ENABLED = os.getenv("COST_GUARD_ENABLED", "true").lower() == "true"
+COST_GUARD_MAX_ROWS = int(os.getenv("COST_GUARD_MAX_ROWS", "2000000"))
+COST_GUARD_REJECT_ROWS = int(os.getenv("COST_GUARD_REJECT_ROWS", "50000000"))
+COST_GUARD_ACTION = os.getenv("COST_GUARD_ACTION", "replica")
+COST_GUARD_LIMIT = 100
+QUERY_MAX_EXECUTION_MS = int(os.getenv("QUERY_MAX_EXECUTION_MS", "15000"))
+
+"""
+Configuration for the slow-query log (every statement execute_sql runs for at least QUERY_LOG_MIN_MS
+is recorded by fingerprint in a local SQLite file, keeping the newest QUERY_LOG_MAX_ROWS) read by the
+index advisor (python -m src.services.index_advisor)
+"""
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+QUERY_LOG_PATH = os.getenv(
+    "QUERY_LOG_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'query_log.sqlite'))
+QUERY_LOG_MIN_MS = float(os.getenv("QUERY_LOG_MIN_MS", "0"))
+QUERY_LOG_MAX_ROWS = int(os.getenv("QUERY_LOG_MAX_ROWS", "100000"))
+
+"""
+Configuration for the self-repair loop that sends failing generated SQL back to the model
+"""
+REPAIR_MAX_ATTEMPTS = int(os.getenv("REPAIR_MAX_ATTEMPTS", "2"))
+REPAIR_LATENCY_BUDGET = float(os.getenv("REPAIR_LATENCY_BUDGET", "8.0"))
+REPAIR_CACHE_SIZE = 256
+
+"""
+Configuration for LLM model (LLM_STREAMING streams generated SQL and explanations to the UI as they are written)
 """
 LLM_MODEL = "gpt-3.5-turbo"
 LLM_TEMPERATURE = 0.1
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+
+"""
+Configuration for intent routing ('rules' uses the regex router only, 'model' adds the n-gram classifier)
+"""
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "rules")
+INTENT_MODEL_MIN_CONFIDENCE = 0.6
+
+"""
+Configuration for the template fast path that answers common questions without the LLM,
+and the cache of LLM translations keyed by question skeleton
+"""
+TEMPLATE_FAST_PATH = os.getenv("TEMPLATE_FAST_PATH", "true").lower() == "true"
+DEFAULT_TOP_N = 10
+TEMPLATE_MIN_GAMES = int(os.getenv("TEMPLATE_MIN_GAMES", "20"))
+TEMPLATE_MIN_PLAYOFF_GAMES = int(os.getenv("TEMPLATE_MIN_PLAYOFF_GAMES", "4"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "256"))
+
+"""
+Configuration for the player/team entity index (minimum trigram similarity for fuzzy name matches)
+"""
+ENTITY_FUZZY_THRESHOLD = 0.5
+
+"""
+Configuration for database backups (compression is 'gzip', 'zstd' or 'none')
+"""
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "gzip")
+BACKUP_WORKERS = int(os.getenv("BACKUP_WORKERS", "4"))
+BACKUP_CHUNK_SIZE = 1024 * 1024
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+"""
+Configuration for the data-quality validation stage run before loading
+"""
+VALIDATION_CHUNK_SIZE = int(os.getenv("VALIDATION_CHUNK_SIZE", "50000"))
+VALIDATION_MAX_NULL_RATE = 0.5
+VALIDATION_SAMPLE_SIZE = 5
+VALIDATION_REPORT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'data', 'validation_report.json')
+
+"""
+Configuration for the box score scraper (the stats API base URL, and a multiplier on the pauses
+between requests that keep it under the API's rate limit; point it at a local stub with 0 for benchmarks)
+"""
+NBA_STATS_URL = os.getenv("NBA_STATS_URL", "https://stats.nba.com/stats").rstrip("/")
+NBA_STATS_DELAY_SCALE = float(os.getenv("NBA_STATS_DELAY_SCALE", "1"))
+
+"""
+Configuration for the local SQLite read replica (read-only SELECTs are routed to it when enabled)
+"""
+REPLICA_ENABLED = os.getenv("REPLICA_ENABLED", "false").lower() == "true"
+REPLICA_PATH = os.getenv(
+    "REPLICA_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'nba_replica.sqlite'))
+
+
+"""
+Configuration for the schema metadata cache (loaders touch the version marker after DDL or bulk loads)
+"""
+SCHEMA_VERSION_PATH = os.getenv(
+    "SCHEMA_VERSION_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'schema_version'))
+
+
+"""
+Configuration for the paginated result viewer (rows per page, and the most rows a streamed
+CSV/Parquet download may hold)
+"""
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "50"))
+RESULT_EXPORT_MAX_ROWS = int(os.getenv("RESULT_EXPORT_MAX_ROWS", "1000000"))
+
+"""
+Configuration for the session query history (compact entries per session) and the shared store of
+their result rows (least recently used results past RESULT_STORE_MAX_BYTES are spilled to Parquet
+when HISTORY_SPILL is on and pyarrow is installed, otherwise dropped)
+"""
+HISTORY_MAX_ENTRIES = int(os.getenv("HISTORY_MAX_ENTRIES", "50"))
+HISTORY_MAX_BYTES = int(os.getenv("HISTORY_MAX_BYTES", str(256 * 1024)))
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", str(128 * 1024 * 1024)))
+HISTORY_SPILL = os.getenv("HISTORY_SPILL", "false").lower() == "true"
+HISTORY_SPILL_DIR = os.getenv(
+    "HISTORY_SPILL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'history_spill'))
+HISTORY_SPILL_MAX_BYTES = int(os.getenv("HISTORY_SPILL_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+"""
+Configuration for the headless API server (api.py: workers are processes, each with its own pool and caches;
+requests past API_MAX_CONCURRENCY wait up to API_QUEUE_TIMEOUT seconds before a 503) and for running
+main.py as a thin client of it (set API_URL). The modification endpoints run client SQL against the
+database, so they are off unless API_MODIFICATIONS_KEY is set, and then need it in the X-API-Key header
+"""
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "5"))
+API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "60"))
+API_URL = os.getenv("API_URL", "").rstrip("/")
+API_MODIFICATIONS_KEY = os.getenv("API_MODIFICATIONS_KEY", "")
+
+
+"""
+Configuration for tracing the query pipeline: TELEMETRY_EXPORTER is 'off', 'otel' (OpenTelemetry API,
+exported by whatever SDK the process configures), 'prometheus' (metrics on TELEMETRY_PROMETHEUS_PORT)
+or 'jsonl' (one line per span in TELEMETRY_PATH); otel/prometheus fall back to jsonl when not installed
+"""
+TELEMETRY_EXPORTER = os.getenv("TELEMETRY_EXPORTER", "off").lower()
+TELEMETRY_PATH = os.getenv(
+    "TELEMETRY_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'telemetry.jsonl'))
+TELEMETRY_PROMETHEUS_PORT = int(os.getenv("TELEMETRY_PROMETHEUS_PORT", "9464"))
 
 
 """
@@ -156,6 +327,37 @@ Table: box_score
 - SEASON (text): Season
 - SEASON_TYPE (text): Type of season (Regular, Playoffs)
 
+Table: player_season_stats (pre-aggregated from box_score, one row per player per season)
+- PLAYER_ID (bigint, PRIMARY KEY): Player identifier (links to players.PERSON_ID)
+- SEASON (varchar, PRIMARY KEY): Season (e.g., "2023-24")
+- SEASON_TYPE (varchar, PRIMARY KEY): Type of season (Regular Season, Playoffs)
+- PLAYER_NAME (varchar): Player's full name (same as players.DISPLAY_FIRST_LAST)
+- TEAM_ID (bigint): Player's current team identifier
+- GAMES_PLAYED (int): Number of games played
+- PTS_TOTAL, REB_TOTAL, AST_TOTAL, STL_TOTAL, BLK_TOTAL, TOV_TOTAL (double): Season totals
+- FGM_TOTAL, FGA_TOTAL, FG3M_TOTAL, FG3A_TOTAL, FTM_TOTAL, FTA_TOTAL (double): Shooting totals
+- AVG_PTS, AVG_REB, AVG_AST, AVG_STL, AVG_BLK, AVG_TOV, AVG_PLUS_MINUS (double): Per-game averages
+
+Table: team_season_stats (pre-aggregated from box_score, one row per team per season)
+- TEAM_ID (bigint, PRIMARY KEY): Team identifier
+- SEASON (varchar, PRIMARY KEY): Season
+- SEASON_TYPE (varchar, PRIMARY KEY): Type of season
+- TEAM_NAME (varchar): Team nickname (same as teams.NICKNAME)
+- GAMES_PLAYED (int): Number of games played
+- NUM_PLAYERS (int): Number of distinct players who played
+- PTS_TOTAL, REB_TOTAL, AST_TOTAL (double): Season totals
+- AVG_PTS_PER_GAME, AVG_REB_PER_GAME, AVG_AST_PER_GAME (double): Team per-game averages
+- AVG_PLAYER_PTS (double): Average points per player per game
+
+Table: team_game_totals (pre-aggregated from box_score, one row per team per game)
+- GAME_ID (bigint, PRIMARY KEY): Game identifier
+- TEAM_ID (bigint, PRIMARY KEY): Team identifier
+- GAME_DATE (varchar): Date of game
+- SEASON (varchar): Season
+- SEASON_TYPE (varchar): Type of season
+- PLAYERS_USED (int): Number of players who appeared
+- PTS, REB, AST, STL, BLK, TOV, FGM, FGA, FG3M, FG3A, FTM, FTA (double): Team totals for the game
+
 Important Relationships:
 1. box_score.PLAYER_ID references players.PERSON_ID (linking stats to player)
 2. players.TEAM_ID references teams.TEAM_ID (linking player to team)
@@ -169,6 +371,9 @@ Notes for SQL Queries:
 - To get player names, use players.DISPLAY_FIRST_LAST, not box_score.PLAYER_NAME
 - For active players filter using players.ROSTERSTATUS = 'Active'
 - When working with teams, use teams.NICKNAME rather than teams.TEAM_NAME (which doesn't exist in the teams table)
+- For season averages or totals (top scorers, team averages, per-team player stats) prefer
+  player_season_stats, team_season_stats and team_game_totals over AVG/SUM on box_score
+- Only use box_score directly for single-game questions or stats the summary tables don't have
 """
 
 """
@@ -405,4 +610,7 @@ EXAMPLE_QUERIES = [
     "SELECT teams.NICKNAME, COUNT(DISTINCT players.PERSON_ID) as num_players, AVG(box_score.PTS) as team_avg_points FROM teams JOIN players ON teams.TEAM_ID = players.TEAM_ID JOIN box_score ON players.PERSON_ID = box_score.PLAYER_ID GROUP BY teams.NICKNAME ORDER BY team_avg_points DESC LIMIT 5",
     "INSERT INTO players (PERSON_ID, FIRST_NAME, LAST_NAME, DISPLAY_FIRST_LAST, HEIGHT, WEIGHT, POSITION, TEAM_ID, TEAM_NAME, TEAM_ABBREVIATION) VALUES (20777, 'Michael', 'Jordan', 'Michael Jordan', '6-6', 216, 'Guard', 1610612741, 'Bulls', 'CHI')",
     "UPDATE players SET TEAM_ID = 1610612747, TEAM_NAME = 'Lakers', TEAM_ABBREVIATION = 'LAL', TEAM_CITY = 'Los Angeles' WHERE PERSON_ID = 20777",
-    "DELETE FROM players WHERE PERSON_ID = 20777"]
+    "DELETE FROM players WHERE PERSON_ID = 20777",
+    "SELECT PLAYER_NAME, AVG_PTS, AVG_REB, AVG_AST FROM player_season_stats WHERE SEASON_TYPE = 'Regular Season' ORDER BY AVG_PTS DESC LIMIT 10",
+    "SELECT player_season_stats.PLAYER_NAME, teams.NICKNAME as team, player_season_stats.AVG_PTS, player_season_stats.REB_TOTAL FROM player_season_stats JOIN teams ON player_season_stats.TEAM_ID = teams.TEAM_ID ORDER BY player_season_stats.AVG_PTS DESC LIMIT 10",
+    "SELECT TEAM_NAME, NUM_PLAYERS, AVG_PLAYER_PTS, AVG_PTS_PER_GAME FROM team_season_stats WHERE SEASON_TYPE = 'Regular Season' ORDER BY AVG_PTS_PER_GAME DESC LIMIT 5"]
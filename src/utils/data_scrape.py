@@ -13,6 +13,7 @@ import requests
 import pandas as pd
 from nba_api.stats.static import players, teams
 from nba_api.stats.endpoints import commonplayerinfo, teamdetails, leaguegamefinder
+from src.utils.config import NBA_STATS_URL, NBA_STATS_DELAY_SCALE
 
 
 def get_all_players(active_only=True):
@@ -167,10 +168,10 @@ def get_box_scores(games_df, season='2023-24', season_type='Regular Season'):
             continue
 
         delay = 5 + random.uniform(0, 2)
-        time.sleep(delay)
+        time.sleep(delay * NBA_STATS_DELAY_SCALE)
 
         try:
-            trad_url = f"https://stats.nba.com/stats/boxscoretraditionalv2?GameID={game_id}&StartPeriod=0&EndPeriod=10&StartRange=0&EndRange=28800&RangeType=0"
+            trad_url = f"{NBA_STATS_URL}/boxscoretraditionalv2?GameID={game_id}&StartPeriod=0&EndPeriod=10&StartRange=0&EndRange=28800&RangeType=0"
             trad_response = requests.get(trad_url, headers=headers, timeout=60)
 
             if trad_response.status_code != 200:
@@ -200,9 +201,9 @@ def get_box_scores(games_df, season='2023-24', season_type='Regular Season'):
             traditional_box_scores.append(trad_player_stats)
 
             delay = 3 + random.uniform(0, 2)
-            time.sleep(delay)
+            time.sleep(delay * NBA_STATS_DELAY_SCALE)
 
-            adv_url = f"https://stats.nba.com/stats/boxscoreadvancedv2?GameID={game_id}&StartPeriod=0&EndPeriod=10&StartRange=0&EndRange=28800&RangeType=0"
+            adv_url = f"{NBA_STATS_URL}/boxscoreadvancedv2?GameID={game_id}&StartPeriod=0&EndPeriod=10&StartRange=0&EndRange=28800&RangeType=0"
             adv_response = requests.get(adv_url, headers=headers, timeout=60)
 
             if adv_response.status_code != 200:
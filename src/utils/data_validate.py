@@ -0,0 +1,404 @@
+"""
+data_validate.py
+
+This file contains the data-quality validation stage that runs between
+cleaning and upload. Each staged CSV is read once in fixed-size chunks and
+checked with vectorized pandas operations for key uniqueness, null rates,
+value ranges, foreign key coverage and schema drift against the previous
+load, producing a JSON report. Key hashes and parent key values are kept in
+a temporary on-disk SQLite database, so memory doesn't grow with the load.
+"""
+
+import os
+import json
+import sqlite3
+from datetime import datetime
+import pandas as pd
+from src.utils.config import (
+    VALIDATION_CHUNK_SIZE,
+    VALIDATION_MAX_NULL_RATE,
+    VALIDATION_SAMPLE_SIZE,
+    VALIDATION_REPORT_PATH
+)
+
+VALIDATION_RULES = {
+    'teams': {
+        'keys': ['TEAM_ID'],
+        'ranges': {
+            'YEARFOUNDED': (1900, 2100),
+            'ARENACAPACITY': (0, 100000)
+        },
+        'foreign_keys': {}
+    },
+    'players': {
+        'keys': ['PERSON_ID'],
+        'ranges': {
+            'WEIGHT': (100, 400),
+            'SEASON_EXP': (0, 30)
+        },
+        'foreign_keys': {
+            'TEAM_ID': ('teams', 'TEAM_ID')
+        }
+    },
+    'box_score': {
+        'keys': ['GAME_ID', 'PLAYER_ID'],
+        'ranges': {
+            'PTS': (0, 100),
+            'MINUTES': (0, 70),
+            'REB': (0, None),
+            'AST': (0, None),
+            'STL': (0, None),
+            'BLK': (0, None),
+            'FG_PCT': (0, 1),
+            'FG3_PCT': (0, 1),
+            'FT_PCT': (0, 1)
+        },
+        'foreign_keys': {
+            'PLAYER_ID': ('players', 'PERSON_ID'),
+            'TEAM_ID': ('teams', 'TEAM_ID')
+        }
+    }
+}
+
+
+def parse_minutes(series):
+    """
+    Converts a minutes column ("37:41", "37.000000:41" or 37.5) to float minutes
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    parts = series.astype(str).str.split(':', n=1, expand=True)
+    minutes = pd.to_numeric(parts[0], errors='coerce')
+    if parts.shape[1] > 1:
+        minutes = minutes + pd.to_numeric(parts[1], errors='coerce').fillna(0) / 60
+    return minutes.where(series.notna())
+
+
+def open_key_store():
+    """
+    Opens a temporary SQLite database (on disk, removed when closed) for the key hashes seen so far
+    and the parent key values foreign keys are checked against
+    """
+    store = sqlite3.connect('')
+    store.execute("""
+        CREATE TABLE seen_keys (table_name TEXT, hash INTEGER, PRIMARY KEY (table_name, hash)) WITHOUT ROWID
+    """)
+    store.execute("""
+        CREATE TABLE parent_keys (
+            table_name TEXT, column_name TEXT, value, PRIMARY KEY (table_name, column_name, value)
+        ) WITHOUT ROWID
+    """)
+    store.execute("CREATE TABLE chunk_values (value)")
+    return store
+
+
+def stage_chunk_values(store, values):
+    """
+    Replaces the contents of the chunk_values scratch table with a chunk's distinct values
+    """
+    store.execute("DELETE FROM chunk_values")
+    store.executemany("INSERT INTO chunk_values VALUES (?)", ((value,) for value in pd.unique(values).tolist()))
+
+
+def seen_before(store, table_name, key_hashes):
+    """
+    Returns the key hashes of a chunk that earlier chunks already had, then records the chunk's hashes
+    """
+    stage_chunk_values(store, key_hashes.to_numpy().view('int64'))
+    seen = {row[0] for row in store.execute(
+        "SELECT value FROM chunk_values WHERE value IN (SELECT hash FROM seen_keys WHERE table_name = ?)",
+        (table_name,))}
+    store.execute("INSERT OR IGNORE INTO seen_keys SELECT ?, value FROM chunk_values", (table_name,))
+    return seen
+
+
+def record_parent_keys(store, table_name, column, values):
+    """
+    Records a parent table's key values for the foreign key checks of its child tables
+    """
+    stage_chunk_values(store, values)
+    store.execute(
+        "INSERT OR IGNORE INTO parent_keys SELECT ?, ?, value FROM chunk_values", (table_name, column))
+
+
+def missing_parent_values(store, parent_table, parent_col, values):
+    """
+    Returns the distinct values of a chunk's foreign key column its parent table doesn't have
+    """
+    stage_chunk_values(store, values)
+    return {row[0] for row in store.execute("""
+        SELECT value FROM chunk_values WHERE value NOT IN (
+            SELECT value FROM parent_keys WHERE table_name = ? AND column_name = ?)
+    """, (parent_table, parent_col))}
+
+
+def compatible_dtypes(expected, found):
+    """
+    Checks whether a chunk's dtype matches the expected one; integer and float columns are
+    compatible, since a chunk with missing values reads an integer column as float
+    """
+    numeric = ('int', 'float', 'uint')
+    return expected == found or (expected.startswith(numeric) and found.startswith(numeric))
+
+
+def new_table_state(rules):
+    """
+    Creates the running totals for one table's single pass
+    """
+    return {
+        "rows": 0,
+        "schema": None,
+        "chunk_types": {},
+        "duplicate_keys": 0,
+        "duplicate_samples": [],
+        "null_counts": {},
+        "range_violations": {col: 0 for col in rules['ranges']},
+        "range_samples": {col: [] for col in rules['ranges']},
+        "fk_missing": {col: 0 for col in rules['foreign_keys']},
+        "fk_samples": {col: set() for col in rules['foreign_keys']},
+        "key_columns": []
+    }
+
+
+def check_chunk(chunk, table_name, rules, state, store, parent_keys, expected_schema=None):
+    """
+    Runs every vectorized check on one chunk and adds it to the running totals
+    parent_keys is {table: [key columns recorded in the store]}; every chunk's dtypes are compared
+    with expected_schema (the previous load's, or else the first chunk's)
+    """
+    chunk_schema = {col: str(dtype) for col, dtype in chunk.dtypes.items()}
+    if state["schema"] is None:
+        state["schema"] = chunk_schema
+    for col, dtype in chunk_schema.items():
+        expected = (expected_schema or state["schema"]).get(col)
+        if expected is not None and not compatible_dtypes(expected, dtype):
+            state["chunk_types"].setdefault(col, set()).add(dtype)
+
+    state["rows"] += len(chunk)
+    for col, count in chunk.isna().sum().items():
+        state["null_counts"][col] = state["null_counts"].get(col, 0) + int(count)
+
+    keys = [key for key in rules['keys'] if key in chunk.columns]
+    if keys == rules['keys']:
+        key_hashes = pd.util.hash_pandas_object(chunk[keys], index=False)
+        within_chunk = key_hashes.duplicated()
+        across_chunks = pd.Series(
+            key_hashes.to_numpy().view('int64'), index=chunk.index).isin(seen_before(store, table_name, key_hashes))
+        duplicates = within_chunk | across_chunks
+        if duplicates.any():
+            state["duplicate_keys"] += int(duplicates.sum())
+            room = max(VALIDATION_SAMPLE_SIZE - len(state["duplicate_samples"]), 0)
+            state["duplicate_samples"].extend(
+                chunk.loc[duplicates, keys].head(room).to_dict('records'))
+
+        if len(keys) == 1:
+            record_parent_keys(store, table_name, keys[0], chunk[keys[0]].dropna())
+            state["key_columns"] = keys
+
+    if 'MIN' in chunk.columns and 'MINUTES' in rules['ranges']:
+        chunk = chunk.assign(MINUTES=parse_minutes(chunk['MIN']))
+
+    for col, (low, high) in rules['ranges'].items():
+        if col not in chunk.columns:
+            continue
+        values = pd.to_numeric(chunk[col], errors='coerce')
+        bad = pd.Series(False, index=chunk.index)
+        if low is not None:
+            bad |= values < low
+        if high is not None:
+            bad |= values > high
+        if bad.any():
+            state["range_violations"][col] += int(bad.sum())
+            room = max(VALIDATION_SAMPLE_SIZE - len(state["range_samples"][col]), 0)
+            state["range_samples"][col].extend(
+                {"row": int(row), "value": float(value)}
+                for row, value in values[bad].head(room).items())
+
+    for col, (parent_table, parent_col) in rules['foreign_keys'].items():
+        if col not in chunk.columns or parent_col not in parent_keys.get(parent_table, []):
+            continue
+        values = chunk[col].dropna()
+        missing = values[values.isin(missing_parent_values(store, parent_table, parent_col, values))]
+        if len(missing):
+            state["fk_missing"][col] += len(missing)
+            room = max(VALIDATION_SAMPLE_SIZE - len(state["fk_samples"][col]), 0)
+            state["fk_samples"][col].update(missing.unique()[:room].tolist())
+
+
+def schema_drift(schema, previous_schema, chunk_types=None):
+    """
+    Compares a table's columns and dtypes with the previous load, and lists the columns some chunk
+    read with another dtype than expected (chunk_types, {column: set(dtypes)})
+    """
+    chunk_types = {col: sorted(dtypes) for col, dtypes in (chunk_types or {}).items()}
+    if not previous_schema:
+        return {"added": [], "removed": [], "type_changed": {}, "inconsistent_chunks": chunk_types}
+    return {
+        "added": [col for col in schema if col not in previous_schema],
+        "removed": [col for col in previous_schema if col not in schema],
+        "type_changed": {
+            col: {"previous": previous_schema[col], "current": dtype}
+            for col, dtype in schema.items()
+            if col in previous_schema and not compatible_dtypes(previous_schema[col], dtype)},
+        "inconsistent_chunks": chunk_types
+    }
+
+
+def summarize_table(table_name, rules, state, previous_schema):
+    """
+    Turns a table's running totals into report checks
+    Failures block the load, warnings are problems the loader already repairs
+    """
+    checks = []
+    schema = state["schema"] or {}
+    rows = state["rows"]
+
+    missing_keys = [key for key in rules['keys'] if key not in schema]
+    checks.append({
+        "check": "key_columns_present",
+        "status": "fail" if missing_keys else "pass",
+        "missing": missing_keys
+    })
+
+    checks.append({
+        "check": "key_uniqueness",
+        "columns": rules['keys'],
+        "status": "warn" if state["duplicate_keys"] else "pass",
+        "duplicates": state["duplicate_keys"],
+        "samples": state["duplicate_samples"]
+    })
+
+    null_rates = {
+        col: round(count / rows, 4) if rows else 0.0
+        for col, count in state["null_counts"].items()}
+    null_keys = [key for key in rules['keys'] if null_rates.get(key, 0) > 0]
+    high_null = {
+        col: rate for col, rate in null_rates.items()
+        if rate > VALIDATION_MAX_NULL_RATE}
+    checks.append({
+        "check": "null_rates",
+        "status": "fail" if null_keys else ("warn" if high_null else "pass"),
+        "null_keys": null_keys,
+        "above_threshold": high_null
+    })
+
+    for col in rules['ranges']:
+        checks.append({
+            "check": "value_range",
+            "column": col,
+            "range": list(rules['ranges'][col]),
+            "status": "fail" if state["range_violations"][col] else "pass",
+            "violations": state["range_violations"][col],
+            "samples": state["range_samples"][col]
+        })
+
+    for col, (parent_table, parent_col) in rules['foreign_keys'].items():
+        checks.append({
+            "check": "foreign_key_coverage",
+            "column": col,
+            "references": f"{parent_table}.{parent_col}",
+            "status": "warn" if state["fk_missing"][col] else "pass",
+            "missing": state["fk_missing"][col],
+            "samples": sorted(state["fk_samples"][col])
+        })
+
+    drift = schema_drift(schema, previous_schema, state["chunk_types"])
+    checks.append({
+        "check": "schema_drift",
+        "status": "fail" if drift["removed"] else (
+            "warn" if drift["added"] or drift["type_changed"] or drift["inconsistent_chunks"] else "pass"),
+        **drift
+    })
+
+    return {
+        "table": table_name,
+        "rows": rows,
+        "schema": schema,
+        "null_rates": null_rates,
+        "checks": checks,
+        "passed": all(check["status"] != "fail" for check in checks)
+    }
+
+
+def validate_table(table_name, csv_file, store, parent_keys, previous_schema=None):
+    """
+    Validates one staged CSV in a single chunked pass
+    Returns the table report and the key columns whose values were recorded for child tables
+    """
+    rules = VALIDATION_RULES.get(
+        table_name, {'keys': [], 'ranges': {}, 'foreign_keys': {}})
+    state = new_table_state(rules)
+
+    for chunk in pd.read_csv(csv_file, chunksize=VALIDATION_CHUNK_SIZE):
+        check_chunk(chunk, table_name, rules, state, store, parent_keys, previous_schema)
+
+    return summarize_table(table_name, rules, state, previous_schema), state["key_columns"]
+
+
+def load_previous_report(report_path):
+    """
+    Loads the report from the previous load, used for schema drift
+    """
+    if not os.path.exists(report_path):
+        return {}
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Could not read previous validation report: {e}")
+        return {}
+
+
+def validate_staged_tables(table_files, report_path=None):
+    """
+    Validates every staged table (parents before children) and writes the report
+    """
+    report_path = report_path or VALIDATION_REPORT_PATH
+    previous = load_previous_report(report_path).get("tables", {})
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "tables": {},
+        "passed": True
+    }
+    parent_keys = {}
+    store = open_key_store()
+    try:
+        for table_name, csv_file in table_files.items():
+            print(f"Validating {table_name} ({os.path.basename(csv_file)})...")
+            try:
+                table_report, key_columns = validate_table(
+                    table_name, csv_file, store, parent_keys,
+                    previous.get(table_name, {}).get("schema"))
+            except (pd.errors.EmptyDataError, pd.errors.ParserError, FileNotFoundError) as e:
+                table_report = {
+                    "table": table_name,
+                    "error": str(e),
+                    "passed": False
+                }
+                key_columns = []
+
+            parent_keys[table_name] = key_columns
+            report["tables"][table_name] = table_report
+            report["passed"] = report["passed"] and table_report["passed"]
+
+            for check in table_report.get("checks", []):
+                if check["status"] != "pass":
+                    column = f" {check['column']}" if "column" in check else ""
+                    print(f"  {check['status'].upper()}: {check['check']}{column}")
+    finally:
+        store.close()
+
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+
+    print(f"Validation {'passed' if report['passed'] else 'failed'}, report written to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    from src.utils.sql_upload import TABLE_DATA
+
+    sys.exit(0 if validate_staged_tables(TABLE_DATA)["passed"] else 1)
@@ -3,19 +3,157 @@ nlp.py
 
 This file contains functions for cleaning the user's input and
 determining the intent of the query (schema exploration, data modification, or data query)
+
+Intents are routed with precompiled word-boundary regexes. An optional
+lightweight classifier (logistic regression over word n-grams, trained from
+src/data/intent_questions.csv) can be enabled with INTENT_CLASSIFIER=model.
 """
 
+import os
 import re
+import csv
+import math
+import random
+import threading
+from src.utils.config import INTENT_CLASSIFIER, INTENT_MODEL_MIN_CONFIDENCE
 
+INTENT_QUESTIONS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'data', 'intent_questions.csv')
+INTENT_HOLDOUT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'data', 'intent_questions_holdout.csv')
 
-def user_input(input_string):
+INTENTS = ["schema_explore", "data_modification", "data_query"]
+
+MODIFICATION_VERBS = (
+    r'(?:add|insert|create|update|modify|change|edit|set|mark|move|trade|sign|release'
+    r'|delete|remove|drop)\b')
+
+MODIFICATION_LEAD_PATTERN = re.compile(
+    r'^(?:please\s+|can\s+you\s+|could\s+you\s+)?' + MODIFICATION_VERBS)
+
+SCHEMA_PATTERN = re.compile(
+    r'\b(?:describe|schema|structure|structured|organized|tables?|columns?|fields'
+    r'|attributes|primary\s+keys?|foreign\s+keys?|data\s+types?)\b'
+    r'|\b(?:sample|example)\s+(?:\w+\s+)?(?:data|rows)\b')
+
+# A request to modify that opens the question ("I want to delete ...", "let's update ..."); the verbs
+# anywhere else are usually part of a read question ("the biggest change in points")
+MODIFICATION_PATTERN = re.compile(
+    r"^(?:(?:hey|ok|okay|so)[,\s]+)?(?:please\s+)?"
+    r"(?:i\s+want\s+to|i'd\s+like\s+to|i\s+would\s+like\s+to|i\s+need\s+to|we\s+need\s+to"
+    r"|let's|lets|go\s+ahead\s+and|can\s+(?:we|i)|could\s+(?:we|i)|would\s+you|will\s+you)"
+    r"\s+(?:please\s+)?" + MODIFICATION_VERBS)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_']+")
+
+_intent_model = {}
+_intent_model_lock = threading.Lock()
+
+
+def clean_query(input_string):
     """
-    Cleans the user's input and determines the intent of the query
+    Normalizes the user's input for intent routing
     """
-    input_clean = input_string.strip()
-    input_type = determine_intent(input_clean)
+    return input_string.lower().strip()
 
-    return input_type, input_clean
+
+def classify_rules(user_query):
+    """
+    Determines the intent of a cleaned query with the precompiled patterns
+    A modification verb opening the question wins (alone or after "I want to", "let's", ...),
+    then schema words; everything else is a data query
+    """
+    if MODIFICATION_LEAD_PATTERN.search(user_query):
+        return "data_modification"
+    if MODIFICATION_PATTERN.search(user_query):
+        return "data_modification"
+    if SCHEMA_PATTERN.search(user_query):
+        return "schema_explore"
+    return "data_query"
+
+
+def extract_features(user_query):
+    """
+    Extracts word unigram, bigram and leading-word features from a cleaned query
+    """
+    tokens = TOKEN_PATTERN.findall(user_query)
+    features = [f"w:{token}" for token in tokens]
+    features.extend(f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    if tokens:
+        features.append(f"first:{tokens[0]}")
+    return features
+
+
+def load_intent_examples(path=None):
+    """
+    Loads the labeled (question, intent) examples
+    """
+    with open(path or INTENT_QUESTIONS_PATH, 'r', encoding='utf-8') as f:
+        return [(clean_query(row['question']), row['intent']) for row in csv.DictReader(f)]
+
+
+def train_intent_model(examples, epochs=40, learning_rate=0.5, l2=1e-4, seed=7):
+    """
+    Trains a multinomial logistic regression over n-gram features with SGD
+    """
+    labels = sorted({intent for _, intent in examples})
+    weights = {}
+    bias = [0.0] * len(labels)
+    featurized = [
+        (extract_features(question), labels.index(intent))
+        for question, intent in examples]
+
+    rng = random.Random(seed)
+    for _ in range(epochs):
+        rng.shuffle(featurized)
+        for features, target in featurized:
+            probabilities = _softmax(_scores(weights, bias, features))
+            for label_index, probability in enumerate(probabilities):
+                gradient = probability - (1.0 if label_index == target else 0.0)
+                bias[label_index] -= learning_rate * gradient
+                for feature in features:
+                    row = weights.setdefault(feature, [0.0] * len(labels))
+                    row[label_index] -= learning_rate * (gradient + l2 * row[label_index])
+
+    return {"labels": labels, "weights": weights, "bias": bias}
+
+
+def _scores(weights, bias, features):
+    scores = list(bias)
+    for feature in features:
+        row = weights.get(feature)
+        if row:
+            for i, weight in enumerate(row):
+                scores[i] += weight
+    return scores
+
+
+def _softmax(scores):
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+def predict_intent(model, user_query):
+    """
+    Predicts the intent of a cleaned query, returns (intent, probability)
+    """
+    probabilities = _softmax(
+        _scores(model["weights"], model["bias"], extract_features(user_query)))
+    best = max(range(len(probabilities)), key=probabilities.__getitem__)
+    return model["labels"][best], probabilities[best]
+
+
+def get_intent_model():
+    """
+    Trains the intent model once per process from the labeled question set
+    """
+    if "model" not in _intent_model:
+        with _intent_model_lock:
+            if "model" not in _intent_model:
+                _intent_model["model"] = train_intent_model(load_intent_examples())
+    return _intent_model["model"]
 
 
 def determine_intent(user_query):
@@ -24,30 +162,22 @@ def determine_intent(user_query):
     If it's a schema exploration or normal query - gets sent to translation.py,
     if it's a data modification - gets sent to modification.py
     """
-    user_query = user_query.lower()
+    user_query = clean_query(user_query)
 
-    schema_patterns = [
-        r'\b(what|which|show|list|display)\b.*(tables|schema|columns|fields|structure)\b',
-        r'\b(describe|explain)\b.*(table|structure)\b',
-        r'\bhow.*(schema|structured|organized)\b',
-        r'\b(what|which).*(attributes|fields|columns).*(table|have|contain)\b',
-        r'\b(primary key|keys).*(of|for|in)\s+(?:the\s+)?(\w+)',
-        r'\b(sample|example)\b.*(data|rows).*(from|in)\b.*\btable\b',
-        r'\bshow.*\bdata\b.*\bfrom\b',
-        r'\bgive.*\bsample\b.*\bfrom\b']
+    if INTENT_CLASSIFIER == "model":
+        intent, probability = predict_intent(get_intent_model(), user_query)
+        if probability >= INTENT_MODEL_MIN_CONFIDENCE:
+            return intent
 
-    modify_patterns = [
-        r'\b(add|insert|create|put)\b',
-        r'\b(update|modify|change|edit)\b',
-        r'\b(delete|remove|drop)\b'
-    ]
+    return classify_rules(user_query)
 
-    for patt in schema_patterns:
-        if re.search(patt, user_query):
-            return "schema_explore"
 
-    for patt in modify_patterns:
-        if re.search(patt, user_query):
-            return "data_modification"
+def user_input(input_string):
+    """
+    Cleans the user's input and determines the intent of the query
+    Returns a tuple of (intent, cleaned_query)
+    """
+    input_clean = clean_query(input_string)
+    input_type = determine_intent(input_clean)
 
-    return "data_query"
+    return input_type, input_clean
@@ -0,0 +1,63 @@
+"""
+query_plan.py
+
+This file contains helpers for reading MySQL EXPLAIN FORMAT=JSON output.
+The plan is reduced to an estimate of rows examined (each join step's rows
+per scan multiplied by the rows produced before it), the optimizer's query
+cost, the tables read with full scans and whether any join has no condition
+(a cartesian product).
+"""
+
+import json
+
+
+def join_estimate(tables, summary):
+    """
+    Adds one nested loop of table accesses to the summary
+    """
+    prefix_rows = 1.0
+    for table in tables:
+        examined = float(table.get("rows_examined_per_scan", 0) or 0)
+        summary["rows_examined"] += prefix_rows * examined
+        prefix_rows = float(table.get("rows_produced_per_join", examined) or 0) or prefix_rows
+
+        if table.get("access_type") == "ALL":
+            summary["full_scans"].append(table.get("table_name"))
+        if table.get("using_join_buffer") and not table.get("attached_condition"):
+            summary["cartesian"] = True
+
+        walk_plan({k: v for k, v in table.items() if isinstance(v, (dict, list))}, summary)
+
+
+def walk_plan(node, summary):
+    """
+    Walks every query block in the plan, including subqueries and unions
+    """
+    if isinstance(node, list):
+        for item in node:
+            walk_plan(item, summary)
+    elif isinstance(node, dict):
+        for key, value in node.items():
+            if key == "nested_loop":
+                join_estimate([item["table"] for item in value if "table" in item], summary)
+            elif key == "table" and isinstance(value, dict):
+                join_estimate([value], summary)
+            elif isinstance(value, (dict, list)):
+                walk_plan(value, summary)
+
+
+def summarize_plan(plan):
+    """
+    Summarizes an EXPLAIN FORMAT=JSON plan (a dict or the JSON text)
+    Returns {"rows_examined", "query_cost", "full_scans", "cartesian"}
+    """
+    if isinstance(plan, (str, bytes)):
+        plan = json.loads(plan)
+
+    summary = {"rows_examined": 0.0, "query_cost": 0.0, "full_scans": [], "cartesian": False}
+    walk_plan(plan, summary)
+
+    cost_info = plan.get("query_block", {}).get("cost_info", {})
+    summary["query_cost"] = float(cost_info.get("query_cost", 0) or 0)
+    summary["rows_examined"] = int(summary["rows_examined"])
+    return summary
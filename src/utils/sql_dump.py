@@ -1,48 +1,328 @@
 """
 sql_dump.py
 
-This file contains the functions for exporting the NBA database to a SQL file
+This file contains the functions for exporting the NBA database to compressed
+per-table SQL dumps (with an optional Parquet copy of each table), and for
+restoring the database from those dumps. The parallel mysqldump workers
+open their snapshots while a global read lock holds writes back, so the
+tables are consistent with each other. When the mysqldump binary is not
+installed, or the lock can't be taken, the in-process exporter in
+sql_export.py is used instead, reading every table over one connection
+inside one snapshot. Restores are checked against the manifest's row counts.
 """
 
 import os
 import sys
+import json
+import shutil
+import contextlib
+import threading
+import argparse
+import tempfile
 import subprocess
 from datetime import datetime
-from src.utils.config import DB_CONFIG
+from concurrent.futures import ThreadPoolExecutor
+import mysql.connector
+from src.utils.config import (
+    DB_CONFIG,
+    BACKUP_COMPRESSION,
+    BACKUP_WORKERS,
+    BACKUP_CHUNK_SIZE
+)
+from src.utils.compression import (
+    COMPRESSION_SUFFIXES,
+    HashingWriter,
+    open_compressed_writer,
+    close_compressed_writer,
+    open_compressed_reader,
+    file_checksum
+)
+from src.utils.sql_export import export_table, begin_snapshot, get_dialect
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-def export_database_to_sql():
+EXPORT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+# mysqldump writes this comment before a table's first statement, after its snapshot is open
+TABLE_DUMP_MARKER = b'-- Table structure for table'
+
+
+def get_table_row_counts(connection=None):
     """
-    Exports the NBA database to a SQL file using mysqldump
+    Gets the name and row count of every table in the database
+    Connects to the configured database if no connection is given
     """
-    export_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
-    os.makedirs(export_dir, exist_ok=True)
+    owns_connection = connection is None
+    if owns_connection:
+        connection = mysql.connector.connect(**DB_CONFIG)
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SHOW TABLES")
+        tables = [row[0] for row in cursor.fetchall()]
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"nba_database_{timestamp}.sql"
-    filepath = os.path.join(export_dir, filename)
-
-    mysqldump_cmd = [
-        'mysqldump',
-        f'--host={DB_CONFIG["host"]}',
-        f'--user={DB_CONFIG["user"]}',
-        f'--port={DB_CONFIG["port"]}',
-        f'--password={DB_CONFIG["password"]}',
+        row_counts = {}
+        for table_name in tables:
+            cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+            row_counts[table_name] = cursor.fetchone()[0]
+        return row_counts
+    finally:
+        cursor.close()
+        if owns_connection:
+            connection.close()
+
+
+def lock_for_snapshots():
+    """
+    Takes a global read lock on a new connection so the mysqldump workers' snapshots
+    all see the same data, returns (connection, row counts read under the lock)
+    Returns (None, None) if the lock can't be taken (it needs the RELOAD privilege)
+    """
+    connection = mysql.connector.connect(**DB_CONFIG)
+    cursor = connection.cursor()
+    try:
+        cursor.execute("FLUSH TABLES WITH READ LOCK")
+    except mysql.connector.Error as e:
+        print(f"Could not take a global read lock: {e}")
+        cursor.close()
+        connection.close()
+        return None, None
+    cursor.close()
+
+    try:
+        return connection, get_table_row_counts(connection)
+    except mysql.connector.Error:
+        release_snapshot_lock(connection)
+        raise
+
+
+def release_snapshot_lock(connection):
+    """
+    Releases the global read lock and closes its connection
+    """
+    try:
+        cursor = connection.cursor()
+        cursor.execute("UNLOCK TABLES")
+        cursor.close()
+    except mysql.connector.Error as e:
+        print(f"Error releasing the global read lock, closing its connection: {e}")
+    finally:
+        connection.close()
+
+
+def write_client_options_file():
+    """
+    Writes the connection options to a private file so the password
+    is not visible on the mysqldump / mysql command line
+    """
+    fd, path = tempfile.mkstemp(prefix="nba_mysql_", suffix=".cnf")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write("[client]\n")
+        f.write(f"host={DB_CONFIG['host']}\n")
+        f.write(f"user={DB_CONFIG['user']}\n")
+        f.write(f"port={DB_CONFIG['port']}\n")
+        f.write(f"password=\"{DB_CONFIG['password'] or ''}\"\n")
+    return path
+
+
+def mysql_client_args(program, options_file):
+    """
+    Builds the connection arguments shared by mysqldump and mysql
+    """
+    return [program, f'--defaults-extra-file={options_file}']
+
+
+def dump_table(table_name, backup_dir, compression, options_file, started=None, slots=None):
+    """
+    Streams mysqldump output for a single table through the compressor
+    started (a threading.Event) is set once mysqldump has opened its snapshot; slots (a semaphore)
+    limits how many dumps compress and write at once, so every mysqldump can open its snapshot right away
+    """
+    filename = f"{table_name}.sql{COMPRESSION_SUFFIXES[compression]}"
+    filepath = os.path.join(backup_dir, filename)
+
+    mysqldump_cmd = mysql_client_args('mysqldump', options_file) + [
+        '--single-transaction',
+        '--quick',
         DB_CONFIG["database"],
-        '--result-file=' + filepath
+        table_name
     ]
 
+    started = started or threading.Event()
+    head = b''
     try:
-        print(f"Exporting database {DB_CONFIG['database']} to {filepath}...")
-        subprocess.run(mysqldump_cmd, check=True)
-        print(f"Database exported successfully to {filepath}")
-        return filepath
+        process = subprocess.Popen(mysqldump_cmd, stdout=subprocess.PIPE)
+        for chunk in iter(lambda: process.stdout.read1(BACKUP_CHUNK_SIZE), b''):
+            head += chunk
+            if TABLE_DUMP_MARKER in head:
+                break
+    finally:
+        started.set()
+
+    with slots or contextlib.nullcontext():
+        with open(filepath, 'wb') as raw_file:
+            hashing_file = HashingWriter(raw_file)
+            writer = open_compressed_writer(hashing_file, compression)
+            writer.write(head)
+            for chunk in iter(lambda: process.stdout.read1(BACKUP_CHUNK_SIZE), b''):
+                writer.write(chunk)
+            close_compressed_writer(writer, hashing_file)
+        process.stdout.close()
+
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, mysqldump_cmd)
+
+    return {
+        "file": filename,
+        "sha256": hashing_file.sha256.hexdigest(),
+        "bytes": os.path.getsize(filepath)
+    }
+
+
+def export_snapshot(table_names, backup_dir, compression, parquet, connection=None):
+    """
+    Exports tables (and optionally their Parquet copies) with the in-process exporter, one after another
+    over a single connection inside one snapshot, so they are consistent with each other
+    Row counts come from the export itself; connects to the configured MySQL database if no connection
+    is given (a SQLite connection can stand in for it)
+    """
+    owns_connection = connection is None
+    if owns_connection:
+        connection = mysql.connector.connect(**DB_CONFIG)
+
+    dialect = get_dialect(connection)
+    try:
+        begin_snapshot(connection, dialect)
+        tables = {}
+        for table_name in table_names:
+            entry = export_table(
+                connection, table_name, backup_dir, fmt='sql',
+                compression=compression, dialect=dialect)
+            if parquet:
+                try:
+                    entry["parquet"] = export_table(
+                        connection, table_name, backup_dir, fmt='parquet', dialect=dialect)["file"]
+                except ImportError as e:
+                    print(f"Skipping Parquet export of {table_name}, pyarrow is not installed: {e}")
+            print(f"Exported {table_name} to {entry['file']} ({entry['bytes']} bytes)")
+            tables[table_name] = entry
+        connection.rollback()
+        return tables
+    finally:
+        if owns_connection:
+            connection.close()
+
+
+def dump_tables(lock_connection, row_counts, backup_dir, compression, parquet, options_file, workers):
+    """
+    Dumps every table in parallel with mysqldump, releasing the global read lock held by lock_connection
+    once every mysqldump has opened its snapshot; all of them start at once (a dump waiting for a worker
+    would hold the lock, blocking writes, until an earlier table finished), while only `workers` dumps
+    compress and write at a time. The Parquet copies are read from one snapshot opened under the same
+    lock, so they match the dumps
+    """
+    parquet_connection = None
+    try:
+        if parquet:
+            parquet_connection = mysql.connector.connect(**DB_CONFIG)
+            begin_snapshot(parquet_connection, 'mysql')
+
+        started = {table_name: threading.Event() for table_name in row_counts}
+        slots = threading.BoundedSemaphore(workers)
+        with ThreadPoolExecutor(max_workers=max(len(row_counts), 1)) as executor:
+            futures = {
+                table_name: executor.submit(
+                    dump_table, table_name, backup_dir, compression,
+                    options_file, started[table_name], slots)
+                for table_name in row_counts
+            }
+            for event in started.values():
+                event.wait()
+            release_snapshot_lock(lock_connection)
+            lock_connection = None
+
+            tables = {}
+            for table_name, future in futures.items():
+                tables[table_name] = future.result()
+                tables[table_name]["rows"] = row_counts[table_name]
+                print(f"Exported {table_name} to {tables[table_name]['file']} "
+                      f"({tables[table_name]['bytes']} bytes)")
+
+        if parquet_connection is not None:
+            for table_name, entry in tables.items():
+                try:
+                    entry["parquet"] = export_table(
+                        parquet_connection, table_name, backup_dir, fmt='parquet', dialect='mysql')["file"]
+                except ImportError as e:
+                    print(f"Skipping Parquet export of {table_name}, pyarrow is not installed: {e}")
+            parquet_connection.rollback()
+        return tables
+    finally:
+        if lock_connection is not None:
+            release_snapshot_lock(lock_connection)
+        if parquet_connection is not None:
+            parquet_connection.close()
+
+
+def export_database_to_sql(compression=None, workers=None, parquet=False):
+    """
+    Exports the NBA database to compressed per-table SQL dumps in parallel
+    and writes a manifest with row counts and checksums
+    Every table is read from the same point in time, so the backup is consistent across tables
+    """
+    compression = compression or BACKUP_COMPRESSION
+    workers = workers or BACKUP_WORKERS
+
+    if compression not in COMPRESSION_SUFFIXES:
+        print(f"Unsupported backup compression: {compression}")
+        return None
+
+    options_file = None
+    if shutil.which('mysqldump'):
+        options_file = write_client_options_file()
+    else:
+        print("mysqldump not found, using the in-process exporter")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    backup_dir = os.path.join(EXPORT_DIR, f"nba_database_{timestamp}")
+    os.makedirs(backup_dir, exist_ok=True)
+
+    try:
+        print(f"Exporting database {DB_CONFIG['database']} to {backup_dir}...")
+        lock_connection = None
+        if options_file is not None:
+            lock_connection, row_counts = lock_for_snapshots()
+            if lock_connection is None:
+                print("Using the in-process exporter to read every table inside one snapshot")
+
+        if lock_connection is None:
+            tables = export_snapshot(list(get_table_row_counts()), backup_dir, compression, parquet)
+        else:
+            tables = dump_tables(
+                lock_connection, row_counts, backup_dir, compression, parquet, options_file, workers)
+
+        manifest = {
+            "database": DB_CONFIG["database"],
+            "created_at": timestamp,
+            "compression": compression,
+            "tables": tables
+        }
+        manifest_path = os.path.join(backup_dir, "manifest.json")
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"Database exported successfully to {backup_dir}")
+        return manifest_path
+    except mysql.connector.Error as e:
+        print(f"Error reading tables from the database: {e}")
+        return None
     except subprocess.CalledProcessError as e:
         print(f"Error executing mysqldump command: {e}")
         return None
     except FileNotFoundError as e:
-        print(f"mysqldump command not found. Please ensure MySQL client tools are installed: {e}")
+        print(f"A file or the mysqldump command was not found: {e}")
+        return None
+    except ImportError as e:
+        print(f"Compression library for '{compression}' is not installed: {e}")
         return None
     except PermissionError as e:
         print(f"Permission denied when executing mysqldump: {e}")
@@ -50,6 +330,120 @@ def export_database_to_sql():
     except OSError as e:
         print(f"Operating system error while executing mysqldump: {e}")
         return None
+    finally:
+        if options_file:
+            os.remove(options_file)
+
+
+def restore_table(table_name, entry, backup_dir, compression, options_file):
+    """
+    Verifies a table dump's checksum and streams it into the mysql client
+    """
+    filepath = os.path.join(backup_dir, entry["file"])
+    if file_checksum(filepath) != entry["sha256"]:
+        raise ValueError(f"Checksum mismatch for {entry['file']}")
+
+    mysql_cmd = mysql_client_args('mysql', options_file) + [DB_CONFIG["database"]]
+    process = subprocess.Popen(mysql_cmd, stdin=subprocess.PIPE)
+    with open_compressed_reader(filepath, compression) as reader:
+        for chunk in iter(lambda: reader.read(BACKUP_CHUNK_SIZE), b''):
+            process.stdin.write(chunk)
+    process.stdin.close()
+
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, mysql_cmd)
+
+    print(f"Restored {table_name} ({entry['rows']} rows)")
+    return table_name
+
+
+def check_row_counts(tables):
+    """
+    Compares the restored tables' row counts with the manifest's, returns the mismatches
+    """
+    row_counts = get_table_row_counts()
+    return [
+        f"{table_name} is missing" if table_name not in row_counts
+        else f"{table_name} has {row_counts[table_name]} rows, expected {entry['rows']}"
+        for table_name, entry in tables.items()
+        if row_counts.get(table_name) != entry["rows"]
+    ]
+
+
+def restore_database_from_sql(manifest_path, workers=None):
+    """
+    Restores the NBA database from a backup manifest, one table per worker,
+    then checks every table's row count against the manifest
+    """
+    workers = workers or BACKUP_WORKERS
+    backup_dir = os.path.dirname(os.path.abspath(manifest_path))
+    options_file = write_client_options_file()
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        print(f"Restoring {len(manifest['tables'])} tables from {backup_dir}...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    restore_table, table_name, entry, backup_dir,
+                    manifest["compression"], options_file)
+                for table_name, entry in manifest["tables"].items()
+            ]
+            for future in futures:
+                future.result()
+
+        mismatches = check_row_counts(manifest["tables"])
+        if mismatches:
+            raise ValueError(f"Restored row counts don't match the manifest: {'; '.join(mismatches)}")
+
+        print(f"Database {DB_CONFIG['database']} restored successfully")
+        return True
+    except (json.JSONDecodeError, KeyError) as e:
+        print(f"Invalid backup manifest {manifest_path}: {e}")
+        return False
+    except ValueError as e:
+        print(f"Backup verification failed: {e}")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"Error executing mysql command: {e}")
+        return False
+    except mysql.connector.Error as e:
+        print(f"Error counting the restored rows: {e}")
+        return False
+    except FileNotFoundError as e:
+        print(f"Backup file or mysql command not found: {e}")
+        return False
+    except ImportError as e:
+        print(f"Compression library for this backup is not installed: {e}")
+        return False
+    except OSError as e:
+        print(f"Operating system error while restoring the database: {e}")
+        return False
+    finally:
+        os.remove(options_file)
+
 
 if __name__ == "__main__":
-    export_database_to_sql()
+    parser = argparse.ArgumentParser(description="Back up or restore the NBA database")
+    subparsers = parser.add_subparsers(dest="command")
+
+    export_parser = subparsers.add_parser("export", help="Dump every table in parallel")
+    export_parser.add_argument("--compression", choices=list(COMPRESSION_SUFFIXES))
+    export_parser.add_argument("--workers", type=int)
+    export_parser.add_argument("--parquet", action="store_true",
+                               help="Also write a Parquet file per table")
+
+    restore_parser = subparsers.add_parser("restore", help="Restore from a backup manifest")
+    restore_parser.add_argument("manifest")
+    restore_parser.add_argument("--workers", type=int)
+
+    args = parser.parse_args()
+    if args.command == "restore":
+        restore_database_from_sql(args.manifest, workers=args.workers)
+    else:
+        export_database_to_sql(
+            compression=getattr(args, "compression", None),
+            workers=getattr(args, "workers", None),
+            parquet=getattr(args, "parquet", False))
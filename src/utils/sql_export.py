@@ -0,0 +1,333 @@
+"""
+sql_export.py
+
+This file contains a pure-Python streaming exporter for the NBA database.
+It walks each table with an unbuffered (server-side) cursor inside a
+consistent snapshot and writes batched multi-row INSERT statements, CSV or
+Parquet to compressed files, so it works without the mysqldump binary.
+It accepts any DB-API connection, so a local SQLite database can stand in
+for MySQL.
+"""
+
+import io
+import os
+import csv
+import math
+import sqlite3
+import decimal
+import datetime
+import mysql.connector
+from src.utils.config import DB_CONFIG, BACKUP_COMPRESSION, EXPORT_BATCH_SIZE
+from src.utils.compression import (
+    COMPRESSION_SUFFIXES,
+    HashingWriter,
+    open_compressed_writer,
+    close_compressed_writer
+)
+
+EXPORT_FORMATS = ['sql', 'csv', 'parquet']
+
+SQL_ESCAPES = {
+    '\\': '\\\\',
+    "'": "\\'",
+    '\0': '\\0',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\x1a': '\\Z'
+}
+
+
+def get_dialect(connection):
+    """
+    Determines whether a connection points at SQLite or MySQL
+    """
+    if isinstance(connection, sqlite3.Connection):
+        return 'sqlite'
+    return 'mysql'
+
+
+def quote_identifier(name):
+    """
+    Quotes a table or column name with backticks
+    """
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+def sql_literal(value):
+    """
+    Renders a Python value as a MySQL literal
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return 'NULL'
+        return repr(value)
+    if isinstance(value, (int, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "X'" + bytes(value).hex() + "'"
+    if isinstance(value, datetime.datetime):
+        return "'" + value.isoformat(sep=' ') + "'"
+    if isinstance(value, (datetime.date, datetime.time)):
+        return "'" + value.isoformat() + "'"
+    if isinstance(value, datetime.timedelta):
+        return "'" + str(value) + "'"
+    text = str(value)
+    return "'" + ''.join(SQL_ESCAPES.get(c, c) for c in text) + "'"
+
+
+def begin_snapshot(connection, dialect):
+    """
+    Starts a read transaction so every table is exported from the same point in time
+    """
+    cursor = connection.cursor()
+    if dialect == 'mysql':
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    else:
+        cursor.execute("BEGIN")
+    cursor.close()
+
+
+def list_tables(connection, dialect):
+    """
+    Lists the tables to export
+    """
+    cursor = connection.cursor()
+    if dialect == 'mysql':
+        cursor.execute("SHOW TABLES")
+    else:
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+            ORDER BY name
+        """)
+    tables = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return tables
+
+
+def table_ddl(connection, table_name, dialect):
+    """
+    Gets the CREATE TABLE statement for a table
+    """
+    cursor = connection.cursor()
+    if dialect == 'mysql':
+        cursor.execute(f"SHOW CREATE TABLE {quote_identifier(table_name)}")
+        ddl = cursor.fetchone()[1]
+    else:
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table_name,))
+        ddl = cursor.fetchone()[0]
+    cursor.close()
+    return ddl
+
+
+def stream_query_batches(connection, sql_query, params=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields (column_names, rows) batches of a query's rows from an unbuffered cursor so memory stays constant
+    An empty result yields one empty batch, so writers still get the column names
+    """
+    cursor = connection.cursor()
+    try:
+        if params is None:
+            cursor.execute(sql_query)
+        else:
+            cursor.execute(sql_query, params)
+        column_names = [desc[0] for desc in cursor.description]
+        row_count = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                if row_count == 0:
+                    yield column_names, []
+                break
+            row_count += len(rows)
+            yield column_names, rows
+    finally:
+        cursor.close()
+
+
+def stream_table_batches(connection, table_name, batch_size):
+    """
+    Yields (column_names, rows) batches of a whole table
+    """
+    return stream_query_batches(connection, f"SELECT * FROM {quote_identifier(table_name)}", None, batch_size)
+
+
+def write_table_sql(connection, table_name, writer, dialect, batch_size):
+    """
+    Writes DDL and batched multi-row INSERT statements for a table to a binary writer
+    """
+    ddl = table_ddl(connection, table_name, dialect)
+    writer.write(
+        f"DROP TABLE IF EXISTS {quote_identifier(table_name)};\n{ddl};\n\n".encode('utf-8'))
+
+    row_count = 0
+    for column_names, rows in stream_table_batches(connection, table_name, batch_size):
+        if not rows:
+            continue
+        columns = ', '.join(quote_identifier(col) for col in column_names)
+        values = ',\n'.join(
+            '(' + ', '.join(sql_literal(value) for value in row) + ')'
+            for row in rows)
+        writer.write(
+            f"INSERT INTO {quote_identifier(table_name)} ({columns}) VALUES\n{values};\n".encode('utf-8'))
+        row_count += len(rows)
+
+    writer.write(b"\n")
+    return row_count
+
+
+def write_csv_batches(batches, writer):
+    """
+    Writes (column_names, rows) batches as CSV with a header row to a binary writer
+    """
+    row_count = 0
+    header_written = False
+    for column_names, rows in batches:
+        buffer = io.StringIO()
+        csv_writer = csv.writer(buffer)
+        if not header_written:
+            csv_writer.writerow(column_names)
+            header_written = True
+        csv_writer.writerows(rows)
+        writer.write(buffer.getvalue().encode('utf-8'))
+        row_count += len(rows)
+
+    return row_count
+
+
+def write_parquet_batches(batches, sink):
+    """
+    Writes (column_names, rows) batches to Parquet (a path or binary file) one row group per batch
+    An empty result still writes a file with its columns (typed null, since there are no values)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_writer = None
+    row_count = 0
+    try:
+        for column_names, rows in batches:
+            columns = list(zip(*rows)) or [[] for _ in column_names]
+            batch = pa.table({
+                name: list(values) for name, values in zip(column_names, columns)})
+            if parquet_writer is None:
+                parquet_writer = pq.ParquetWriter(sink, batch.schema, compression='zstd')
+            parquet_writer.write_table(batch.cast(parquet_writer.schema))
+            row_count += len(rows)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    return row_count
+
+
+def write_table_csv(connection, table_name, writer, batch_size):
+    """
+    Writes a table as CSV with a header row to a binary writer
+    """
+    return write_csv_batches(stream_table_batches(connection, table_name, batch_size), writer)
+
+
+def write_table_parquet(connection, table_name, path, batch_size):
+    """
+    Writes a table to a Parquet file one row group per batch
+    """
+    return write_parquet_batches(stream_table_batches(connection, table_name, batch_size), path)
+
+
+def export_table(connection, table_name, export_dir, fmt='sql',
+                 compression=None, batch_size=None, dialect=None):
+    """
+    Exports one table to its own (compressed) file, returns a manifest entry
+    """
+    compression = compression or BACKUP_COMPRESSION
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    dialect = dialect or get_dialect(connection)
+
+    if fmt == 'parquet':
+        filename = f"{table_name}.parquet"
+        filepath = os.path.join(export_dir, filename)
+        row_count = write_table_parquet(connection, table_name, filepath, batch_size)
+        return {
+            "file": filename,
+            "rows": row_count,
+            "bytes": os.path.getsize(filepath)
+        }
+
+    filename = f"{table_name}.{fmt}{COMPRESSION_SUFFIXES[compression]}"
+    filepath = os.path.join(export_dir, filename)
+    with open(filepath, 'wb') as raw_file:
+        hashing_file = HashingWriter(raw_file)
+        writer = open_compressed_writer(hashing_file, compression)
+        if fmt == 'csv':
+            row_count = write_table_csv(connection, table_name, writer, batch_size)
+        else:
+            writer.write(b"SET FOREIGN_KEY_CHECKS = 0;\n\n")
+            row_count = write_table_sql(
+                connection, table_name, writer, dialect, batch_size)
+            writer.write(b"SET FOREIGN_KEY_CHECKS = 1;\n")
+        close_compressed_writer(writer, hashing_file)
+
+    return {
+        "file": filename,
+        "rows": row_count,
+        "sha256": hashing_file.sha256.hexdigest(),
+        "bytes": os.path.getsize(filepath)
+    }
+
+
+def export_database(export_dir, connection=None, fmt='sql', compression=None,
+                    batch_size=None, tables=None):
+    """
+    Exports every table inside a single consistent snapshot
+    Connects to the configured MySQL database if no connection is given
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    owns_connection = connection is None
+    if owns_connection:
+        connection = mysql.connector.connect(**DB_CONFIG)
+
+    dialect = get_dialect(connection)
+    os.makedirs(export_dir, exist_ok=True)
+    try:
+        begin_snapshot(connection, dialect)
+        tables = tables or list_tables(connection, dialect)
+
+        exported = {}
+        for table_name in tables:
+            exported[table_name] = export_table(
+                connection, table_name, export_dir, fmt=fmt,
+                compression=compression, batch_size=batch_size, dialect=dialect)
+            print(f"Exported {table_name} ({exported[table_name]['rows']} rows)")
+
+        connection.rollback()
+        return exported
+    finally:
+        if owns_connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Export the NBA database without mysqldump")
+    parser.add_argument("export_dir")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default='sql')
+    parser.add_argument("--compression", choices=list(COMPRESSION_SUFFIXES))
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+
+    export_database(
+        args.export_dir,
+        fmt=args.format,
+        compression=args.compression,
+        batch_size=args.batch_size)
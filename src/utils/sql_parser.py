@@ -0,0 +1,754 @@
+"""
+sql_parser.py
+
+This file contains a small MySQL tokenizer and parser used to validate
+generated SQL. A single pass over the tokens classifies the statement,
+counts statements, and collects the referenced tables, aliases and columns,
+plus a literal-free fingerprint. Parse results are memoized so validation,
+execution and caching share one parse per query string.
+"""
+
+import re
+from functools import lru_cache
+from src.utils.config import SQL_PARSE_CACHE_SIZE
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<quoted>`(?:[^`]|``)+`)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+)
+  | (?P<placeholder>%s|\?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<op><=>|<=|>=|<>|!=|\|\||&&|:=|->>|->|[-+*/%=<>!(),.;~^&|@:])
+""", re.VERBOSE | re.DOTALL)
+
+STATEMENT_TYPES = {
+    'SELECT': 'SELECT', 'WITH': 'SELECT', 'INSERT': 'INSERT', 'REPLACE': 'INSERT',
+    'UPDATE': 'UPDATE', 'DELETE': 'DELETE', 'SHOW': 'SHOW', 'DESCRIBE': 'DESCRIBE',
+    'DESC': 'DESCRIBE', 'EXPLAIN': 'EXPLAIN'
+}
+
+# Type keywords whose parenthesized lengths must stay literal (DECIMAL(5, 1))
+TYPE_KEYWORDS = {'DECIMAL', 'NUMERIC', 'CHAR', 'VARCHAR', 'BINARY', 'DOUBLE', 'FLOAT', 'DATETIME', 'TIME', 'TIMESTAMP'}
+
+# Keywords that end a GROUP BY list
+GROUP_END = {'HAVING', 'ORDER', 'LIMIT', 'WINDOW', 'UNION', 'WITH'}
+
+# Tokens that can follow a positional ORDER BY / GROUP BY item
+POSITION_END = {'', ',', ';', ')', 'ASC', 'DESC', 'ORDER', 'LIMIT', 'HAVING', 'WITH', 'UNION', 'WINDOW'}
+
+# Aggregate functions (a SELECT using one returns grouped rows)
+AGGREGATE_FUNCTIONS = {
+    'COUNT', 'SUM', 'AVG', 'MIN', 'MAX', 'GROUP_CONCAT', 'STD', 'STDDEV', 'STDDEV_POP',
+    'STDDEV_SAMP', 'VARIANCE', 'VAR_POP', 'VAR_SAMP', 'BIT_AND', 'BIT_OR', 'BIT_XOR',
+    'JSON_ARRAYAGG', 'JSON_OBJECTAGG'
+}
+
+# Keywords that stop a SELECT from being paged by key
+NOT_KEYSET_KEYWORDS = {
+    'JOIN', 'UNION', 'GROUP', 'HAVING', 'DISTINCT', 'DISTINCTROW', 'WINDOW', 'OVER',
+    'ORDER', 'OFFSET', 'FOR', 'LOCK', 'INTO', 'WITH'
+}
+
+# Keywords that introduce a table reference
+TABLE_KEYWORDS = {'FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE'}
+
+# Keywords that end a FROM list of comma-separated tables
+CLAUSE_KEYWORDS = {
+    'WHERE', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'ON', 'USING', 'SET', 'VALUES',
+    'UNION', 'WINDOW', 'JOIN', 'INNER', 'LEFT', 'RIGHT', 'CROSS', 'NATURAL',
+    'STRAIGHT_JOIN', 'FOR', 'LOCK', 'INTO', 'SELECT', 'OUTER', 'PARTITION'
+}
+
+SQL_KEYWORDS = CLAUSE_KEYWORDS | TABLE_KEYWORDS | set(STATEMENT_TYPES) | {
+    'ALL', 'AND', 'ANY', 'AS', 'ASC', 'BETWEEN', 'BINARY', 'BOTH', 'BY', 'CASE',
+    'CHAR', 'CHARACTER', 'COLLATE', 'COLUMNS', 'CURRENT', 'CURRENT_DATE',
+    'CURRENT_TIME', 'CURRENT_TIMESTAMP', 'DATABASES', 'DATE', 'DATETIME', 'DAY',
+    'DECIMAL', 'DEFAULT', 'DISTINCT', 'DISTINCTROW', 'DIV', 'DOUBLE', 'DUPLICATE',
+    'ELSE', 'END', 'ESCAPE', 'EXISTS', 'FALSE', 'FIELDS', 'FIRST', 'FLOAT',
+    'FOLLOWING', 'FORMAT', 'FULL', 'HOUR', 'IGNORE', 'IN', 'INDEX', 'INDEXES',
+    'INT', 'INTEGER', 'INTERVAL', 'IS', 'JSON', 'KEY', 'KEYS', 'LAST', 'LEADING',
+    'LIKE', 'MINUTE', 'MOD', 'MODE', 'MONTH', 'NOT', 'NULL', 'NULLS', 'OF',
+    'OFFSET', 'OR', 'OVER', 'PRECEDING', 'QUARTER', 'RECURSIVE', 'REGEXP', 'RLIKE',
+    'ROLLUP', 'ROW', 'ROWS', 'SECOND', 'SEPARATOR', 'SHARE', 'SIGNED', 'SOUNDS',
+    'STATUS', 'TABLES', 'THEN', 'TIME', 'TIMESTAMP', 'TO', 'TRAILING', 'TRUE',
+    'UNBOUNDED', 'UNKNOWN', 'UNSIGNED', 'VARCHAR', 'WEEK', 'WHEN', 'XOR', 'YEAR',
+    'ANALYZE', 'EXTENDED', 'TREE', 'VARIABLES', 'PROCESSLIST', 'DROP', 'TRUNCATE',
+    'ALTER', 'GRANT', 'REVOKE', 'CREATE', 'RENAME', 'CALL', 'LOAD', 'HANDLER'
+}
+
+
+def tokenize(sql_query):
+    """
+    Splits a query into (kind, value) tokens, dropping whitespace and comments
+    Raises ValueError on characters that do not start a valid token (e.g. an unterminated string)
+    """
+    tokens = []
+    position = 0
+    while position < len(sql_query):
+        match = TOKEN_PATTERN.match(sql_query, position)
+        if not match:
+            raise ValueError(f"Unexpected character at position {position}: {sql_query[position:position + 10]!r}")
+        kind = match.lastgroup
+        if kind not in ('ws', 'comment'):
+            value = match.group()
+            if kind == 'quoted':
+                kind, value = 'identifier', value[1:-1].replace('``', '`')
+            elif kind == 'word':
+                kind = 'keyword' if value.upper() in SQL_KEYWORDS else 'identifier'
+            tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def split_statements(tokens):
+    """
+    Splits tokens on semicolons, dropping empty statements
+    """
+    statements = [[]]
+    for token in tokens:
+        if token == ('op', ';'):
+            statements.append([])
+        else:
+            statements[-1].append(token)
+    return [statement for statement in statements if statement]
+
+
+def fingerprint_tokens(tokens):
+    """
+    Builds a literal-free fingerprint ("SELECT ... WHERE id = ?") so queries that
+    differ only in their values share a key
+    """
+    parts = []
+    for kind, value in tokens:
+        if kind in ('string', 'number', 'placeholder'):
+            parts.append('?')
+        elif kind == 'keyword':
+            parts.append(value.upper())
+        elif kind == 'identifier':
+            parts.append(value.lower())
+        else:
+            parts.append(value)
+    fingerprint = ' '.join(parts)
+    return re.sub(r'\( \?(?: , \?)+ \)', '( ?+ )', fingerprint)
+
+
+def ends_expression(token):
+    """
+    Checks whether a token can end a select-list expression, so an identifier after it is an alias
+    """
+    kind, value = token
+    return kind in ('identifier', 'number', 'string') or token == ('op', ')') \
+        or (kind == 'keyword' and value.upper() == 'END')
+
+
+def analyze_statement(tokens):
+    """
+    Walks one statement's tokens and collects tables, aliases, columns and top-level clauses
+    """
+    tables = []
+    aliases = {}
+    columns = []
+    select_aliases = set()
+    ctes = set()
+    derived = False
+    has_limit = False
+    has_from = False
+    has_where = False
+
+    first = tokens[0][1].upper() if tokens else ''
+    in_cte_header = first == 'WITH'
+    paren_stack = []
+    in_from_list = False
+    expect_table = first in ('DESCRIBE', 'DESC')
+    alias_for = None
+    select_alias_next = False
+    select_depths = []
+    index = 1 if expect_table else 0
+
+    while index < len(tokens):
+        kind, value = tokens[index]
+        upper = value.upper()
+        next_token = tokens[index + 1] if index + 1 < len(tokens) else (None, '')
+        after_next = tokens[index + 2] if index + 2 < len(tokens) else (None, '')
+        depth = len(paren_stack)
+
+        if kind == 'op' and value == '(':
+            if expect_table:
+                paren_stack.append('derived')
+            elif index and tokens[index - 1][0] == 'identifier':
+                # A function call: a FROM in its arguments (EXTRACT(YEAR FROM d), TRIM(x FROM s)) isn't a table list
+                paren_stack.append('call')
+            else:
+                paren_stack.append('other')
+            derived = derived or expect_table
+            expect_table = False
+            alias_for = None
+        elif kind == 'op' and value == ')':
+            closed = paren_stack.pop() if paren_stack else 'other'
+            alias_for = 'derived' if closed == 'derived' else None
+            while select_depths and select_depths[-1] > len(paren_stack):
+                select_depths.pop()
+        elif kind == 'op' and value == ',':
+            alias_for = None
+            expect_table = in_from_list and not paren_stack
+        elif kind == 'keyword':
+            if upper == 'AS':
+                select_alias_next = alias_for is None and not in_cte_header
+            else:
+                alias_for = None
+                select_alias_next = False
+            if upper in TABLE_KEYWORDS and (upper != 'TABLE' or first == 'SHOW') \
+                    and not (paren_stack and paren_stack[-1] == 'call'):
+                expect_table = True
+                in_from_list = upper == 'FROM'
+                has_from = has_from or upper == 'FROM'
+            elif upper in CLAUSE_KEYWORDS:
+                in_from_list = False
+                expect_table = False
+            if select_depths and select_depths[-1] == depth and (upper in CLAUSE_KEYWORDS or upper == 'FROM'):
+                select_depths.pop()
+            if upper == 'SELECT':
+                select_depths.append(depth)
+            if depth == 0 and upper == 'SELECT':
+                in_cte_header = False
+            if depth == 0 and upper == 'LIMIT':
+                has_limit = True
+            if upper == 'WHERE':
+                has_where = True
+        elif kind == 'identifier':
+            if in_cte_header and depth == 0:
+                ctes.add(value.lower())
+            elif expect_table:
+                if next_token == ('op', '.') and after_next[0] == 'identifier':
+                    value = after_next[1]
+                    index += 2
+                tables.append(value.lower())
+                aliases[value.lower()] = value.lower()
+                expect_table = False
+                alias_for = value.lower()
+            elif alias_for is not None:
+                aliases[value.lower()] = None if alias_for == 'derived' else alias_for
+                alias_for = None
+            elif select_alias_next:
+                select_aliases.add(value.lower())
+                select_alias_next = False
+            elif select_depths and select_depths[-1] == depth and ends_expression(tokens[index - 1]) \
+                    and (next_token[0] is None or next_token in (('op', ','), ('op', ')'))
+                         or next_token[1].upper() == 'FROM'):
+                # An alias without AS: "AVG(PTS) avg_pts," / "YEAR(GAME_DATE) yr FROM"
+                select_aliases.add(value.lower())
+            elif next_token == ('op', '(') or tokens[index - 1] == ('op', '@'):
+                pass
+            elif next_token == ('op', '.'):
+                if after_next[0] == 'identifier':
+                    columns.append((value.lower(), after_next[1].lower()))
+                index += 3
+                continue
+            else:
+                columns.append((None, value.lower()))
+        index += 1
+
+    for cte in ctes:
+        aliases[cte] = None
+    return {
+        "tables": tuple(table for table in dict.fromkeys(tables) if table not in ctes),
+        "aliases": aliases,
+        "columns": tuple(dict.fromkeys(columns)),
+        "select_aliases": tuple(sorted(select_aliases)),
+        "derived": derived or bool(ctes),
+        "has_limit": has_limit,
+        "has_from": has_from,
+        "has_where": has_where
+    }
+
+
+@lru_cache(maxsize=SQL_PARSE_CACHE_SIZE)
+def parse_sql(sql_query):
+    """
+    Parses a query once and returns a dict describing it (shared between callers, treat as read-only):
+    statement_type, statement_count, tables, aliases, columns, select_aliases,
+    derived, has_limit, has_from, has_where, keywords, fingerprint, normalized, error
+    """
+    try:
+        tokens = tokenize(sql_query)
+    except ValueError as e:
+        return {"statement_type": None, "statement_count": 0, "error": str(e)}
+
+    statements = split_statements(tokens)
+    if not statements:
+        return {"statement_type": None, "statement_count": 0, "error": "Empty query"}
+
+    statement = statements[0]
+    first_kind, first_value = statement[0]
+    first = first_value.upper()
+    if first_value == '(':
+        statement_type = 'SELECT'
+    else:
+        statement_type = STATEMENT_TYPES.get(first, first if first_kind == 'keyword' else None)
+
+    parsed = analyze_statement(statement)
+    parsed.update({
+        "statement_type": statement_type,
+        "statement_count": len(statements),
+        "keywords": frozenset(value.upper() for kind, value in tokens if kind == 'keyword'),
+        "fingerprint": fingerprint_tokens(statement),
+        "normalized": ' '.join(value for _, value in statement),
+        "error": None
+    })
+    return parsed
+
+
+def check_references(parsed, schema):
+    """
+    Checks the parsed tables and columns against a {table: set(columns)} schema (lowercase names)
+    Returns a list of error messages, empty if every reference exists
+    """
+    if not schema or parsed["statement_type"] in ('SHOW', 'DESCRIBE'):
+        return []
+
+    errors = [f"Unknown table: {table}" for table in parsed["tables"] if table not in schema]
+    known_tables = [table for table in parsed["tables"] if table in schema]
+    if errors or not known_tables:
+        return errors
+
+    visible_columns = set().union(*(schema[table] for table in known_tables))
+    for qualifier, column in parsed["columns"]:
+        if qualifier is not None:
+            table = parsed["aliases"].get(qualifier, qualifier if qualifier in schema else None)
+            if table in schema and column not in schema[table]:
+                errors.append(f"Unknown column: {qualifier}.{column}")
+        elif not parsed["derived"] and column not in visible_columns \
+                and column not in parsed["select_aliases"]:
+            errors.append(f"Unknown column: {column}")
+    return errors
+
+
+def bound_select(sql_query, parsed, limit):
+    """
+    Appends a LIMIT to a SELECT that reads from a table without one
+    Returns the query unchanged if it is already bounded
+    """
+    if parsed["statement_type"] != 'SELECT' or parsed["has_limit"] or not parsed["has_from"]:
+        return sql_query
+    return f"{sql_query.strip().rstrip(';').rstrip()} LIMIT {int(limit)}"
+
+
+def add_optimizer_hint(sql_query, hint):
+    """
+    Inserts an optimizer hint comment after the top-level SELECT keyword
+    (after any WITH clause), leaving queries that already carry a hint unchanged
+    """
+    depth = 0
+    position = 0
+    while position < len(sql_query):
+        match = TOKEN_PATTERN.match(sql_query, position)
+        if not match:
+            return sql_query
+        value = match.group()
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        elif depth == 0 and match.lastgroup == 'word' and value.upper() == 'SELECT':
+            rest = sql_query[match.end():]
+            if rest.lstrip().startswith('/*+'):
+                return sql_query
+            return f"{sql_query[:match.end()]} /*+ {hint} */{rest}"
+        position = match.end()
+    return sql_query
+
+
+
+def literal_value(tokens):
+    """
+    Converts a literal's tokens (a VALUES item or a query parameter) to a Python value
+    Returns None for NULL or anything that isn't a plain literal
+    """
+    if len(tokens) == 2 and tokens[0] == ('op', '-') and tokens[1][0] == 'number':
+        return -literal_value(tokens[1:])
+    if len(tokens) != 1:
+        return None
+    kind, value = tokens[0]
+    if kind == 'string':
+        quote = value[0]
+        return re.sub(r'\\(.)', r'\1', value[1:-1].replace(quote * 2, quote))
+    if kind == 'number':
+        return int(value) if value.isdigit() else float(value)
+    return None
+
+
+def dml_target(sql_query):
+    """
+    Finds the target table, the WHERE clause text and any inserted values of an INSERT, UPDATE or DELETE
+    Returns {"statement_type", "table", "where", "insert_columns", "insert_rows"}, or None for other
+    statements and multi-table modifications
+    """
+    parsed = parse_sql(sql_query)
+    if parsed["error"] or parsed["statement_type"] not in ('INSERT', 'UPDATE', 'DELETE') \
+            or len(parsed["tables"]) != 1:
+        return None
+
+    target = {
+        "statement_type": parsed["statement_type"],
+        "table": parsed["tables"][0],
+        "where": None,
+        "insert_columns": [],
+        "insert_rows": []
+    }
+    depth = 0
+    position = 0
+    where_start = None
+    where_end = len(sql_query)
+    clause = None
+    row = None
+    item = []
+    while position < len(sql_query):
+        match = TOKEN_PATTERN.match(sql_query, position)
+        kind, value = match.lastgroup, match.group()
+        position = match.end()
+        if kind in ('ws', 'comment'):
+            continue
+        if kind == 'quoted':
+            kind, value = 'identifier', value[1:-1].replace('``', '`')
+        upper = value.upper()
+
+        if value == ';' and depth == 0:
+            where_end = min(where_end, match.start())
+            break
+        if value == '(':
+            depth += 1
+            if depth == 1 and clause == 'values':
+                row, item = [], []
+            elif depth > 1 and row is not None:
+                item.append(('op', value))
+        elif value == ')':
+            depth -= 1
+            if depth == 0 and row is not None:
+                row.append(literal_value(item))
+                target["insert_rows"].append(row)
+                row = None
+            elif depth == 0 and clause == 'columns':
+                clause = None
+            elif row is not None:
+                item.append(('op', value))
+        elif depth == 1 and row is not None and value == ',':
+            row.append(literal_value(item))
+            item = []
+        elif row is not None:
+            item.append((kind, value))
+        elif depth == 1 and clause == 'columns' and kind in ('word', 'identifier'):
+            target["insert_columns"].append(value)
+        elif depth == 0 and kind == 'word' and upper == 'WHERE':
+            where_start = position
+        elif depth == 0 and kind == 'word' and upper in ('ORDER', 'LIMIT') and where_start is not None:
+            where_end = min(where_end, match.start())
+        elif depth == 0 and kind == 'word' and upper in ('VALUES', 'VALUE'):
+            clause = 'values'
+        elif depth == 0 and kind == 'word' and upper in ('SET', 'SELECT', 'ON'):
+            clause = None
+        elif depth == 0 and parsed["statement_type"] == 'INSERT' and clause is None \
+                and not target["insert_columns"] and value.lower() == target["table"]:
+            clause = 'columns'
+
+    if where_start is not None:
+        target["where"] = sql_query[where_start:where_end].strip()
+    return target
+
+
+def select_parts(sql_query):
+    """
+    Splits a single-table SELECT without ordering, grouping or aggregates into the text before its
+    WHERE clause, the WHERE clause and its row count LIMIT, so it can be paged by key
+    Returns {"table", "head", "where", "limit", "head_placeholders", "where_placeholders"}, or None
+    for anything else; limit is None, an int, or '%s' for a placeholder
+    """
+    parsed = parse_sql(sql_query)
+    if parsed["error"] or parsed["statement_type"] != 'SELECT' or parsed["statement_count"] != 1 \
+            or len(parsed["tables"]) != 1 or parsed["derived"] or parsed["keywords"] & NOT_KEYSET_KEYWORDS:
+        return None
+
+    tokens = []
+    position = 0
+    while position < len(sql_query):
+        match = TOKEN_PATTERN.match(sql_query, position)
+        if match.lastgroup not in ('ws', 'comment'):
+            tokens.append((match.lastgroup, match.group(), match.start(), match.end()))
+        position = match.end()
+
+    depth = 0
+    where_keyword = None
+    limit_keyword = None
+    end = len(sql_query)
+    for index, (kind, value, start, _) in enumerate(tokens):
+        following = tokens[index + 1][1] if index + 1 < len(tokens) else ''
+        if kind == 'word' and value.upper() in AGGREGATE_FUNCTIONS and following == '(':
+            return None
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        elif value == ';' and depth == 0:
+            end = start
+            break
+        elif depth == 0 and kind == 'word' and value.upper() == 'WHERE':
+            where_keyword = index
+        elif depth == 0 and kind == 'word' and value.upper() == 'LIMIT':
+            limit_keyword = index
+
+    limit = None
+    limit_start = end
+    if limit_keyword is not None:
+        limit_tokens = [token for token in tokens[limit_keyword + 1:] if token[2] < end]
+        if len(limit_tokens) != 1 or limit_tokens[0][0] not in ('number', 'placeholder'):
+            return None
+        limit = '%s' if limit_tokens[0][0] == 'placeholder' else literal_value([limit_tokens[0][:2]])
+        limit_start = tokens[limit_keyword][2]
+
+    head_end = tokens[where_keyword][2] if where_keyword is not None else limit_start
+    placeholders = [start for kind, _, start, _ in tokens if kind == 'placeholder']
+    return {
+        "table": parsed["tables"][0],
+        "head": sql_query[:head_end].strip(),
+        "where": sql_query[tokens[where_keyword][3]:limit_start].strip() if where_keyword is not None else None,
+        "limit": limit,
+        "head_placeholders": sum(start < head_end for start in placeholders),
+        "where_placeholders": sum(head_end <= start < limit_start for start in placeholders)
+    }
+
+
+# Comparison operators an index can serve, by the kind of lookup they make
+EQUALITY_OPERATORS = {'=', '<=>', 'IN', 'IS'}
+RANGE_OPERATORS = {'<', '>', '<=', '>=', 'BETWEEN', 'LIKE'}
+MIRRORED_OPERATORS = {'<': '>', '>': '<', '<=': '>=', '>=': '<=', '=': '=', '<=>': '<=>'}
+
+
+def predicate_columns(sql_query):
+    """
+    Finds the columns a SELECT compares in WHERE (split into equality and range lookups), joins ON,
+    and groups and sorts by, so the index advisor can suggest indexes for them
+    Returns {"equality", "range", "join", "group", "order"}, each a list of (table, column) with
+    lowercase names (table is None for unqualified columns of multi-table queries), or None if the
+    query isn't a parseable SELECT; columns wrapped in functions are skipped since no index serves them
+    """
+    parsed = parse_sql(sql_query)
+    if parsed["error"] or parsed["statement_type"] != 'SELECT':
+        return None
+
+    tokens = split_statements(tokenize(sql_query))[0]
+    aliases = parsed["aliases"]
+    only_table = parsed["tables"][0] if len(parsed["tables"]) == 1 else None
+    select_aliases = set(parsed["select_aliases"])
+    usage = {"equality": [], "range": [], "join": [], "group": [], "order": []}
+    clause = None
+
+    def column_at(index):
+        kind, value = tokens[index] if 0 <= index < len(tokens) else (None, '')
+        if kind != 'identifier' or (index > 0 and tokens[index - 1] == ('op', '.')):
+            return None, index
+        following = tokens[index + 1] if index + 1 < len(tokens) else (None, '')
+        if following == ('op', '('):
+            return None, index
+        if following == ('op', '.'):
+            if index + 2 >= len(tokens) or tokens[index + 2][0] != 'identifier' \
+                    or aliases.get(value.lower()) is None:
+                return None, index + 2
+            return (aliases[value.lower()], tokens[index + 2][1].lower()), index + 3
+        if value.lower() in select_aliases and clause in ('group', 'order'):
+            return None, index + 1
+        return (only_table, value.lower()), index + 1
+
+    index = 0
+    while index < len(tokens):
+        kind, value = tokens[index]
+        upper = value.upper()
+        if kind == 'keyword' and upper in ('WHERE', 'ON', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'SELECT',
+                                           'FROM', 'JOIN', 'UNION', 'WINDOW', 'USING'):
+            clause = {'WHERE': 'where', 'ON': 'join', 'GROUP': 'group', 'ORDER': 'order'}.get(upper)
+            index += 1
+            continue
+
+        column, after = column_at(index) if clause else (None, index)
+        if column is None:
+            index = max(after, index + 1)
+            continue
+
+        if clause in ('group', 'order'):
+            usage[clause].append(column)
+        else:
+            operator = tokens[after][1].upper() if after < len(tokens) else ''
+            before = tokens[index - 1][1].upper() if index else ''
+            if operator not in EQUALITY_OPERATORS | RANGE_OPERATORS and before in MIRRORED_OPERATORS \
+                    and index > 1 and tokens[index - 2][0] in ('number', 'string', 'placeholder'):
+                operator = MIRRORED_OPERATORS[before]
+            other, _ = column_at(after + 1) if operator in EQUALITY_OPERATORS | RANGE_OPERATORS else (None, after)
+            if clause == 'join' or (other is not None and operator == '='):
+                usage["join"].append(column)
+                if other is not None:
+                    usage["join"].append(other)
+                    after += 2
+            elif operator in EQUALITY_OPERATORS:
+                usage["equality"].append(column)
+            elif operator in RANGE_OPERATORS:
+                usage["range"].append(column)
+        index = after
+
+    return {key: list(dict.fromkeys(columns)) for key, columns in usage.items()}
+
+
+def split_sql(sql_query):
+    """
+    Splits a script into its statements' source text, ignoring semicolons inside strings and comments
+    """
+    statements = []
+    start = 0
+    position = 0
+    while position < len(sql_query):
+        match = TOKEN_PATTERN.match(sql_query, position)
+        if not match:
+            raise ValueError(f"Unexpected character at position {position}: {sql_query[position:position + 10]!r}")
+        if match.group() == ';':
+            statements.append(sql_query[start:match.start()])
+            start = match.end()
+        position = match.end()
+    statements.append(sql_query[start:])
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def parameterize(sql_query):
+    """
+    Replaces string and number literals with %s placeholders
+    Positional ORDER BY / GROUP BY numbers and type lengths (DECIMAL(5, 1)) stay literal since a
+    placeholder would change their meaning; so do literals of grouped expressions (see grouped_literals)
+    and the operands of %, which would otherwise sit next to a placeholder in a DELETE run unprepared
+    Returns (skeleton, params); queries that already contain placeholders come back unchanged with params None
+    """
+    tokens = []
+    spans = []
+    position = 0
+    while position < len(sql_query):
+        match = TOKEN_PATTERN.match(sql_query, position)
+        if not match:
+            raise ValueError(f"Unexpected character at position {position}: {sql_query[position:position + 10]!r}")
+        if match.lastgroup == 'placeholder':
+            return sql_query, None
+        if match.lastgroup not in ('ws', 'comment'):
+            tokens.append((match.lastgroup, match.group()))
+            spans.append(match.span())
+        position = match.end()
+
+    parts = []
+    params = []
+    type_depths = []
+    depth = 0
+    position = 0
+    grouped = grouped_literals(tokens)
+    for index, (kind, value) in enumerate(tokens):
+        previous = tokens[index - 1][1].upper() if index else ''
+        following = tokens[index + 1][1].upper() if index + 1 < len(tokens) else ''
+        if value == '(':
+            depth += 1
+            if previous in TYPE_KEYWORDS:
+                type_depths.append(depth)
+        elif value == ')':
+            if type_depths and type_depths[-1] == depth:
+                type_depths.pop()
+            depth -= 1
+
+        positional = kind == 'number' and previous in ('BY', ',') and following in POSITION_END \
+            and by_list_open(tokens, index)
+        modulo = kind == 'number' and '%' in (previous, following)
+        if index in grouped or modulo:
+            continue
+        if kind == 'string' or (kind == 'number' and not type_depths and not positional):
+            start, end = spans[index]
+            parts.append(sql_query[position:start])
+            parts.append('%s')
+            params.append(literal_value([(kind, value)]))
+            position = end
+
+    if not params:
+        return sql_query.strip().rstrip(';').rstrip(), ()
+    parts.append(sql_query[position:])
+    return ''.join(parts).strip().rstrip(';').rstrip(), tuple(params)
+
+
+def grouped_literals(tokens):
+    """
+    Finds the literals of GROUP BY expressions (LEFT(DISPLAY_FIRST_LAST, 1)) and of every repeat of those
+    expressions elsewhere in the query, returning their token indexes
+    ONLY_FULL_GROUP_BY matches a select-list expression to the GROUP BY one only when both carry the
+    same literal; two separate placeholders don't match
+    """
+    items = []
+    for index in range(len(tokens) - 1):
+        if tokens[index][1].upper() != 'GROUP' or tokens[index + 1][1].upper() != 'BY':
+            continue
+        depth = 0
+        item = []
+        for kind, value in tokens[index + 2:]:
+            if depth == 0 and (value in (',', ';', ')') or value.upper() in GROUP_END):
+                items.append(item)
+                item = []
+                if value != ',':
+                    break
+                continue
+            if value == '(':
+                depth += 1
+            elif value == ')':
+                depth -= 1
+            item.append((kind, value.upper()))
+        if item:
+            items.append(item)
+
+    keys = [(kind, value.upper()) for kind, value in tokens]
+    grouped = set()
+    for item in items:
+        if len(item) < 2 or not any(kind in ('number', 'string') for kind, _ in item):
+            continue
+        for start in range(len(keys) - len(item) + 1):
+            if keys[start:start + len(item)] == item:
+                grouped.update(
+                    position for position in range(start, start + len(item))
+                    if keys[position][0] in ('number', 'string'))
+    return grouped
+
+
+def by_list_open(tokens, index):
+    """
+    Checks whether the token at index is an item of an ORDER BY or GROUP BY list
+    """
+    depth = 0
+    for position in range(index - 1, -1, -1):
+        value = tokens[position][1].upper()
+        if value == ')':
+            depth += 1
+        elif value == '(':
+            if depth == 0:
+                return False
+            depth -= 1
+        elif depth == 0 and value == 'BY':
+            return position > 0 and tokens[position - 1][1].upper() in ('ORDER', 'GROUP')
+        elif depth == 0 and value in CLAUSE_KEYWORDS:
+            return False
+    return False
+
+
+def render_sql(sql_query, params=None):
+    """
+    Fills %s placeholders with quoted literals for display (never for execution)
+    """
+    if not params:
+        return sql_query
+    values = iter(params)
+
+    def literal(_):
+        value = next(values, None)
+        if value is None:
+            return 'NULL'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+    return re.sub(r'%s', literal, sql_query)
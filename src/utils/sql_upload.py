@@ -10,7 +10,9 @@ from dotenv import load_dotenv
 import mysql.connector
 import pandas as pd
 from sqlalchemy import create_engine, exc as sqlalchemy_exc
-from src.utils.config import DB_CONFIG
+from src.utils.config import DB_CONFIG, SCHEMA_VERSION_PATH
+from src.utils.summary_tables import SUMMARY_TABLES, refresh_summary_tables
+from src.utils.data_validate import validate_staged_tables
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
@@ -25,14 +27,38 @@ TABLE_DATA = {
 }
 
 
-def validate_file_paths():
+def mark_schema_changed():
+    """
+    Touches the schema version marker so running apps reload their cached schema metadata
+    """
+    os.makedirs(os.path.dirname(SCHEMA_VERSION_PATH), exist_ok=True)
+    with open(SCHEMA_VERSION_PATH, 'a', encoding='utf-8'):
+        pass
+    os.utime(SCHEMA_VERSION_PATH, None)
+
+
+def invalidate_loaded_tables(table_names):
+    """
+    Records the load as a write, so every process treats the replica and the results it
+    cached before the load as stale, and drops this process's cached results for the tables
+    Imported here because the replica module reads the staged CSV files through this module
+    """
+    from src.services.replica import invalidate_replica
+    from src.services.query_cache import invalidate_tables
+
+    invalidate_replica()
+    invalidate_tables(table_names)
+
+
+def validate_file_paths(table_data=None):
     """
     Check if all required CSV files exist before proceeding
+    table_data ({table: csv path}) defaults to TABLE_DATA
     """
     all_files_exist = True
 
     print("Validating CSV file locations...")
-    for table_name, file_path in TABLE_DATA.items():
+    for table_name, file_path in (table_data or TABLE_DATA).items():
         if os.path.exists(file_path):
             print(f"{table_name} file exists: {os.path.basename(file_path)}")
         else:
@@ -179,46 +205,14 @@ def add_keys_and_relationships():
         return False
 
 
-def create_database():
+def load_table_dataframes(table_data=None):
     """
-    Creates a new MySQL database and tables using pandas
+    Reads the staged CSV files into DataFrames, removes duplicate rows and
+    fixes or drops rows with invalid team / player references
+    table_data ({table: csv path}) defaults to TABLE_DATA
     """
-    if not validate_file_paths():
-        print("Exiting due to missing files.")
-        return False
-
-    try:
-        conn = mysql.connector.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            port=DB_CONFIG['port']
-        )
-        cursor = conn.cursor()
-
-        cursor.execute(
-            f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
-        print(f"Database '{DB_CONFIG['database']}' created or already exists")
-
-        cursor.close()
-        conn.close()
-    except mysql.connector.Error as e:
-        print(f"Error connecting to MySQL server: {e}")
-        return False
-
-    if not drop_all_tables():
-        print("Failed to drop existing tables. Aborting.")
-        return False
-
-    try:
-        connection_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-        engine = create_engine(connection_str)
-    except sqlalchemy_exc.SQLAlchemyError as e:
-        print(f"Error creating SQLAlchemy engine: {e}")
-        return False
-
     dfs = {}
-    for table_name, csv_file in TABLE_DATA.items():
+    for table_name, csv_file in (table_data or TABLE_DATA).items():
         try:
             print(
                 f"\nLoading {table_name} data from {os.path.basename(csv_file)}...")
@@ -274,7 +268,7 @@ def create_database():
 
         except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
             print(f"Error processing {table_name}: {e}")
-            return False
+            return None
 
     try:
         if 'players' in dfs and 'teams' in dfs:
@@ -423,8 +417,16 @@ def create_database():
 
     except (ValueError, KeyError) as e:
         print(f"Error while fixing data inconsistencies: {e}")
-        return False
+        return None
+
+    return dfs
 
+
+def save_tables(dfs, engine):
+    """
+    Writes the loaded DataFrames to the database behind a SQLAlchemy engine,
+    parents before children, replacing any existing tables
+    """
     table_order = ['teams', 'players', 'box_score']
 
     for table_name in table_order:
@@ -446,13 +448,140 @@ def create_database():
             except sqlalchemy_exc.SQLAlchemyError as e:
                 print(f"Error saving {table_name} to database: {e}")
                 return False
+    return True
+
+
+def create_database():
+    """
+    Creates a new MySQL database and tables using pandas
+    """
+    if not validate_file_paths():
+        print("Exiting due to missing files.")
+        return False
 
-    if not add_keys_and_relationships():
-        print("Certain keys and relationships not added, but database created successfully")
+    if not validate_staged_tables(TABLE_DATA)["passed"]:
+        print("Exiting due to data-quality failures, see the validation report.")
         return False
 
-    print("\nDatabase setup complete with all relationships!")
-    return True
+    try:
+        conn = mysql.connector.connect(
+            host=DB_CONFIG['host'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            port=DB_CONFIG['port']
+        )
+        cursor = conn.cursor()
+
+        cursor.execute(
+            f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
+        print(f"Database '{DB_CONFIG['database']}' created or already exists")
+
+        cursor.close()
+        conn.close()
+    except mysql.connector.Error as e:
+        print(f"Error connecting to MySQL server: {e}")
+        return False
+
+    try:
+        connection_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+        engine = create_engine(connection_str)
+    except sqlalchemy_exc.SQLAlchemyError as e:
+        print(f"Error creating SQLAlchemy engine: {e}")
+        return False
+
+    if not drop_all_tables():
+        print("Failed to drop existing tables. Aborting.")
+        return False
+
+    # Every path from here on has changed the data, so the replica and cached results are stale
+    try:
+        dfs = load_table_dataframes()
+        if dfs is None:
+            return False
+
+        if not save_tables(dfs, engine):
+            return False
+
+        if not add_keys_and_relationships():
+            print("Certain keys and relationships not added, but database created successfully")
+            mark_schema_changed()
+            return False
+
+        print("\nBuilding summary tables...")
+        if not refresh_summary_tables():
+            print("Summary tables could not be built, queries will fall back to box_score")
+
+        mark_schema_changed()
+        print("\nDatabase setup complete with all relationships!")
+        return True
+    finally:
+        invalidate_loaded_tables([*TABLE_DATA, *SUMMARY_TABLES])
+
+
+def append_box_scores(csv_file):
+    """
+    Appends box score rows for newly played games and incrementally
+    refreshes the summary tables for just those games
+    The file goes through the same validation and reference repairs as a
+    full load, checked against the staged teams and players
+    """
+    table_data = {**TABLE_DATA, 'box_score': csv_file}
+    if not validate_file_paths(table_data):
+        return False
+
+    if not validate_staged_tables(table_data)["passed"]:
+        print("Not appending due to data-quality failures, see the validation report.")
+        return False
+
+    dfs = load_table_dataframes(table_data)
+    if dfs is None:
+        return False
+    df = dfs['box_score']
+
+    game_ids = [int(game_id) for game_id in df['GAME_ID'].unique()]
+    if not game_ids:
+        print("No box score rows to append.")
+        return True
+
+    try:
+        conn = connect_to_db()
+        cursor = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(game_ids))
+        cursor.execute(
+            f"SELECT DISTINCT GAME_ID FROM box_score WHERE GAME_ID IN ({placeholders})",
+            tuple(game_ids))
+        existing_ids = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+        conn.close()
+    except mysql.connector.Error as e:
+        print(f"Error checking existing games: {e}")
+        return False
+
+    new_game_ids = [game_id for game_id in game_ids if game_id not in existing_ids]
+    if not new_game_ids:
+        print("All games in this file are already loaded.")
+        return True
+
+    df = df[df['GAME_ID'].isin(new_game_ids)]
+    try:
+        connection_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+        engine = create_engine(connection_str)
+        df.to_sql(
+            name='box_score',
+            con=engine,
+            if_exists='append',
+            index=False,
+            chunksize=1000
+        )
+        print(f"Appended {len(df)} box score rows for {len(new_game_ids)} new games")
+    except sqlalchemy_exc.SQLAlchemyError as e:
+        print(f"Error appending box scores: {e}")
+        return False
+
+    refreshed = refresh_summary_tables(game_ids=new_game_ids)
+    invalidate_loaded_tables(['box_score', *SUMMARY_TABLES])
+    mark_schema_changed()
+    return refreshed
 
 
 def connect_to_db():
@@ -545,6 +674,9 @@ def example_query():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--append':
+        sys.exit(0 if append_box_scores(sys.argv[2]) else 1)
+
     SUCCESS = create_database()
     if SUCCESS:
         example_query()
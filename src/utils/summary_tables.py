@@ -0,0 +1,236 @@
+"""
+summary_tables.py
+
+This file contains the functions for building and incrementally refreshing
+the pre-aggregated summary tables (player season stats, team season stats
+and per-game team totals) that aggregate questions are answered from
+instead of scanning every box_score row. Each table lists its sources, the
+tables it reads (player names and teams are copied from players and teams)
+"""
+
+import mysql.connector
+from src.utils.config import DB_CONFIG
+
+SUMMARY_TABLES = {
+    'player_season_stats': {
+        'keys': ['PLAYER_ID', 'SEASON', 'SEASON_TYPE'],
+        'sources': ['box_score', 'players'],
+        'create': """
+            CREATE TABLE IF NOT EXISTS player_season_stats (
+                PLAYER_ID BIGINT NOT NULL,
+                SEASON VARCHAR(16) NOT NULL,
+                SEASON_TYPE VARCHAR(32) NOT NULL,
+                PLAYER_NAME VARCHAR(128),
+                TEAM_ID BIGINT,
+                GAMES_PLAYED INT,
+                PTS_TOTAL DOUBLE,
+                REB_TOTAL DOUBLE,
+                AST_TOTAL DOUBLE,
+                STL_TOTAL DOUBLE,
+                BLK_TOTAL DOUBLE,
+                TOV_TOTAL DOUBLE,
+                FGM_TOTAL DOUBLE,
+                FGA_TOTAL DOUBLE,
+                FG3M_TOTAL DOUBLE,
+                FG3A_TOTAL DOUBLE,
+                FTM_TOTAL DOUBLE,
+                FTA_TOTAL DOUBLE,
+                AVG_PTS DOUBLE,
+                AVG_REB DOUBLE,
+                AVG_AST DOUBLE,
+                AVG_STL DOUBLE,
+                AVG_BLK DOUBLE,
+                AVG_TOV DOUBLE,
+                AVG_PLUS_MINUS DOUBLE,
+                PRIMARY KEY (PLAYER_ID, SEASON, SEASON_TYPE),
+                INDEX idx_player_season_team (TEAM_ID),
+                INDEX idx_player_season_avg_pts (AVG_PTS)
+            )
+        """,
+        'select': """
+            SELECT
+                box_score.PLAYER_ID, box_score.SEASON, box_score.SEASON_TYPE,
+                MAX(players.DISPLAY_FIRST_LAST) AS PLAYER_NAME,
+                MAX(players.TEAM_ID) AS TEAM_ID,
+                COUNT(*) AS GAMES_PLAYED,
+                SUM(box_score.PTS) AS PTS_TOTAL, SUM(box_score.REB) AS REB_TOTAL,
+                SUM(box_score.AST) AS AST_TOTAL, SUM(box_score.STL) AS STL_TOTAL,
+                SUM(box_score.BLK) AS BLK_TOTAL, SUM(box_score.turnovers) AS TOV_TOTAL,
+                SUM(box_score.FGM) AS FGM_TOTAL, SUM(box_score.FGA) AS FGA_TOTAL,
+                SUM(box_score.FG3M) AS FG3M_TOTAL, SUM(box_score.FG3A) AS FG3A_TOTAL,
+                SUM(box_score.FTM) AS FTM_TOTAL, SUM(box_score.FTA) AS FTA_TOTAL,
+                AVG(box_score.PTS) AS AVG_PTS, AVG(box_score.REB) AS AVG_REB,
+                AVG(box_score.AST) AS AVG_AST, AVG(box_score.STL) AS AVG_STL,
+                AVG(box_score.BLK) AS AVG_BLK, AVG(box_score.turnovers) AS AVG_TOV,
+                AVG(box_score.PLUS_MINUS) AS AVG_PLUS_MINUS
+            FROM box_score
+            JOIN players ON players.PERSON_ID = box_score.PLAYER_ID
+            {where}
+            GROUP BY box_score.PLAYER_ID, box_score.SEASON, box_score.SEASON_TYPE
+        """
+    },
+    'team_season_stats': {
+        'keys': ['TEAM_ID', 'SEASON', 'SEASON_TYPE'],
+        'sources': ['box_score', 'teams'],
+        'create': """
+            CREATE TABLE IF NOT EXISTS team_season_stats (
+                TEAM_ID BIGINT NOT NULL,
+                SEASON VARCHAR(16) NOT NULL,
+                SEASON_TYPE VARCHAR(32) NOT NULL,
+                TEAM_NAME VARCHAR(64),
+                GAMES_PLAYED INT,
+                NUM_PLAYERS INT,
+                PTS_TOTAL DOUBLE,
+                REB_TOTAL DOUBLE,
+                AST_TOTAL DOUBLE,
+                AVG_PTS_PER_GAME DOUBLE,
+                AVG_REB_PER_GAME DOUBLE,
+                AVG_AST_PER_GAME DOUBLE,
+                AVG_PLAYER_PTS DOUBLE,
+                PRIMARY KEY (TEAM_ID, SEASON, SEASON_TYPE)
+            )
+        """,
+        'select': """
+            SELECT
+                box_score.TEAM_ID, box_score.SEASON, box_score.SEASON_TYPE,
+                MAX(teams.NICKNAME) AS TEAM_NAME,
+                COUNT(DISTINCT box_score.GAME_ID) AS GAMES_PLAYED,
+                COUNT(DISTINCT box_score.PLAYER_ID) AS NUM_PLAYERS,
+                SUM(box_score.PTS) AS PTS_TOTAL, SUM(box_score.REB) AS REB_TOTAL,
+                SUM(box_score.AST) AS AST_TOTAL,
+                SUM(box_score.PTS) * 1.0 / COUNT(DISTINCT box_score.GAME_ID) AS AVG_PTS_PER_GAME,
+                SUM(box_score.REB) * 1.0 / COUNT(DISTINCT box_score.GAME_ID) AS AVG_REB_PER_GAME,
+                SUM(box_score.AST) * 1.0 / COUNT(DISTINCT box_score.GAME_ID) AS AVG_AST_PER_GAME,
+                AVG(box_score.PTS) AS AVG_PLAYER_PTS
+            FROM box_score
+            JOIN teams ON teams.TEAM_ID = box_score.TEAM_ID
+            {where}
+            GROUP BY box_score.TEAM_ID, box_score.SEASON, box_score.SEASON_TYPE
+        """
+    },
+    'team_game_totals': {
+        'keys': ['GAME_ID', 'TEAM_ID'],
+        'sources': ['box_score'],
+        'create': """
+            CREATE TABLE IF NOT EXISTS team_game_totals (
+                GAME_ID BIGINT NOT NULL,
+                TEAM_ID BIGINT NOT NULL,
+                GAME_DATE VARCHAR(32),
+                SEASON VARCHAR(16),
+                SEASON_TYPE VARCHAR(32),
+                PLAYERS_USED INT,
+                PTS DOUBLE,
+                REB DOUBLE,
+                AST DOUBLE,
+                STL DOUBLE,
+                BLK DOUBLE,
+                TOV DOUBLE,
+                FGM DOUBLE,
+                FGA DOUBLE,
+                FG3M DOUBLE,
+                FG3A DOUBLE,
+                FTM DOUBLE,
+                FTA DOUBLE,
+                PRIMARY KEY (GAME_ID, TEAM_ID),
+                INDEX idx_team_game_team (TEAM_ID)
+            )
+        """,
+        'select': """
+            SELECT
+                box_score.GAME_ID, box_score.TEAM_ID,
+                MAX(box_score.GAME_DATE) AS GAME_DATE, MAX(box_score.SEASON) AS SEASON,
+                MAX(box_score.SEASON_TYPE) AS SEASON_TYPE,
+                COUNT(*) AS PLAYERS_USED,
+                SUM(box_score.PTS) AS PTS, SUM(box_score.REB) AS REB,
+                SUM(box_score.AST) AS AST, SUM(box_score.STL) AS STL,
+                SUM(box_score.BLK) AS BLK, SUM(box_score.turnovers) AS TOV,
+                SUM(box_score.FGM) AS FGM, SUM(box_score.FGA) AS FGA,
+                SUM(box_score.FG3M) AS FG3M, SUM(box_score.FG3A) AS FG3A,
+                SUM(box_score.FTM) AS FTM, SUM(box_score.FTA) AS FTA
+            FROM box_score
+            {where}
+            GROUP BY box_score.GAME_ID, box_score.TEAM_ID
+        """
+    }
+}
+
+
+def affected_keys(cursor, keys, game_ids):
+    """
+    Gets the distinct summary keys touched by a set of games
+    """
+    placeholders = ", ".join(["%s"] * len(game_ids))
+    columns = ", ".join(f"box_score.{key}" for key in keys)
+    cursor.execute(
+        f"SELECT DISTINCT {columns} FROM box_score WHERE box_score.GAME_ID IN ({placeholders})",
+        tuple(game_ids))
+    return cursor.fetchall()
+
+
+def refresh_summary_table(cursor, table_name, game_ids=None, rows=None):
+    """
+    Rebuilds a summary table, or only the rows for the keys of the given games and box_score rows
+    rows are box_score rows as dicts, e.g. a modification's rows before and after it ran
+    The table must exist (see refresh_summary_tables)
+    """
+    spec = SUMMARY_TABLES[table_name]
+    if game_ids is None and rows is None:
+        cursor.execute(f"DELETE FROM {table_name}")
+        cursor.execute(f"INSERT INTO {table_name} {spec['select'].format(where='')}")
+        return cursor.rowcount
+
+    key_rows = [tuple(row) for row in affected_keys(cursor, spec['keys'], game_ids)] if game_ids else []
+    key_rows = list(dict.fromkeys(key_rows + [tuple(row[key] for key in spec['keys']) for row in rows or []]))
+    if not key_rows:
+        return 0
+
+    key_tuple = "(" + ", ".join(["%s"] * len(spec['keys'])) + ")"
+    in_list = ", ".join([key_tuple] * len(key_rows))
+    params = tuple(value for row in key_rows for value in row)
+
+    target_columns = ", ".join(spec['keys'])
+    cursor.execute(
+        f"DELETE FROM {table_name} WHERE ({target_columns}) IN ({in_list})",
+        params)
+
+    source_columns = ", ".join(f"box_score.{key}" for key in spec['keys'])
+    where = f"WHERE ({source_columns}) IN ({in_list})"
+    cursor.execute(
+        f"INSERT INTO {table_name} {spec['select'].format(where=where)}",
+        params)
+    return cursor.rowcount
+
+
+def refresh_summary_tables(game_ids=None, connection=None, rows=None, table_names=None):
+    """
+    Creates the missing summary tables, then refreshes all of them (or only table_names) in one transaction
+    The CREATE TABLE statements run first because MySQL commits implicitly after DDL
+    If game_ids or rows are given only the players, teams and games they touch are recomputed
+    """
+    owns_connection = connection is None
+    if owns_connection:
+        connection = mysql.connector.connect(**DB_CONFIG)
+
+    cursor = connection.cursor()
+    try:
+        for table_name in table_names or SUMMARY_TABLES:
+            cursor.execute(SUMMARY_TABLES[table_name]['create'])
+        for table_name in table_names or SUMMARY_TABLES:
+            row_count = refresh_summary_table(cursor, table_name, game_ids, rows)
+            print(f"Refreshed {table_name} ({row_count} rows)")
+        connection.commit()
+        return True
+    except mysql.connector.Error as e:
+        print(f"Error refreshing summary tables: {e}")
+        connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        if owns_connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    from src.utils.sql_upload import mark_schema_changed
+    if refresh_summary_tables():
+        mark_schema_changed()
@@ -0,0 +1,109 @@
+"""
+test_sql_export.py
+
+This file contains the tests for the in-process exporter (sql_export.py) and
+the snapshot export sql_dump.py falls back to without mysqldump, run against
+a local SQLite database standing in for MySQL.
+"""
+
+import io
+import os
+import csv
+import gzip
+import json
+import sqlite3
+import pytest
+from src.utils.sql_export import export_table, export_database, write_csv_batches, stream_query_batches
+from src.utils.sql_dump import export_snapshot
+
+
+@pytest.fixture
+def connection(tmp_path):
+    """
+    A SQLite stand-in with a small teams table and an empty box_score table
+    """
+    connection = sqlite3.connect(tmp_path / "stand_in.sqlite")
+    connection.execute("CREATE TABLE teams (TEAM_ID INTEGER PRIMARY KEY, NICKNAME TEXT, CITY TEXT)")
+    connection.execute("CREATE TABLE box_score (GAME_ID TEXT, PLAYER_ID INTEGER, PTS INTEGER)")
+    connection.executemany(
+        "INSERT INTO teams VALUES (?, ?, ?)",
+        [(1610612747, "Lakers", "Los Angeles"), (1610612738, "Celtics", "Boston"), (1, "O'Neal's", None)])
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def read_gzip_text(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        return file.read()
+
+
+def test_export_table_sql(connection, tmp_path):
+    entry = export_table(connection, "teams", tmp_path, fmt='sql', compression='gzip', batch_size=2)
+    assert entry["rows"] == 3
+    assert entry["bytes"] == os.path.getsize(tmp_path / entry["file"])
+    dump = read_gzip_text(tmp_path / entry["file"])
+    assert "CREATE TABLE teams" in dump
+    assert dump.count("INSERT INTO `teams`") == 2
+    assert "'O\\'Neal\\'s', NULL" in dump
+
+
+def test_export_table_csv(connection, tmp_path):
+    entry = export_table(connection, "teams", tmp_path, fmt='csv', compression='gzip')
+    rows = list(csv.reader(io.StringIO(read_gzip_text(tmp_path / entry["file"]))))
+    assert rows[0] == ["TEAM_ID", "NICKNAME", "CITY"]
+    assert len(rows) == 4 and entry["rows"] == 3
+
+
+def test_export_empty_table_csv_has_header(connection, tmp_path):
+    entry = export_table(connection, "box_score", tmp_path, fmt='csv', compression='none')
+    with open(tmp_path / entry["file"], encoding='utf-8') as file:
+        assert file.read().strip() == "GAME_ID,PLAYER_ID,PTS"
+    assert entry["rows"] == 0
+
+
+def test_export_empty_table_sql(connection, tmp_path):
+    entry = export_table(connection, "box_score", tmp_path, fmt='sql', compression='gzip')
+    dump = read_gzip_text(tmp_path / entry["file"])
+    assert "CREATE TABLE box_score" in dump and "INSERT INTO" not in dump
+    assert entry["rows"] == 0
+
+
+def test_export_table_parquet(connection, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    entry = export_table(connection, "teams", tmp_path, fmt='parquet', batch_size=2)
+    table = pq.read_table(tmp_path / entry["file"])
+    assert table.num_rows == 3 and entry["rows"] == 3
+    assert table.column_names == ["TEAM_ID", "NICKNAME", "CITY"]
+
+
+def test_export_empty_table_parquet(connection, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    entry = export_table(connection, "box_score", tmp_path, fmt='parquet')
+    assert entry["bytes"] == os.path.getsize(tmp_path / entry["file"])
+    table = pq.read_table(tmp_path / entry["file"])
+    assert table.num_rows == 0
+    assert table.column_names == ["GAME_ID", "PLAYER_ID", "PTS"]
+
+
+def test_stream_query_batches_empty_result(connection):
+    batches = list(stream_query_batches(connection, "SELECT * FROM teams WHERE TEAM_ID < ?", (0,)))
+    assert batches == [(["TEAM_ID", "NICKNAME", "CITY"], [])]
+    sink = io.BytesIO()
+    assert write_csv_batches(iter(batches), sink) == 0
+    assert sink.getvalue() == b"TEAM_ID,NICKNAME,CITY\r\n"
+
+
+def test_export_database(connection, tmp_path):
+    exported = export_database(tmp_path / "export", connection=connection, fmt='csv', compression='gzip')
+    assert {name: entry["rows"] for name, entry in exported.items()} == {"box_score": 0, "teams": 3}
+
+
+def test_export_snapshot_reads_one_snapshot(connection, tmp_path):
+    tables = export_snapshot(["teams", "box_score"], tmp_path, 'gzip', False, connection=connection)
+    assert {name: entry["rows"] for name, entry in tables.items()} == {"teams": 3, "box_score": 0}
+    assert all(len(entry["sha256"]) == 64 for entry in tables.values())
+    json.dumps(tables)
+    # The snapshot is released, so the connection can write again
+    connection.execute("INSERT INTO box_score VALUES ('0022300001', 2544, 30)")
+    connection.commit()
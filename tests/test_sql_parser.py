@@ -0,0 +1,47 @@
+"""
+test_sql_parser.py
+
+This file contains the tests for the table and column references the SQL
+parser collects, in particular FROM used inside function arguments.
+"""
+
+import pytest
+from src.utils.sql_parser import parse_sql, check_references
+
+SCHEMA = {
+    'box_score': {'game_id', 'game_date', 'player_id', 'team_id', 'pts'},
+    'players': {'person_id', 'team_id', 'display_first_last'},
+    'teams': {'team_id', 'nickname'}
+}
+
+
+@pytest.mark.parametrize("sql_query, columns", [
+    ("SELECT EXTRACT(YEAR FROM GAME_DATE), COUNT(*) FROM box_score GROUP BY 1", {'game_date'}),
+    ("SELECT TRIM(LEADING '0' FROM GAME_ID) AS game FROM box_score", {'game_id'}),
+    ("SELECT SUBSTRING(GAME_DATE FROM 1 FOR 4), PTS FROM box_score", {'game_date', 'pts'}),
+])
+def test_from_inside_function_call_is_not_a_table(sql_query, columns):
+    parsed = parse_sql(sql_query)
+    assert parsed["tables"] == ('box_score',)
+    assert {column for _, column in parsed["columns"]} == columns
+    assert check_references(parsed, SCHEMA) == []
+
+
+def test_subquery_inside_function_call_keeps_its_table():
+    parsed = parse_sql("SELECT NICKNAME, COALESCE((SELECT MAX(PTS) FROM box_score), 0) FROM teams")
+    assert set(parsed["tables"]) == {'box_score', 'teams'}
+    assert check_references(parsed, SCHEMA) == []
+
+
+def test_derived_table_and_join_tables():
+    parsed = parse_sql(
+        "SELECT p.DISPLAY_FIRST_LAST, t.NICKNAME FROM (SELECT * FROM players) p "
+        "JOIN teams t ON t.TEAM_ID = p.TEAM_ID")
+    assert parsed["tables"] == ('players', 'teams')
+    assert parsed["derived"]
+
+
+def test_unknown_table_is_still_reported():
+    parsed = parse_sql("SELECT EXTRACT(YEAR FROM GAME_DATE) FROM games")
+    assert parsed["tables"] == ('games',)
+    assert check_references(parsed, SCHEMA)